@@ -1,7 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
-from .models import UserProfile, Scenario, ScenarioSubmission, Requirement, Feedback, SRSDocument, Notification
+from .models import UserProfile, Scenario, ScenarioSubmission, Requirement, Feedback, SRSDocument, Notification, Job, RequestTiming
+from .requirement_batch import delete_requirements
 
 class UserProfileInline(admin.StackedInline):
     model = UserProfile
@@ -22,6 +23,10 @@ class ScenarioAdmin(admin.ModelAdmin):
     search_fields = ['title', 'description']
     readonly_fields = ['created_at', 'updated_at']
 
+    def get_queryset(self, request):
+        # Scenarios waiting for the delete_scenario job are gone as far as admins are concerned
+        return super().get_queryset(request).filter(deleted_at__isnull=True)
+
 @admin.register(ScenarioSubmission)
 class ScenarioSubmissionAdmin(admin.ModelAdmin):
     list_display = ['scenario', 'student', 'status', 'submitted_at', 'created_at']
@@ -35,6 +40,9 @@ class RequirementAdmin(admin.ModelAdmin):
     list_filter = ['requirement_type', 'priority', 'created_at']
     search_fields = ['title', 'description']
 
+    def delete_queryset(self, request, queryset):
+        delete_requirements(queryset)
+
 @admin.register(Feedback)
 class FeedbackAdmin(admin.ModelAdmin):
     list_display = ['title', 'feedback_type', 'submission', 'admin', 'is_read', 'created_at']
@@ -43,11 +51,27 @@ class FeedbackAdmin(admin.ModelAdmin):
 
 @admin.register(SRSDocument)
 class SRSDocumentAdmin(admin.ModelAdmin):
-    list_display = ['submission', 'created_at', 'updated_at']
-    readonly_fields = ['created_at', 'updated_at']
+    list_display = ['submission', 'version', 'created_at', 'updated_at']
+    readonly_fields = ['version', 'created_at', 'updated_at']
+
+    def save_model(self, request, obj, form, change):
+        # An open editor must not autosave over this edit
+        obj.version += 1
+        super().save_model(request, obj, form, change)
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
     list_display = ['title', 'user', 'is_read', 'created_at']
     list_filter = ['is_read', 'created_at']
     search_fields = ['title', 'message']
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'status', 'attempts', 'run_after', 'locked_by', 'created_at']
+    list_filter = ['status', 'name']
+    readonly_fields = ['created_at', 'updated_at']
+
+@admin.register(RequestTiming)
+class RequestTimingAdmin(admin.ModelAdmin):
+    list_display = ['view_name', 'method', 'status_code', 'duration_ms', 'query_count', 'created_at']
+    list_filter = ['view_name', 'method']
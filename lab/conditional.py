@@ -0,0 +1,53 @@
+"""
+ETag validators for the read-heavy student pages.
+
+A page's ETag hashes what the page shows that can change: the viewer (role,
+name, unread badge, theme, CSRF cookie), the release, and the cached versions
+from lab/fragments.py, plus at most one cheap query where a page needs more.
+A reload of an unchanged page is answered with 304 Not Modified before the
+view runs. Requests with pending flash messages always get the full page, so
+the messages are shown.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.db.models import Count, Max
+
+from .counters import get_unread_count
+from .fragments import CATALOG_KEY, submissions_key, get_versions
+from .models import ScenarioSubmission
+from .queries import user_notifications
+from .roles import get_role
+
+
+def page_etag(request, *parts):
+    if len(get_messages(request)):
+        return None
+    user = request.user
+    key = '|'.join(str(part) for part in (
+        getattr(settings, 'LAB_RELEASE', ''), request.get_full_path(),
+        user.pk, get_role(request), user.get_full_name(), user.username, user.email,
+        get_unread_count(user), request.session.get('theme', ''), request.META.get('CSRF_COOKIE', ''),
+        *parts,
+    ))
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def student_work_etag(request, pk=None):
+    """scenario_list and scenario_detail: the catalog and the viewer's own submissions."""
+    return page_etag(request, *get_versions(CATALOG_KEY, submissions_key(request.user.pk)))
+
+
+def submission_etag(request, pk):
+    """submission_detail: the catalog and the submission owner's work (the viewer may be an admin)."""
+    student_id = ScenarioSubmission.objects.filter(pk=pk).values_list('student_id', flat=True).first()
+    if student_id is None:
+        return None
+    return page_etag(request, *get_versions(CATALOG_KEY, submissions_key(student_id)))
+
+
+def notifications_etag(request):
+    # Read state is covered by the unread count in page_etag
+    latest = user_notifications(request.user).order_by().aggregate(created=Max('created_at'), total=Count('id'))
+    return page_etag(request, latest['created'], latest['total'])
@@ -1,25 +1,26 @@
-from .models import ScenarioSubmission
+from django.utils.functional import SimpleLazyObject
+from .counters import get_unread_count, get_submission_counts
+
 
 def sidebar_progress(request):
     if not request.user.is_authenticated:
         return {}
-    draft_submissions = ScenarioSubmission.objects.filter(student=request.user, status='draft').count()
-    completed_submissions = ScenarioSubmission.objects.filter(student=request.user, status='submitted').count()
-    feedback_received = ScenarioSubmission.objects.filter(student=request.user, status='feedback_received').count()
+    # Only queried when a template first reads one of the counts
+    counts = SimpleLazyObject(lambda: get_submission_counts(request.user))
     return {
-        'draft_submissions': draft_submissions,
-        'completed_submissions': completed_submissions,
-        'feedback_received': feedback_received,
+        'draft_submissions': SimpleLazyObject(lambda: counts['draft']),
+        'completed_submissions': SimpleLazyObject(lambda: counts['submitted']),
+        'feedback_received': SimpleLazyObject(lambda: counts['feedback_received']),
     }
 
 def notifications_processor(request):
     """Context processor to add unread notifications count to all templates"""
     if request.user.is_authenticated:
-        unread_count = request.user.notifications.filter(is_read=False).count()
+        unread_count = SimpleLazyObject(lambda: get_unread_count(request.user))
     else:
         unread_count = 0
-    
+
     return {
         'unread_notifications_count': unread_count,
-        'has_unread_notifications': unread_count > 0
-    }
\ No newline at end of file
+        'has_unread_notifications': SimpleLazyObject(lambda: unread_count > 0)
+    }
@@ -0,0 +1,98 @@
+"""
+Cached per-user counters shown on every page.
+
+The unread-notification count lives in the cache, backed by the durable
+`UserProfile.unread_notifications` column. Writers adjust the column with
+F() expressions and drop the cache key once their transaction commits, so a
+warm badge costs no queries and a cold one costs a single-row read.
+
+Submission counts by status are computed with one conditional aggregate and
+cached until one of the student's submissions is saved or deleted.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q, Value
+from django.db.models.functions import Greatest
+
+from .models import UserProfile, Notification, ScenarioSubmission
+from .queries import unread_notifications
+
+
+def _timeout():
+    return getattr(settings, 'LAB_COUNTER_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def unread_key(user_id):
+    return f'lab:unread:{user_id}'
+
+
+def _invalidate_unread(user_ids):
+    keys = [unread_key(user_id) for user_id in user_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def get_unread_count(user):
+    """Return the user's unread notification count, from cache when possible."""
+    key = unread_key(user.pk)
+    count = cache.get(key)
+    if count is None:
+        count = UserProfile.objects.filter(user_id=user.pk).values_list('unread_notifications', flat=True).first()
+        if count is None:
+            # No profile to hold the counter; count directly and don't cache
+            return unread_notifications(user.pk).count()
+        cache.set(key, count, _timeout())
+    return count
+
+
+def adjust_unread(user_ids, delta):
+    """Add `delta` (may be negative) to the unread counter of each user."""
+    user_ids = list(user_ids)
+    if not user_ids or not delta:
+        return
+    UserProfile.objects.filter(user_id__in=user_ids).update(
+        unread_notifications=Greatest(F('unread_notifications') + delta, Value(0))
+    )
+    _invalidate_unread(user_ids)
+
+
+def recount_unread(user_id):
+    """Recompute one user's counter from the notifications table."""
+    count = unread_notifications(user_id).count()
+    UserProfile.objects.filter(user_id=user_id).update(unread_notifications=count)
+    _invalidate_unread([user_id])
+    return count
+
+
+def mark_notifications_read(user, queryset=None):
+    """Mark the user's unread notifications (optionally limited to `queryset`) as read."""
+    if queryset is None:
+        queryset = Notification.objects.filter(user=user)
+    updated = queryset.filter(user=user, is_read=False).update(is_read=True)
+    adjust_unread([user.pk], -updated)
+    return updated
+
+
+def progress_key(user_id):
+    return f'lab:progress:{user_id}'
+
+
+def get_submission_counts(user):
+    """
+    Return the user's submission counts as a dict with `draft`, `submitted`
+    and `feedback_received` keys, from cache when possible.
+    """
+    key = progress_key(user.pk)
+    counts = cache.get(key)
+    if counts is None:
+        counts = ScenarioSubmission.objects.filter(student_id=user.pk).aggregate(
+            draft=Count('id', filter=Q(status='draft')),
+            submitted=Count('id', filter=Q(status='submitted')),
+            feedback_received=Count('id', filter=Q(status='feedback_received')),
+        )
+        cache.set(key, counts, _timeout())
+    return counts
+
+
+def invalidate_submission_counts(user_id):
+    transaction.on_commit(lambda: cache.delete(progress_key(user_id)))
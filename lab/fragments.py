@@ -0,0 +1,61 @@
+"""
+Version tokens for cached template fragments.
+
+A fragment is cached under its versions (`{% cache ... catalog_version
+submissions_version %}`), so invalidating it means bumping a version rather
+than finding and deleting keys: the next render looks up a new key and the
+old entry simply expires.
+
+- The catalog version changes on any Scenario save or delete.
+- A student's submissions version changes when one of their submissions, or
+  a requirement or feedback on it, is saved or deleted.
+
+The same versions validate whole pages (see lab/conditional.py).
+
+Bumps happen once the writing transaction commits, so a concurrent request
+can't cache a fragment built from the old rows under the new version.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+CATALOG_KEY = 'lab:version:scenarios'
+
+
+def submissions_key(user_id):
+    return f'lab:version:submissions:{user_id}'
+
+
+def fragment_timeout():
+    return getattr(settings, 'LAB_FRAGMENT_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def _new_version():
+    return uuid.uuid4().hex[:12]
+
+
+def get_versions(*keys):
+    """Return the current version of each key, creating missing ones (one cache round trip when warm)."""
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            version = _new_version()
+            # add() so two cold requests agree on one version
+            if not cache.add(key, version, None):
+                version = cache.get(key, version)
+            versions[key] = version
+    return [versions[key] for key in keys]
+
+
+def bump_versions(*keys):
+    transaction.on_commit(lambda: cache.set_many({key: _new_version() for key in keys}, None))
+
+
+def bump_catalog_version():
+    bump_versions(CATALOG_KEY)
+
+
+def bump_submissions_version(user_id):
+    bump_versions(submissions_key(user_id))
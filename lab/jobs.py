@@ -0,0 +1,197 @@
+"""
+Small database-backed job queue for work that should not run inside a request.
+
+Jobs are rows in the `Job` table, so they are written in the same transaction
+as the request that enqueues them and need no external broker. Workers claim
+a job with a conditional UPDATE that sets a visibility timeout (`locked_until`);
+if a worker dies mid-job the lock expires and another worker picks it up.
+This works the same way on SQLite and Postgres.
+"""
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import (
+    Job, UserProfile, Scenario, ScenarioSubmission, Notification,
+    bulk_create_notifications, notify_students_of_scenario,
+)
+
+logger = logging.getLogger(__name__)
+
+JOB_HANDLERS = {}
+
+
+def job(name):
+    """Register a function as the handler for jobs called `name`."""
+    def decorator(func):
+        JOB_HANDLERS[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, delay=None, max_attempts=None, **payload):
+    """
+    Queue a job for the worker. The payload must be JSON serializable.
+    With LAB_JOBS_EAGER enabled the job runs immediately instead.
+    """
+    if name not in JOB_HANDLERS:
+        raise ValueError(f'Unknown job: {name}')
+
+    if getattr(settings, 'LAB_JOBS_EAGER', False):
+        JOB_HANDLERS[name](**payload)
+        return None
+
+    run_after = timezone.now() + delay if delay else timezone.now()
+    return Job.objects.create(
+        name=name,
+        payload=payload,
+        run_after=run_after,
+        max_attempts=max_attempts or getattr(settings, 'LAB_JOB_MAX_ATTEMPTS', 5),
+    )
+
+
+def claim_job(worker_id, visibility_timeout=None):
+    """
+    Claim the next runnable job for `worker_id`, or return None.
+    A job is runnable when it is pending and due, or when it is running but its
+    previous worker's lock has expired.
+    """
+    if visibility_timeout is None:
+        visibility_timeout = getattr(settings, 'LAB_JOB_VISIBILITY_TIMEOUT', 300)
+
+    now = timezone.now()
+    runnable = (
+        Q(status='pending', run_after__lte=now) |
+        Q(status='running', locked_until__lt=now)
+    )
+    candidates = Job.objects.filter(runnable).order_by('run_after', 'id').values_list('id', flat=True)[:10]
+
+    for job_id in candidates:
+        # Only one worker can win this UPDATE for a given job
+        claimed = Job.objects.filter(runnable, pk=job_id).update(
+            status='running',
+            locked_by=worker_id,
+            locked_until=now + timedelta(seconds=visibility_timeout),
+            updated_at=now,
+        )
+        if claimed:
+            return Job.objects.get(pk=job_id)
+    return None
+
+
+def _record_outcome(job_obj, fields):
+    """
+    Save the outcome of a run unless the job has since been claimed by another
+    worker, whose run then owns the row.
+    """
+    job_obj.updated_at = timezone.now()
+    recorded = Job.objects.filter(pk=job_obj.pk, locked_by=job_obj.locked_by).update(
+        **{field: getattr(job_obj, field) for field in fields + ['updated_at']}
+    )
+    if not recorded:
+        logger.warning('Job %s was reclaimed while %s ran it; outcome not recorded', job_obj, job_obj.locked_by)
+
+
+def run_job(job_obj):
+    """
+    Execute a claimed job and record the outcome. Returns True on success.
+
+    There is no heartbeat: a handler that runs past the visibility timeout may
+    be claimed and run again by another worker, so handlers must be safe to
+    repeat.
+    """
+    handler = JOB_HANDLERS.get(job_obj.name)
+    job_obj.attempts += 1
+    try:
+        if handler is None:
+            raise ValueError(f'Unknown job: {job_obj.name}')
+        with transaction.atomic():
+            handler(**job_obj.payload)
+    except Exception:
+        job_obj.last_error = traceback.format_exc()
+        job_obj.locked_until = None
+        if job_obj.attempts >= job_obj.max_attempts:
+            job_obj.status = 'failed'
+            logger.error('Job %s failed permanently', job_obj)
+        else:
+            # Exponential backoff: 2, 4, 8, ... seconds
+            job_obj.status = 'pending'
+            job_obj.run_after = timezone.now() + timedelta(seconds=2 ** job_obj.attempts)
+            logger.warning('Job %s failed, retrying at %s', job_obj, job_obj.run_after)
+        _record_outcome(job_obj, ['attempts', 'status', 'run_after', 'locked_until', 'last_error'])
+        return False
+
+    job_obj.status = 'done'
+    job_obj.locked_until = None
+    job_obj.last_error = ''
+    _record_outcome(job_obj, ['attempts', 'status', 'locked_until', 'last_error'])
+    return True
+
+
+def run_pending_jobs(worker_id='inline', limit=None):
+    """Run due jobs in the current thread until none are left. Returns the number run."""
+    count = 0
+    while limit is None or count < limit:
+        job_obj = claim_job(worker_id)
+        if job_obj is None:
+            break
+        run_job(job_obj)
+        count += 1
+    return count
+
+
+# Job handlers
+
+@job('notify_students_of_scenario')
+def notify_students_of_scenario_job(scenario_id):
+    scenario = Scenario.objects.filter(pk=scenario_id).first()
+    if scenario is None or not scenario.is_active:
+        return
+    notify_students_of_scenario(scenario)
+
+
+@job('notify_admins_of_submission')
+def notify_admins_of_submission(submission_id):
+    submission = ScenarioSubmission.objects.select_related('scenario', 'student').filter(pk=submission_id).first()
+    if submission is None:
+        return
+    student = submission.student
+    admin_ids = UserProfile.objects.filter(role='admin').values_list('user_id', flat=True)
+    bulk_create_notifications([
+        Notification(
+            user_id=admin_id,
+            title='New Submission for Review',
+            message=f'{student.get_full_name() or student.username} submitted requirements for {submission.scenario.title}',
+            link=f'/submissions/{submission.pk}/'
+        )
+        for admin_id in admin_ids
+    ])
+
+
+@job('notify_student_of_feedback')
+def notify_student_of_feedback(submission_id):
+    submission = ScenarioSubmission.objects.select_related('scenario').filter(pk=submission_id).first()
+    if submission is None:
+        return
+    Notification.objects.create(
+        user_id=submission.student_id,
+        title='New Feedback Received',
+        message=f'You have received feedback for {submission.scenario.title}',
+        link=f'/submissions/{submission.pk}/'
+    )
+
+
+@job('delete_scenario')
+def delete_scenario(scenario_id):
+    Scenario.objects.filter(pk=scenario_id, deleted_at__isnull=False).delete()
+
+
+@job('refresh_scenario_search_documents')
+def refresh_scenario_search_documents(scenario_id):
+    from .search import refresh_search_documents
+    refresh_search_documents(ScenarioSubmission.objects.filter(scenario_id=scenario_id))
@@ -0,0 +1,23 @@
+"""
+Per-process cache used when LAB_CACHE isn't 'tiered'.
+
+Counters, roles and version tokens are invalidated with cache writes, which a
+LocMemCache only applies in the process that made them. Capping every entry
+at MAX_TIMEOUT seconds bounds how long another gunicorn worker can serve a
+stale badge, fragment or ETag, at the cost of recomputing them that often.
+"""
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.locmem import LocMemCache
+
+
+class BoundedLocMemCache(LocMemCache):
+    def __init__(self, name, params):
+        super().__init__(name, params)
+        self.max_timeout = params.get('OPTIONS', {}).get('MAX_TIMEOUT', 60)
+
+    def get_backend_timeout(self, timeout=DEFAULT_TIMEOUT):
+        expiry = super().get_backend_timeout(timeout)
+        cap = time.time() + self.max_timeout
+        return cap if expiry is None else min(expiry, cap)
@@ -0,0 +1,284 @@
+import json
+import statistics
+import time
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from lab.models import Scenario, ScenarioSubmission
+from lab.perf import percentile
+from lab.synthetic import seed_lab
+
+
+class Route:
+    """One request to benchmark: a URL name, the role making it and how."""
+
+    def __init__(self, name, role, method='get', kwargs=None, data=None, query='', label=None,
+                 content_type=None, relogin=False):
+        self.name = name
+        self.role = role
+        self.method = method
+        self.kwargs = kwargs
+        self.data = data
+        self.query = query
+        self.label = label or name
+        self.content_type = content_type
+        # The request ends the session (logout), log the client back in afterwards
+        self.relogin = relogin
+
+    @property
+    def key(self):
+        return f'{self.role}:{self.label} {self.method.upper()}'
+
+    def url(self):
+        url = reverse(self.name, kwargs=self.kwargs)
+        return f'{url}?{self.query}' if self.query else url
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a fresh database to the given scale, request every lab route as the right role and '
+        'write latency percentiles and query counts as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=200)
+        parser.add_argument('--scenarios', type=int, default=20)
+        parser.add_argument('--submissions-per-student', type=int, default=5)
+        parser.add_argument('--requirements-per-submission', type=int, default=8)
+        parser.add_argument('--notifications-per-student', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the synthetic data (default: 0)')
+        parser.add_argument('--iterations', type=int, default=20, help='Timed requests per route (default: 20)')
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed requests per route first (default: 2)')
+        parser.add_argument('--cold', action='store_true', help='Clear the cache before every request')
+        parser.add_argument('--output', default=None, help='Write the JSON results to this file instead of stdout')
+        parser.add_argument(
+            '--no-fresh-db', action='store_true',
+            help='Seed into the configured (empty) database instead of creating a throwaway test database'
+        )
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1')
+        if options['no_fresh_db']:
+            if Scenario.objects.exists():
+                raise CommandError('The database already has data; run without --no-fresh-db')
+            results = self.run(options)
+        else:
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            try:
+                results = self.run(options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        output = json.dumps(results, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                handle.write(output + '\n')
+            self.print_summary(results)
+        else:
+            self.stdout.write(output)
+
+    def run(self, options):
+        scale = {
+            'students': options['students'],
+            'scenarios': options['scenarios'],
+            'submissions_per_student': options['submissions_per_student'],
+            'requirements_per_submission': options['requirements_per_submission'],
+            'notifications_per_student': options['notifications_per_student'],
+        }
+        start = time.perf_counter()
+        admin = seed_lab(seed=options['seed'], log=lambda message: self.stderr.write(message), **scale)
+        seed_seconds = time.perf_counter() - start
+
+        results = {}
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            clients = {'anonymous': Client()}
+            users = {'admin': admin}
+            routes = self.routes(users)
+            for role in ('student', 'admin'):
+                if role in users:
+                    clients[role] = Client()
+                    clients[role].force_login(users[role])
+            cache.clear()
+            for route in routes:
+                results[route.key] = self.measure(route, clients[route.role], users.get(route.role), options)
+
+        return {
+            'meta': {
+                'scale': scale,
+                'seed': options['seed'],
+                'iterations': options['iterations'],
+                'warmup': options['warmup'],
+                'cold_cache': options['cold'],
+                'database': connection.vendor,
+                'django': django.get_version(),
+                'seed_seconds': round(seed_seconds, 2),
+            },
+            'routes': results,
+        }
+
+    def routes(self, users):
+        """Every route in lab/urls.py, with the objects it needs picked from the seeded data."""
+        routes = [
+            Route('home', 'anonymous'),
+            Route('login', 'anonymous'),
+            Route('register', 'anonymous'),
+        ]
+
+        # A student with a draft that has requirements can exercise every student route
+        draft = ScenarioSubmission.objects.filter(
+            status='draft', requirements__isnull=False, scenario__is_active=True
+        ).select_related('student').order_by('pk').first()
+        if draft is not None:
+            users['student'] = draft.student
+            requirement = draft.requirements.order_by('pk').first()
+            routes += [
+                Route('dashboard', 'student'),
+                Route('student_dashboard', 'student'),
+                Route('scenario_list', 'student'),
+                Route('scenario_detail', 'student', kwargs={'pk': draft.scenario_id}),
+                Route('submission_detail', 'student', kwargs={'pk': draft.pk}),
+                Route('notifications', 'student'),
+                Route('srs_document', 'student'),
+                Route('add_scenario_requirement', 'student', 'post', kwargs={'pk': draft.scenario_id}, data={
+                    'requirement_type': 'functional', 'title': 'Benchmark', 'description': 'Benchmark', 'priority': 'low',
+                }),
+                Route('add_requirement', 'student', 'post', kwargs={'submission_id': draft.pk}, data={
+                    'requirement_type': 'functional', 'title': 'Benchmark', 'description': 'Benchmark', 'priority': 'low',
+                }),
+                Route('edit_requirement', 'student', kwargs={'pk': requirement.pk}),
+                Route('edit_requirement', 'student', 'post', kwargs={'pk': requirement.pk}, data={
+                    'requirement_type': 'business', 'title': 'Edited', 'description': 'Edited', 'priority': 'high',
+                }),
+                Route('delete_requirement', 'student', kwargs={'pk': requirement.pk}),
+                Route('delete_requirement', 'student', 'post', kwargs={'pk': requirement.pk}),
+                Route('submit_scenario', 'student', kwargs={'submission_id': draft.pk}),
+                Route('submit_scenario', 'student', 'post', kwargs={'submission_id': draft.pk}),
+                Route(
+                    'toggle_theme', 'student', 'post', data=json.dumps({'theme': 'dark'}),
+                    content_type='application/json',
+                ),
+                Route('requirements_api', 'student', kwargs={'submission_id': draft.pk}),
+                Route('requirements_api', 'student', 'post', kwargs={'submission_id': draft.pk}, data={
+                    'requirement_type': 'functional', 'title': 'Benchmark', 'description': 'Benchmark',
+                }, content_type='application/json'),
+                Route('requirement_api', 'student', 'patch', kwargs={'submission_id': draft.pk, 'pk': requirement.pk},
+                      data={'priority': 'high'}, content_type='application/json'),
+                Route('requirement_api', 'student', 'delete', kwargs={'submission_id': draft.pk, 'pk': requirement.pk}),
+                Route('requirements_batch_api', 'student', 'post', kwargs={'submission_id': draft.pk}, data={
+                    'create': [
+                        {'requirement_type': 'business', 'title': f'Batch {i}', 'description': 'Benchmark'}
+                        for i in range(40)
+                    ],
+                    'update': [{'id': requirement.pk, 'title': 'Batch edited'}],
+                }, content_type='application/json', label='requirements_batch_api (40 creates)'),
+                Route('import_scenario_requirements', 'student', 'post', kwargs={'pk': draft.scenario_id}, data={
+                    'file': SimpleUploadedFile('requirements.csv', (
+                        'requirement_type,title,description,priority\n'
+                        + ''.join(f'functional,Imported {i},Benchmark,low\n' for i in range(100))
+                    ).encode()),
+                }, label='import_scenario_requirements (100 rows)'),
+                Route('export_submission_requirements', 'student', kwargs={'pk': draft.pk}),
+                Route('export_submission_requirements', 'student', kwargs={'pk': draft.pk}, query='format=ndjson',
+                      label='export_submission_requirements?format=ndjson'),
+                Route('srs_render', 'student', kwargs={'submission_id': draft.pk}),
+                Route('srs_editor', 'student', kwargs={'submission_id': draft.pk}),
+                Route('srs_editor', 'student', 'post', kwargs={'submission_id': draft.pk}, data={
+                    'version': 0, 'introduction': 'Benchmark', 'overall_description': 'Benchmark',
+                }),
+                Route('srs_autosave', 'student', 'post', kwargs={'submission_id': draft.pk}, data={
+                    'version': 0, 'sections': {'system_features': 'Benchmark ' * 500},
+                }, content_type='application/json'),
+                Route('logout', 'student', relogin=True),
+            ]
+
+        scenario_id = Scenario.objects.order_by('pk').values_list('pk', flat=True).first()
+        submission = ScenarioSubmission.objects.filter(status='submitted').order_by('pk').first() or draft
+        routes += [
+            Route('admin_dashboard', 'admin'),
+            Route('admin_scenarios', 'admin'),
+            Route('create_scenario', 'admin'),
+            Route('admin_submissions', 'admin'),
+            Route('admin_submissions', 'admin', query='search=student0000', label='admin_submissions?search'),
+            Route('admin_submissions', 'admin', query='status=submitted&page=2', label='admin_submissions?status&page'),
+            Route('refresh_lab_stats', 'admin', 'post'),
+        ]
+        if scenario_id is not None:
+            routes += [
+                Route('edit_scenario', 'admin', kwargs={'pk': scenario_id}),
+                Route('delete_scenario', 'admin', 'post', kwargs={'pk': scenario_id}),
+            ]
+        if submission is not None:
+            routes += [
+                Route('submission_detail', 'admin', kwargs={'pk': submission.pk}),
+                Route('srs_render', 'admin', kwargs={'submission_id': submission.pk}),
+                Route('srs_render', 'admin', kwargs={'submission_id': submission.pk}, query='format=md',
+                      label='srs_render?format=md'),
+                Route('add_feedback', 'admin', 'post', kwargs={'submission_id': submission.pk}, data={
+                    'feedback_type': 'general', 'title': 'Benchmark', 'content': 'Benchmark',
+                }),
+            ]
+        return routes
+
+    def measure(self, route, client, user, options):
+        url = route.url()
+        timings = []
+        queries = []
+        status = None
+        for iteration in range(options['warmup'] + options['iterations']):
+            if options['cold']:
+                cache.clear()
+            # Writes are rolled back so every iteration sees the same data
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as ctx:
+                    start = time.perf_counter()
+                    if route.method == 'get':
+                        response = client.get(url)
+                    else:
+                        extra = {'content_type': route.content_type} if route.content_type else {}
+                        for value in (route.data.values() if isinstance(route.data, dict) else ()):
+                            # Uploaded files are read again on every request
+                            if hasattr(value, 'seek'):
+                                value.seek(0)
+                        response = getattr(client, route.method)(url, route.data or {}, **extra)
+                    if response.streaming:
+                        # The body is generated, and queried for, as it is read
+                        b''.join(response.streaming_content)
+                    elapsed = time.perf_counter() - start
+                transaction.set_rollback(True)
+            if route.relogin:
+                client.force_login(user)
+            if iteration >= options['warmup']:
+                timings.append(elapsed * 1000)
+                queries.append(len(ctx.captured_queries))
+            status = response.status_code
+
+        timings.sort()
+        return {
+            'url': url,
+            'status': status,
+            'queries': {'min': min(queries), 'max': max(queries)},
+            'ms': {
+                'p50': round(percentile(timings, 50), 2),
+                'p95': round(percentile(timings, 95), 2),
+                'p99': round(percentile(timings, 99), 2),
+                'mean': round(statistics.fmean(timings), 2),
+                'min': round(timings[0], 2),
+                'max': round(timings[-1], 2),
+            },
+        }
+
+    def print_summary(self, results):
+        self.stdout.write(f'{"route":<52} {"status":>6} {"queries":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}')
+        for key, result in results['routes'].items():
+            self.stdout.write(
+                f'{key[:52]:<52} {result["status"]:>6} {result["queries"]["max"]:>8} '
+                f'{result["ms"]["p50"]:>8.1f} {result["ms"]["p95"]:>8.1f} {result["ms"]["p99"]:>8.1f}'
+            )
@@ -0,0 +1,83 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models.signals import post_save
+from django.test.utils import CaptureQueriesContext
+from lab.models import (
+    UserProfile, Scenario, Notification, create_user_profile_signal, notify_students_of_scenario
+)
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the cost of publishing one scenario to N students (all changes are rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--students', type=int, nargs='+', default=[1000, 10000, 100000],
+            help='Cohort sizes to benchmark (default: 1000 10000 100000)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help='Notification batch size (default: LAB_NOTIFICATION_BATCH_SIZE)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{"students":>10} {"seconds":>10} {"queries":>8} {"notifications":>14}')
+        for count in options['students']:
+            seconds, queries, created = self.run_once(count, options['batch_size'])
+            self.stdout.write(f'{count:>10} {seconds:>10.3f} {queries:>8} {created:>14}')
+
+    def run_once(self, count, batch_size):
+        result = {}
+        try:
+            with transaction.atomic():
+                admin_user = self.seed_students(count)
+
+                scenario = Scenario.objects.create(
+                    title='Benchmark Scenario',
+                    introduction='-', aim='-', objectives='-', description='-',
+                    created_by=admin_user,
+                )
+                # The post_save signal only enqueues the fan-out; time the job itself
+                with CaptureQueriesContext(connection) as ctx:
+                    start = time.perf_counter()
+                    notify_students_of_scenario(scenario, batch_size=batch_size)
+                    result['seconds'] = time.perf_counter() - start
+                result['queries'] = len(ctx.captured_queries)
+                result['created'] = Notification.objects.filter(link=f'/scenarios/{scenario.pk}/').count()
+                raise _Rollback
+        except _Rollback:
+            pass
+        return result['seconds'], result['queries'], result['created']
+
+    def seed_students(self, count):
+        """Bulk insert `count` student users with profiles, bypassing the per-user signal."""
+        post_save.disconnect(create_user_profile_signal, sender=User)
+        try:
+            admin_user = User.objects.create(username='bench_admin', is_superuser=True)
+            UserProfile.objects.create(user=admin_user, role='admin')
+
+            batch_size = 5000
+            for offset in range(0, count, batch_size):
+                size = min(batch_size, count - offset)
+                users = User.objects.bulk_create([
+                    User(username=f'bench_student_{offset + i}', password='!')
+                    for i in range(size)
+                ])
+                if not users or users[0].pk is None:
+                    # Backends that don't return ids from bulk_create
+                    users = list(User.objects.filter(
+                        username__startswith='bench_student_'
+                    ).order_by('-pk')[:size])
+                UserProfile.objects.bulk_create([
+                    UserProfile(user=user, role='student') for user in users
+                ])
+        finally:
+            post_save.connect(create_user_profile_signal, sender=User)
+        return admin_user
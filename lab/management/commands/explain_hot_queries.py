@@ -0,0 +1,50 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from lab.queries import hot_queries
+
+# SQLite: "SCAN lab_scenario" reads the whole table, "SCAN ... USING INDEX" walks
+# an index in order (paired with a LIMIT) and "SEARCH" seeks into one
+SQLITE_FULL_SCAN = re.compile(r'\bSCAN (?!CONSTANT ROW)(\S+)(?!.*\bUSING\b)')
+POSTGRES_FULL_SCAN = re.compile(r'Seq Scan on (\S+)')
+
+
+def full_scans(plan):
+    """Return the tables the plan reads with a full table scan."""
+    pattern = POSTGRES_FULL_SCAN if connection.vendor == 'postgresql' else SQLITE_FULL_SCAN
+    return [match.group(1) for line in plan.splitlines() for match in [pattern.search(line)] if match]
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the querysets on the views\' hot paths (lab/queries.py) and fail if any does a full table scan'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every plan, not only failing ones')
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            raise CommandError(f'explain_hot_queries supports SQLite and Postgres, not {connection.vendor}')
+
+        failures = []
+        for label, queryset in hot_queries().items():
+            with transaction.atomic():
+                if connection.vendor == 'postgresql':
+                    # On small tables Postgres prefers a sequential scan even when an index fits;
+                    # discouraging it shows whether a usable index exists at all
+                    with connection.cursor() as cursor:
+                        cursor.execute('SET LOCAL enable_seqscan = off')
+                plan = queryset.explain()
+            scans = full_scans(plan)
+            if scans:
+                failures.append(label)
+                self.stdout.write(self.style.ERROR(f'FULL SCAN  {label} ({", ".join(scans)})'))
+            else:
+                self.stdout.write(f'ok         {label}')
+            if scans or options['verbose_plans']:
+                for line in plan.splitlines():
+                    self.stdout.write(f'               {line}')
+
+        if failures:
+            raise CommandError(f'{len(failures)} hot queries fall back to a full table scan')
+        self.stdout.write(self.style.SUCCESS('Every hot query uses an index'))
@@ -0,0 +1,40 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from lab.synthetic import seed_lab
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a large, reproducible synthetic lab (students, scenarios, submissions, requirements, '
+        'feedback and notifications) with bulk inserts. Per-student counts are means.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=100000, help='Students to create (default: 100000)')
+        parser.add_argument('--scenarios', type=int, default=200, help='Scenarios to create (default: 200)')
+        parser.add_argument('--submissions-per-student', type=int, default=10, help='Mean submissions per student (default: 10)')
+        parser.add_argument(
+            '--requirements-per-submission', type=int, default=10,
+            help='Mean requirements per submitted submission; drafts get fewer (default: 10)'
+        )
+        parser.add_argument('--notifications-per-student', type=int, default=20, help='Mean scenario notifications per student (default: 20)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Students written per transaction (default: 1000)')
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__in=['lab_admin', 'student000000']).exists():
+            raise CommandError('Synthetic data already exists in this database')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1')
+
+        seed_lab(
+            students=options['students'],
+            scenarios=options['scenarios'],
+            submissions_per_student=options['submissions_per_student'],
+            requirements_per_submission=options['requirements_per_submission'],
+            notifications_per_student=options['notifications_per_student'],
+            seed=options['seed'],
+            chunk_size=options['chunk_size'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS('Synthetic lab generated'))
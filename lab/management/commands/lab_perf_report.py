@@ -0,0 +1,69 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from lab.models import RequestTiming
+from lab.perf import percentile
+
+
+class Command(BaseCommand):
+    help = 'Summarize the request timings recorded by lab.perf.PerfMiddleware'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=24, help='Only include samples from the last N hours (default: 24)')
+        parser.add_argument('--view', default=None, help='Only report this URL name')
+        parser.add_argument(
+            '--repeat-threshold', type=int, default=5,
+            help='Flag views that run the same statement at least this many times in one request (default: 5)'
+        )
+        parser.add_argument('--purge', action='store_true', help='Delete samples older than the reporting window')
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(hours=options['hours'])
+        samples = RequestTiming.objects.filter(created_at__gte=since)
+        if options['view']:
+            samples = samples.filter(view_name=options['view'])
+
+        views = defaultdict(list)
+        rows = samples.order_by('created_at').values_list(
+            'view_name', 'duration_ms', 'db_ms', 'template_ms', 'query_count', 'max_repeated_queries'
+        )
+        for view_name, *values in rows.iterator():
+            views[view_name].append(values)
+
+        if not views:
+            self.stdout.write('No request timings recorded in this window')
+        else:
+            self.stdout.write(
+                f'{"view":<32} {"n":>6} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} '
+                f'{"db p95":>8} {"tpl p95":>8} {"q p50":>6} {"q max":>6}  flags'
+            )
+        for view_name, values in sorted(views.items()):
+            duration, db, template, queries = (sorted(column) for column in list(zip(*values))[:4])
+            flags = self.flags(values, options['repeat_threshold'])
+            self.stdout.write(
+                f'{view_name[:32]:<32} {len(values):>6} {percentile(duration, 50):>8.1f} '
+                f'{percentile(duration, 95):>8.1f} {percentile(duration, 99):>8.1f} '
+                f'{percentile(db, 95):>8.1f} {percentile(template, 95):>8.1f} '
+                f'{percentile(queries, 50):>6} {queries[-1]:>6}  {", ".join(flags)}'
+            )
+
+        if options['purge']:
+            deleted, _ = RequestTiming.objects.filter(created_at__lt=since).delete()
+            self.stdout.write(f'Purged {deleted} older samples')
+
+    def flags(self, values, repeat_threshold):
+        """Flag views whose query count scales with the amount of data."""
+        flags = []
+        repeated = max(value[4] for value in values)
+        if repeated >= repeat_threshold:
+            flags.append(f'N+1? (one statement x{repeated})')
+        # Samples are in time order; compare the newest third against the oldest
+        third = len(values) // 3
+        if third:
+            oldest = sorted(value[3] for value in values[:third])
+            newest = sorted(value[3] for value in values[-third:])
+            if percentile(newest, 50) > percentile(oldest, 50):
+                flags.append(f'queries growing ({percentile(oldest, 50)} -> {percentile(newest, 50)})')
+        return flags
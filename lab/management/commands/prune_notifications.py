@@ -0,0 +1,66 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from lab.models import Notification, NotificationArchive
+from lab.queries import expired_notifications
+
+
+class Command(BaseCommand):
+    help = 'Delete (or archive) read notifications older than the retention period, in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=None,
+            help='Keep read notifications newer than this many days (default: LAB_NOTIFICATION_RETENTION_DAYS)'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per delete transaction (default: 1000)')
+        parser.add_argument('--sleep', type=float, default=0.0, help='Seconds to pause between batches')
+        parser.add_argument('--archive', action='store_true', help='Copy rows to NotificationArchive before deleting')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many rows would be pruned')
+
+    def handle(self, *args, **options):
+        days = options['days']
+        if days is None:
+            days = getattr(settings, 'LAB_NOTIFICATION_RETENTION_DAYS', 90)
+        cutoff = timezone.now() - timedelta(days=days)
+        # Unread notifications are never pruned, so the unread counters are unaffected
+        expired = expired_notifications(cutoff)
+
+        if options['dry_run']:
+            self.stdout.write(f'{expired.count()} read notifications older than {days} days would be pruned')
+            return
+
+        pruned = 0
+        while True:
+            # Short transactions on a handful of rows keep lock times low
+            with transaction.atomic():
+                if options['archive']:
+                    batch = list(expired.order_by('created_at')[:options['batch_size']])
+                    NotificationArchive.objects.bulk_create([
+                        NotificationArchive(
+                            original_id=notification.pk,
+                            user_id=notification.user_id,
+                            title=notification.title,
+                            message=notification.message,
+                            link=notification.link,
+                            created_at=notification.created_at,
+                        )
+                        for notification in batch
+                    ])
+                    batch = [notification.pk for notification in batch]
+                else:
+                    batch = list(expired.order_by('created_at').values_list('pk', flat=True)[:options['batch_size']])
+                if not batch:
+                    break
+                Notification.objects.filter(pk__in=batch).delete()
+            pruned += len(batch)
+            self.stdout.write(f'Pruned {pruned} notifications...')
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        action = 'Archived' if options['archive'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'{action} {pruned} read notifications older than {days} days'))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from lab.models import UserProfile, StudentProgress
+from lab.progress import compute_progress, count_active_scenarios
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the StudentProgress rows used by the student dashboard'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Students per chunk (default: 1000)')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        total_active_scenarios = count_active_scenarios()
+        student_ids = UserProfile.objects.filter(role='student').order_by('user_id').values_list('user_id', flat=True)
+
+        rebuilt = 0
+        last_id = 0
+        while True:
+            chunk = list(student_ids.filter(user_id__gt=last_id)[:chunk_size])
+            if not chunk:
+                break
+            progress = compute_progress(chunk)
+            with transaction.atomic():
+                StudentProgress.objects.bulk_create(
+                    [
+                        StudentProgress(
+                            student_id=student_id,
+                            completed_count=completed,
+                            active_with_work_count=active_with_work,
+                            total_active_scenarios=total_active_scenarios,
+                        )
+                        for student_id, (completed, active_with_work) in progress.items()
+                    ],
+                    update_conflicts=True,
+                    unique_fields=['student'],
+                    update_fields=['completed_count', 'active_with_work_count', 'total_active_scenarios', 'updated_at'],
+                )
+            rebuilt += len(chunk)
+            last_id = chunk[-1]
+            self.stdout.write(f'Rebuilt {rebuilt} progress rows...')
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt progress for {rebuilt} students'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from lab.stats import recompute_lab_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the admin statistics snapshot from the source tables'
+
+    def handle(self, *args, **options):
+        stats = recompute_lab_stats()
+        self.stdout.write(
+            f'Scenarios: {stats.total_scenarios}, students: {stats.total_students}, '
+            f'submissions: {stats.total_submissions} '
+            f'(draft {stats.draft_submissions}, submitted {stats.submitted_submissions}, '
+            f'feedback {stats.feedback_received_submissions})'
+        )
+        self.stdout.write(self.style.SUCCESS('Lab statistics recomputed'))
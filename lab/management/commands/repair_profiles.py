@@ -0,0 +1,52 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from lab.models import UserProfile
+from lab.roles import invalidate_role
+from lab.stats import apply_stats_delta
+from lab.student_ids import allocate_student_ids
+
+
+class Command(BaseCommand):
+    help = (
+        'Create missing user profiles and give superusers the admin role. '
+        'Views never repair profiles themselves, so run this after importing users by other means.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without writing')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        missing = list(User.objects.filter(userprofile__isnull=True).only('id', 'username', 'is_superuser'))
+        demoted = list(
+            UserProfile.objects.filter(user__is_superuser=True).exclude(role='admin').select_related('user')
+        )
+        for user in missing:
+            self.stdout.write(f'Missing profile: {user.username}')
+        for profile in demoted:
+            self.stdout.write(f'Superuser without admin role: {profile.user.username}')
+        if dry_run:
+            self.stdout.write(f'{len(missing)} profiles to create, {len(demoted)} to promote (dry run)')
+            return
+
+        with transaction.atomic():
+            students = [user for user in missing if not user.is_superuser]
+            student_ids = iter(allocate_student_ids(len(students)))
+            # bulk_create sends no post_save, so stats and cached roles are updated here
+            UserProfile.objects.bulk_create([
+                UserProfile(user=user, role='admin') if user.is_superuser
+                else UserProfile(user=user, role='student', student_id=next(student_ids))
+                for user in missing
+            ])
+            apply_stats_delta(total_students=len(students))
+            for user in missing:
+                invalidate_role(user.pk)
+            # save() so the stats and role signals run
+            for profile in demoted:
+                profile.role = 'admin'
+                profile.save(update_fields=['role'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(missing)} profiles, promoted {len(demoted)} superusers'
+        ))
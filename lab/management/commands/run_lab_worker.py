@@ -0,0 +1,73 @@
+import os
+import signal
+import socket
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from lab.jobs import claim_job, run_job
+
+
+class Command(BaseCommand):
+    help = 'Run background job workers for the Requirements Lab'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Number of worker threads (default: 2)')
+        parser.add_argument(
+            '--visibility-timeout', type=int, default=None,
+            help='Seconds a claimed job stays invisible to other workers (default: LAB_JOB_VISIBILITY_TIMEOUT)'
+        )
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--burst', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *args: self.stop.set())
+
+        threads = []
+        for index in range(options['workers']):
+            worker_id = f'{socket.gethostname()}:{os.getpid()}:{index}'
+            thread = threading.Thread(
+                target=self.work,
+                args=(worker_id, options['visibility_timeout'], options['poll_interval'], options['burst']),
+                name=worker_id,
+                daemon=True,
+            )
+            thread.start()
+            threads.append(thread)
+
+        self.stdout.write(self.style.SUCCESS(f'Started {len(threads)} lab worker(s)'))
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=0.5)
+        except KeyboardInterrupt:
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+        self.stdout.write('Lab workers stopped')
+
+    def work(self, worker_id, visibility_timeout, poll_interval, burst):
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                try:
+                    job_obj = claim_job(worker_id, visibility_timeout)
+                except Exception as exc:
+                    # e.g. "database is locked" on SQLite; try again shortly
+                    self.stderr.write(f'[{worker_id}] could not claim job: {exc}')
+                    time.sleep(poll_interval)
+                    continue
+
+                if job_obj is None:
+                    if burst:
+                        break
+                    time.sleep(poll_interval)
+                    continue
+
+                ok = run_job(job_obj)
+                status = 'done' if ok else job_obj.status
+                self.stdout.write(f'[{worker_id}] {job_obj.name} #{job_obj.pk}: {status}')
+        finally:
+            connection.close()
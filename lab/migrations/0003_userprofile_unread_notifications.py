@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-17 12:07
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_unread_notifications(apps, schema_editor):
+    UserProfile = apps.get_model('lab', 'UserProfile')
+    Notification = apps.get_model('lab', 'Notification')
+    unread = Notification.objects.filter(
+        user_id=OuterRef('user_id'), is_read=False
+    ).order_by().values('user_id').annotate(total=Count('id')).values('total')
+    UserProfile.objects.update(unread_notifications=Coalesce(Subquery(unread), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lab', '0002_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='unread_notifications',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_unread_notifications, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.4 on 2026-10-17 12:13
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lab', '0004_studentprogress'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LabStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_scenarios', models.PositiveIntegerField(default=0)),
+                ('total_students', models.PositiveIntegerField(default=0)),
+                ('total_submissions', models.PositiveIntegerField(default=0)),
+                ('draft_submissions', models.PositiveIntegerField(default=0)),
+                ('submitted_submissions', models.PositiveIntegerField(default=0)),
+                ('feedback_received_submissions', models.PositiveIntegerField(default=0)),
+                ('recomputed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name_plural': 'Lab stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='ScenarioStats',
+            fields=[
+                ('scenario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='lab.scenario')),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('draft', models.PositiveIntegerField(default=0)),
+                ('submitted', models.PositiveIntegerField(default=0)),
+                ('feedback_received', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Scenario stats',
+            },
+        ),
+    ]
@@ -0,0 +1,104 @@
+# Generated by Django 5.2.4 on 2026-10-17 12:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE lab_submission_fts USING fts5(document, tokenize='trigram')",
+    """CREATE TRIGGER lab_submission_fts_ai AFTER INSERT ON lab_submissionsearchdocument BEGIN
+        INSERT INTO lab_submission_fts(rowid, document) VALUES (new.submission_id, new.document);
+    END""",
+    """CREATE TRIGGER lab_submission_fts_ad AFTER DELETE ON lab_submissionsearchdocument BEGIN
+        DELETE FROM lab_submission_fts WHERE rowid = old.submission_id;
+    END""",
+    """CREATE TRIGGER lab_submission_fts_au AFTER UPDATE ON lab_submissionsearchdocument BEGIN
+        DELETE FROM lab_submission_fts WHERE rowid = old.submission_id;
+        INSERT INTO lab_submission_fts(rowid, document) VALUES (new.submission_id, new.document);
+    END""",
+]
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS lab_submission_fts_ai",
+    "DROP TRIGGER IF EXISTS lab_submission_fts_ad",
+    "DROP TRIGGER IF EXISTS lab_submission_fts_au",
+    "DROP TABLE IF EXISTS lab_submission_fts",
+]
+POSTGRES_CREATE = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX lab_submission_search_trgm ON lab_submissionsearchdocument USING gin (document gin_trgm_ops)",
+]
+POSTGRES_DROP = [
+    "DROP INDEX IF EXISTS lab_submission_search_trgm",
+]
+
+
+def run_statements(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        try:
+            run_statements(schema_editor, SQLITE_CREATE)
+        except Exception:
+            # SQLite built without FTS5 or the trigram tokenizer (< 3.34):
+            # search falls back to the unindexed filter
+            run_statements(schema_editor, SQLITE_DROP)
+    elif vendor == 'postgresql':
+        # Needs permission to create the pg_trgm extension; run in a savepoint
+        # so a failure leaves the migration (and the fallback search) intact
+        from django.db import transaction
+        try:
+            with transaction.atomic(using=schema_editor.connection.alias):
+                run_statements(schema_editor, POSTGRES_CREATE)
+        except Exception:
+            pass
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        run_statements(schema_editor, SQLITE_DROP)
+    elif vendor == 'postgresql':
+        run_statements(schema_editor, POSTGRES_DROP)
+
+
+def populate_search_documents(apps, schema_editor):
+    ScenarioSubmission = apps.get_model('lab', 'ScenarioSubmission')
+    SubmissionSearchDocument = apps.get_model('lab', 'SubmissionSearchDocument')
+    UserProfile = apps.get_model('lab', 'UserProfile')
+    student_ids = dict(UserProfile.objects.values_list('user_id', 'student_id'))
+    rows = ScenarioSubmission.objects.order_by().values_list(
+        'pk', 'student_id', 'student__username', 'student__first_name', 'student__last_name', 'scenario__title'
+    )
+    batch = []
+    for pk, user_id, username, first_name, last_name, title in rows.iterator(chunk_size=1000):
+        parts = [username, first_name, last_name, student_ids.get(user_id), title]
+        batch.append(SubmissionSearchDocument(
+            submission_id=pk, document=' '.join(part for part in parts if part).lower()
+        ))
+        if len(batch) >= 1000:
+            SubmissionSearchDocument.objects.bulk_create(batch)
+            batch = []
+    SubmissionSearchDocument.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lab', '0005_labstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionSearchDocument',
+            fields=[
+                ('submission', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='lab.scenariosubmission')),
+                ('document', models.TextField()),
+            ],
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(populate_search_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.4 on 2026-10-17 12:18
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+FIRST_VALUE = 1000000
+
+
+def prepare_student_ids(apps, schema_editor):
+    IdSequence = apps.get_model('lab', 'IdSequence')
+    UserProfile = apps.get_model('lab', 'UserProfile')
+
+    # Blank IDs would collide under the unique constraint; NULLs don't
+    UserProfile.objects.filter(student_id='').update(student_id=None)
+
+    # Re-issue duplicated IDs (keeping the oldest profile's) from the new sequence
+    next_value = FIRST_VALUE
+    duplicated = (
+        UserProfile.objects.exclude(student_id=None).values('student_id')
+        .annotate(total=Count('id')).filter(total__gt=1).values_list('student_id', flat=True)
+    )
+    for student_id in list(duplicated):
+        for profile in UserProfile.objects.filter(student_id=student_id).order_by('id')[1:]:
+            profile.student_id = f'STU{next_value:06d}'
+            profile.save(update_fields=['student_id'])
+            next_value += 1
+
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'CREATE SEQUENCE IF NOT EXISTS lab_student_id_seq START WITH {next_value}')
+    else:
+        IdSequence.objects.update_or_create(name='student_id', defaults={'next_value': next_value})
+
+
+def drop_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP SEQUENCE IF EXISTS lab_student_id_seq')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lab', '0007_notification_retention'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdSequence',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('next_value', models.BigIntegerField()),
+            ],
+        ),
+        migrations.RunPython(prepare_student_ids, drop_sequence),
+        migrations.AddConstraint(
+            model_name='userprofile',
+            constraint=models.UniqueConstraint(fields=('student_id',), name='lab_unique_student_id'),
+        ),
+    ]
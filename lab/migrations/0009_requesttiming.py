@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-17 12:27
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lab', '0008_student_id_allocator'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestTiming',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('view_name', models.CharField(max_length=200)),
+                ('method', models.CharField(max_length=10)),
+                ('status_code', models.PositiveSmallIntegerField()),
+                ('duration_ms', models.FloatField()),
+                ('db_ms', models.FloatField()),
+                ('template_ms', models.FloatField()),
+                ('query_count', models.PositiveIntegerField()),
+                ('max_repeated_queries', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['view_name', 'created_at'], name='lab_timing_view_created'), models.Index(fields=['created_at'], name='lab_timing_created')],
+            },
+        ),
+    ]
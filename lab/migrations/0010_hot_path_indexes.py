@@ -0,0 +1,51 @@
+# Generated by Django 5.2.4 on 2026-10-17 12:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lab', '0009_requesttiming'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='notification',
+            name='lab_notif_read_created',
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['user', '-created_at'], name='lab_notif_user_unread'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', True)), fields=['created_at'], name='lab_notif_read_created'),
+        ),
+        migrations.AddIndex(
+            model_name='requirement',
+            index=models.Index(fields=['submission', 'requirement_type', '-created_at'], name='lab_req_sub_type_created'),
+        ),
+        migrations.AddIndex(
+            model_name='scenario',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-created_at'], name='lab_scenario_active_created'),
+        ),
+        migrations.AddIndex(
+            model_name='scenariosubmission',
+            index=models.Index(fields=['student', 'status'], name='lab_sub_student_status'),
+        ),
+        migrations.AddIndex(
+            model_name='scenariosubmission',
+            index=models.Index(fields=['status', 'submitted_at'], name='lab_sub_status_submitted'),
+        ),
+        migrations.AddIndex(
+            model_name='scenariosubmission',
+            index=models.Index(fields=['-updated_at'], name='lab_sub_updated'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['role', 'created_at'], name='lab_profile_role_created'),
+        ),
+    ]
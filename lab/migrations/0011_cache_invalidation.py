@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-17 12:41
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lab', '0010_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheInvalidation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=250)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
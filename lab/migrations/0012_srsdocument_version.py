@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 13:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lab', '0011_cache_invalidation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='srsdocument',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 13:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lab', '0012_srsdocument_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scenario',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -1,11 +1,10 @@
-from django.db import models
+from django.db import models, transaction
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.utils import timezone
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
 from django.dispatch import receiver
-import random
-import string
 
 
 class UserProfile(models.Model):
@@ -17,21 +16,26 @@ class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default='student')
     student_id = models.CharField(max_length=20, blank=True, null=True)
+    # Denormalized count of unread notifications, see lab/counters.py
+    unread_notifications = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
         return f"{self.user.username} ({self.role})"
     
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student_id'], name='lab_unique_student_id'),
+        ]
+        indexes = [
+            # Newest students on the admin dashboard
+            models.Index(fields=['role', 'created_at'], name='lab_profile_role_created'),
+        ]
+    
     def generate_student_id(self):
         """Generate a unique student ID starting with STU"""
-        while True:
-            # Generate random 6-digit number
-            random_number = ''.join(random.choices(string.digits, k=6))
-            student_id = f"STU{random_number}"
-            
-            # Check if this ID already exists
-            if not UserProfile.objects.filter(student_id=student_id).exists():
-                return student_id
+        from .student_ids import allocate_student_id
+        return allocate_student_id()
 
 
 @receiver(post_save, sender=User)
@@ -39,14 +43,24 @@ def create_user_profile_signal(sender, instance, created, **kwargs):
     if created:
         # Create profile for new users
         role = 'admin' if instance.is_superuser else 'student'
-        profile, profile_created = UserProfile.objects.get_or_create(
-            user=instance,
-            defaults={'role': role}
-        )
-        # Generate student_id for student profiles if not already set
-        if profile_created and role == 'student' and not profile.student_id:
-            profile.student_id = profile.generate_student_id()
-            profile.save()
+        defaults = {'role': role}
+        if role == 'student':
+            # Allocated from this process's block, so normally no query
+            from .student_ids import allocate_student_id
+            defaults['student_id'] = allocate_student_id()
+        UserProfile.objects.get_or_create(user=instance, defaults=defaults)
+
+
+class IdSequence(models.Model):
+    """
+    Named counter used to hand out blocks of IDs on databases without native
+    sequences (see lab/student_ids.py).
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    next_value = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.name}: {self.next_value}"
 
 
 class Scenario(models.Model):
@@ -66,9 +80,16 @@ class Scenario(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
+    # Set when an admin deletes the scenario; the row is removed by the delete_scenario job
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Active scenarios in the default (newest first) order. Partial rather than
+            # leading with is_active: SQLite can't seek an index on a bare boolean column
+            models.Index(fields=['-created_at'], condition=models.Q(is_active=True), name='lab_scenario_active_created'),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.created_by.username}"
@@ -93,6 +114,14 @@ class ScenarioSubmission(models.Model):
     class Meta:
         unique_together = ['scenario', 'student']
         ordering = ['-updated_at']
+        indexes = [
+            # A student's submissions, optionally by status (the unique index leads with scenario)
+            models.Index(fields=['student', 'status'], name='lab_sub_student_status'),
+            # Latest submissions awaiting review
+            models.Index(fields=['status', 'submitted_at'], name='lab_sub_status_submitted'),
+            # Admin submission list in the default order
+            models.Index(fields=['-updated_at'], name='lab_sub_updated'),
+        ]
     
     def __str__(self):
         return f"{self.student.username} - {self.scenario.title}"
@@ -126,6 +155,10 @@ class Requirement(models.Model):
     
     class Meta:
         ordering = ['requirement_type', '-created_at']
+        indexes = [
+            # A submission's requirements (by type) in the default order
+            models.Index(fields=['submission', 'requirement_type', '-created_at'], name='lab_req_sub_type_created'),
+        ]
     
     def __str__(self):
         return f"{self.get_requirement_type_display()}: {self.title}"
@@ -159,6 +192,8 @@ class SRSDocument(models.Model):
     external_interface_requirements = models.TextField(blank=True)
     non_functional_requirements = models.TextField(blank=True)
     other_requirements = models.TextField(blank=True)
+    # Bumped by every autosave, which is rejected if written against an older one (see lab/srs.py)
+    version = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -175,20 +210,413 @@ class Notification(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # A user's notification page
+            models.Index(fields=['user', '-created_at'], name='lab_notif_user_created'),
+            # Unread counts and badges (partial for the same reason as on Scenario)
+            models.Index(fields=['user', '-created_at'], condition=models.Q(is_read=False), name='lab_notif_user_unread'),
+            # prune_notifications
+            models.Index(fields=['created_at'], condition=models.Q(is_read=True), name='lab_notif_read_created'),
+        ]
     
     def __str__(self):
         return f"Notification for {self.user.username}: {self.title}"
 
+class NotificationArchive(models.Model):
+    """Read notifications moved out of the live table by `manage.py prune_notifications --archive`"""
+    original_id = models.BigIntegerField()
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_notifications')
+    title = models.CharField(max_length=200)
+    message = models.TextField()
+    link = models.URLField(blank=True, null=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Archived notification for {self.user_id}: {self.title}"
+
+class StudentProgress(models.Model):
+    """Denormalized per-student progress for the dashboard, see lab/progress.py"""
+    student = models.OneToOneField(User, on_delete=models.CASCADE, related_name='progress')
+    # Submissions that are submitted or have feedback
+    completed_count = models.PositiveIntegerField(default=0)
+    # Draft submissions with at least one requirement
+    active_with_work_count = models.PositiveIntegerField(default=0)
+    total_active_scenarios = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Progress for {self.student.username}"
+
+    @property
+    def progress_percentage(self):
+        if not self.total_active_scenarios:
+            return 0
+        # Active work counts as half a scenario
+        total_progress = self.completed_count + 0.5 * self.active_with_work_count
+        return round(total_progress / self.total_active_scenarios * 100)
+
+class LabStats(models.Model):
+    """
+    Single-row snapshot of the admin statistics, kept current by signal
+    deltas and fully recomputed on demand (see lab/stats.py).
+    """
+    total_scenarios = models.PositiveIntegerField(default=0)
+    total_students = models.PositiveIntegerField(default=0)
+    total_submissions = models.PositiveIntegerField(default=0)
+    draft_submissions = models.PositiveIntegerField(default=0)
+    submitted_submissions = models.PositiveIntegerField(default=0)
+    feedback_received_submissions = models.PositiveIntegerField(default=0)
+    recomputed_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name_plural = 'Lab stats'
+
+    def __str__(self):
+        return f"Lab stats as of {self.updated_at}"
+
+class ScenarioStats(models.Model):
+    """Per-scenario submission counts for the admin submissions page"""
+    scenario = models.OneToOneField(Scenario, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    total = models.PositiveIntegerField(default=0)
+    draft = models.PositiveIntegerField(default=0)
+    submitted = models.PositiveIntegerField(default=0)
+    feedback_received = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'Scenario stats'
+
+    def __str__(self):
+        return f"Stats for scenario {self.scenario_id}"
+
+class SubmissionSearchDocument(models.Model):
+    """
+    Denormalized, lowercased search text for one submission: the student's
+    names, username and student ID plus the scenario title (see lab/search.py).
+    """
+    submission = models.OneToOneField(ScenarioSubmission, on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+    document = models.TextField()
+
+    def __str__(self):
+        return f"Search document for submission {self.submission_id}"
+
+class Job(models.Model):
+    """A unit of background work, executed by `manage.py run_lab_worker`."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['run_after', 'id']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='lab_job_status_run_after'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+class RequestTiming(models.Model):
+    """One request sampled by `lab.perf.PerfMiddleware`, read by `manage.py lab_perf_report`."""
+    view_name = models.CharField(max_length=200)
+    method = models.CharField(max_length=10)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    db_ms = models.FloatField()
+    template_ms = models.FloatField()
+    query_count = models.PositiveIntegerField()
+    # Executions of the most repeated SQL statement, a sign of N+1 queries
+    max_repeated_queries = models.PositiveIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['view_name', 'created_at'], name='lab_timing_view_created'),
+            models.Index(fields=['created_at'], name='lab_timing_created'),
+        ]
+
+    def __str__(self):
+        return f"{self.view_name} {self.duration_ms:.1f}ms ({self.query_count} queries)"
+
+
+class CacheInvalidation(models.Model):
+    """
+    A key written through `lab.tiered_cache.TieredCache`. Every process polls
+    rows past the last id it has seen and evicts those keys from its L1.
+    """
+    key = models.CharField(max_length=250)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.id}: {self.key}"
+
+def bulk_create_notifications(notifications):
+    """
+    bulk_create() notifications and bump the recipients' unread counters,
+    which the post_save signal would otherwise have done one row at a time.
+    """
+    from .counters import adjust_unread
+    Notification.objects.bulk_create(notifications)
+    adjust_unread({n.user_id for n in notifications if not n.is_read}, 1)
+    return len(notifications)
+
+def notify_students_of_scenario(scenario, batch_size=None):
+    """
+    Create a 'New Scenario Available' notification for every student.
+    Student ids are streamed from the database and notifications are inserted
+    in fixed-size bulk batches inside a single transaction. Students who
+    already have the notification are skipped, so running the job twice
+    (e.g. after its lock expired mid-run) notifies nobody twice.
+    Returns the number of notifications created.
+    """
+    if batch_size is None:
+        batch_size = getattr(settings, 'LAB_NOTIFICATION_BATCH_SIZE', 1000)
+
+    title = 'New Scenario Available'
+    message = f'A new scenario "{scenario.title}" has been added and is ready for you to work on.'
+    link = f'/scenarios/{scenario.pk}/'
+
+    student_ids = UserProfile.objects.filter(role='student').values_list('user_id', flat=True)
+
+    def create_batch(user_ids):
+        # Checked per batch so the lookup can use the (user, -created_at) index
+        notified = set(Notification.objects.filter(user_id__in=user_ids, link=link).values_list('user_id', flat=True))
+        return bulk_create_notifications([
+            Notification(user_id=user_id, title=title, message=message, link=link)
+            for user_id in user_ids if user_id not in notified
+        ])
+
+    created_count = 0
+    batch = []
+    with transaction.atomic():
+        for user_id in student_ids.iterator(chunk_size=batch_size):
+            batch.append(user_id)
+            if len(batch) >= batch_size:
+                created_count += create_batch(batch)
+                batch = []
+        if batch:
+            created_count += create_batch(batch)
+    return created_count
+
 # Signal to create notifications for new scenarios
 @receiver(post_save, sender=Scenario)
 def create_scenario_notification(sender, instance, created, **kwargs):
     if created and instance.is_active:
-        # Get all students
-        student_profiles = UserProfile.objects.filter(role='student')
-        for profile in student_profiles:
-            Notification.objects.create(
-                user=profile.user,
-                title='New Scenario Available',
-                message=f'A new scenario "{instance.title}" has been added and is ready for you to work on.',
-                link=f'/scenarios/{instance.pk}/'
-            )
+        from .jobs import enqueue
+        enqueue('notify_students_of_scenario', scenario_id=instance.pk)
+
+# Signals to keep the unread notification counters in step
+@receiver(post_save, sender=Notification)
+def update_unread_counter_on_save(sender, instance, created, **kwargs):
+    from .counters import adjust_unread, recount_unread
+    if created:
+        if not instance.is_read:
+            adjust_unread([instance.user_id], 1)
+    else:
+        # is_read may have flipped either way; recount this user
+        recount_unread(instance.user_id)
+
+@receiver(post_delete, sender=Notification)
+def update_unread_counter_on_delete(sender, instance, **kwargs):
+    from .counters import adjust_unread
+    if not instance.is_read:
+        adjust_unread([instance.user_id], -1)
+
+# Signals to drop cached submission counts when a student's submissions change
+@receiver(post_save, sender=ScenarioSubmission)
+@receiver(post_delete, sender=ScenarioSubmission)
+def invalidate_submission_counts_signal(sender, instance, **kwargs):
+    from .counters import invalidate_submission_counts
+    invalidate_submission_counts(instance.student_id)
+
+# Signals to bump the versions of cached fragments (see lab/fragments.py)
+@receiver(post_save, sender=Scenario)
+@receiver(post_delete, sender=Scenario)
+def bump_catalog_version_signal(sender, instance, **kwargs):
+    from .fragments import bump_catalog_version
+    bump_catalog_version()
+
+@receiver(post_save, sender=ScenarioSubmission)
+@receiver(post_delete, sender=ScenarioSubmission)
+def bump_submissions_version_signal(sender, instance, **kwargs):
+    from .fragments import bump_submissions_version
+    bump_submissions_version(instance.student_id)
+
+@receiver(post_save, sender=Requirement)
+@receiver(post_delete, sender=Requirement)
+@receiver(post_save, sender=Feedback)
+@receiver(post_delete, sender=Feedback)
+def bump_submission_owner_version_signal(sender, instance, origin=None, **kwargs):
+    from .fragments import bump_submissions_version
+    if isinstance(origin, models.QuerySet) and origin.model is Requirement:
+        # Requirement querysets are deleted by code that bumps once for the
+        # whole delete (see lab/requirement_batch.py)
+        return
+    student_id = ScenarioSubmission.objects.filter(pk=instance.submission_id).values_list('student_id', flat=True).first()
+    if student_id is not None:
+        bump_submissions_version(student_id)
+
+# Signals to keep StudentProgress rows up to date
+@receiver(pre_save, sender=ScenarioSubmission)
+def remember_submission_status(sender, instance, **kwargs):
+    instance._previous_status = None
+    if instance.pk:
+        instance._previous_status = ScenarioSubmission.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+
+@receiver(post_save, sender=ScenarioSubmission)
+def update_progress_on_submission_save(sender, instance, created, **kwargs):
+    from .progress import progress_state, apply_progress_delta
+    previous_status = getattr(instance, '_previous_status', None)
+    if previous_status == instance.status:
+        return
+    has_work = False
+    if 'draft' in (previous_status, instance.status):
+        has_work = instance.requirements.exists()
+    old_completed, old_active = progress_state(previous_status, has_work)
+    new_completed, new_active = progress_state(instance.status, has_work)
+    apply_progress_delta(instance.student_id, new_completed - old_completed, new_active - old_active)
+
+@receiver(pre_delete, sender=ScenarioSubmission)
+def remember_submission_work(sender, instance, **kwargs):
+    # Read before the cascade removes the requirements
+    instance._had_work = instance.status == 'draft' and instance.requirements.exists()
+
+@receiver(post_delete, sender=ScenarioSubmission)
+def update_progress_on_submission_delete(sender, instance, **kwargs):
+    from .progress import progress_state, apply_progress_delta
+    # The cascaded requirement deletes leave the active count to this signal
+    completed, active = progress_state(instance.status, getattr(instance, '_had_work', False))
+    apply_progress_delta(instance.student_id, completed=-completed, active_with_work=-active)
+
+@receiver(post_save, sender=Requirement)
+def update_progress_on_requirement_save(sender, instance, created, **kwargs):
+    from .progress import apply_progress_delta
+    if not created:
+        return
+    submission = ScenarioSubmission.objects.filter(pk=instance.submission_id).values('status', 'student_id').first()
+    if submission and submission['status'] == 'draft':
+        # Only the first requirement turns a draft into active work
+        if not Requirement.objects.filter(submission_id=instance.submission_id).exclude(pk=instance.pk).exists():
+            apply_progress_delta(submission['student_id'], active_with_work=1)
+
+@receiver(post_delete, sender=Requirement)
+def update_progress_on_requirement_delete(sender, instance, origin=None, **kwargs):
+    from .progress import apply_progress_delta
+    # Single-instance deletes only. Cascades from a submission (or anything above
+    # it) are counted by update_progress_on_submission_delete, and requirement
+    # querysets are deleted by code that counts them itself (see lab/requirement_batch.py)
+    if origin is not instance:
+        return
+    submission = ScenarioSubmission.objects.filter(pk=instance.submission_id).values('status', 'student_id').first()
+    if submission and submission['status'] == 'draft':
+        if not Requirement.objects.filter(submission_id=instance.submission_id).exists():
+            apply_progress_delta(submission['student_id'], active_with_work=-1)
+
+@receiver(post_save, sender=Scenario)
+@receiver(post_delete, sender=Scenario)
+def update_progress_on_scenario_change(sender, instance, **kwargs):
+    from .progress import refresh_total_active_scenarios
+    refresh_total_active_scenarios()
+
+# Signals to keep the admin statistics snapshot current
+@receiver(post_save, sender=Scenario)
+def update_stats_on_scenario_save(sender, instance, created, **kwargs):
+    from .stats import apply_stats_delta
+    if created:
+        ScenarioStats.objects.create(scenario=instance)
+        apply_stats_delta(total_scenarios=1)
+
+@receiver(post_delete, sender=Scenario)
+def update_stats_on_scenario_delete(sender, instance, **kwargs):
+    from .stats import apply_stats_delta
+    apply_stats_delta(total_scenarios=-1)
+
+@receiver(pre_save, sender=UserProfile)
+def remember_profile_role(sender, instance, **kwargs):
+    instance._previous_role = None
+    if instance.pk:
+        instance._previous_role = UserProfile.objects.filter(pk=instance.pk).values_list('role', flat=True).first()
+
+@receiver(post_save, sender=UserProfile)
+def update_stats_on_profile_save(sender, instance, created, **kwargs):
+    from .stats import apply_stats_delta
+    was_student = getattr(instance, '_previous_role', None) == 'student'
+    is_student = instance.role == 'student'
+    apply_stats_delta(total_students=int(is_student) - int(was_student))
+
+@receiver(post_delete, sender=UserProfile)
+def update_stats_on_profile_delete(sender, instance, **kwargs):
+    from .stats import apply_stats_delta
+    if instance.role == 'student':
+        apply_stats_delta(total_students=-1)
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_role_signal(sender, instance, **kwargs):
+    from .roles import invalidate_role
+    invalidate_role(instance.user_id)
+
+@receiver(post_save, sender=ScenarioSubmission)
+def update_stats_on_submission_save(sender, instance, created, **kwargs):
+    from .stats import apply_submission_stats_delta
+    previous_status = getattr(instance, '_previous_status', None)
+    if previous_status == instance.status:
+        return
+    if previous_status:
+        apply_submission_stats_delta(instance.scenario_id, previous_status, -1, total=False)
+    apply_submission_stats_delta(instance.scenario_id, instance.status, 1, total=previous_status is None)
+
+@receiver(post_delete, sender=ScenarioSubmission)
+def update_stats_on_submission_delete(sender, instance, **kwargs):
+    from .stats import apply_submission_stats_delta
+    apply_submission_stats_delta(instance.scenario_id, instance.status, -1, total=True)
+
+# Signals to keep submission search documents up to date
+SEARCHED_USER_FIELDS = {'username', 'first_name', 'last_name'}
+
+@receiver(post_save, sender=ScenarioSubmission)
+def update_search_document_on_submission_save(sender, instance, created, **kwargs):
+    from .search import refresh_search_documents
+    if created:
+        refresh_search_documents(ScenarioSubmission.objects.filter(pk=instance.pk))
+
+@receiver(post_save, sender=User)
+def update_search_documents_on_user_save(sender, instance, created, update_fields=None, **kwargs):
+    from .search import refresh_search_documents
+    if created or (update_fields and not SEARCHED_USER_FIELDS.intersection(update_fields)):
+        # New users have no submissions; logins only touch last_login
+        return
+    refresh_search_documents(ScenarioSubmission.objects.filter(student_id=instance.pk))
+
+@receiver(post_save, sender=UserProfile)
+def update_search_documents_on_profile_save(sender, instance, created, update_fields=None, **kwargs):
+    from .search import refresh_search_documents
+    if created or (update_fields and 'student_id' not in update_fields):
+        return
+    refresh_search_documents(ScenarioSubmission.objects.filter(student_id=instance.user_id))
+
+@receiver(post_save, sender=Scenario)
+def update_search_documents_on_scenario_save(sender, instance, created, **kwargs):
+    from .jobs import enqueue
+    if not created:
+        # A scenario can have thousands of submissions; reindex in the background
+        enqueue('refresh_scenario_search_documents', scenario_id=instance.pk)
@@ -0,0 +1,163 @@
+"""
+Opt-in per-request performance sampling.
+
+With LAB_PERF_ENABLED, `PerfMiddleware` records for every request the number
+of SQL queries, the time spent in the database and in template rendering,
+and the total time, keyed by the URL name. Samples go into a bounded
+in-memory ring buffer (LAB_PERF_BUFFER_SIZE) that is written to the
+`RequestTiming` table at most every LAB_PERF_FLUSH_INTERVAL seconds; when
+the buffer fills up before that, the oldest samples are dropped.
+`manage.py lab_perf_report` summarizes the table.
+
+Template time is measured by the `TimedDjangoTemplates` backend configured in
+TEMPLATES. It includes any queries a template triggers, so it overlaps with
+the database time.
+"""
+import logging
+import math
+import threading
+import time
+from collections import Counter, deque
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError, connection
+from django.template.backends.django import DjangoTemplates
+
+from .models import RequestTiming
+
+logger = logging.getLogger(__name__)
+
+_state = threading.local()
+_lock = threading.Lock()
+_buffer = None
+_last_flush = time.monotonic()
+
+
+class _Sample:
+    """Query and render timings of the request being handled on this thread."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.rendering = False
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper() hook
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+            self.statements[sql] += 1
+
+
+class _TimedTemplate:
+    """A backend template that adds its render time to the request's sample."""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        sample = getattr(_state, 'sample', None)
+        if sample is None or sample.rendering:
+            # Not sampling, or a template rendered from inside one already being timed
+            return self.template.render(context, request)
+        sample.rendering = True
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            sample.template_time += time.perf_counter() - start
+            sample.rendering = False
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, timing renders while PerfMiddleware samples a request."""
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
+
+
+def get_buffer():
+    global _buffer
+    if _buffer is None:
+        _buffer = deque(maxlen=getattr(settings, 'LAB_PERF_BUFFER_SIZE', 1000))
+    return _buffer
+
+
+def record(timing):
+    """Add an unsaved RequestTiming to the buffer, flushing it when it is due."""
+    buffer = get_buffer()
+    with _lock:
+        buffer.append(timing)
+        due = time.monotonic() - _last_flush >= getattr(settings, 'LAB_PERF_FLUSH_INTERVAL', 60)
+    if due:
+        flush()
+
+
+def flush():
+    """Write the buffered samples to the database. Returns the number written."""
+    global _last_flush
+    buffer = get_buffer()
+    with _lock:
+        samples = list(buffer)
+        buffer.clear()
+        _last_flush = time.monotonic()
+    if not samples:
+        return 0
+    try:
+        RequestTiming.objects.bulk_create(samples)
+    except DatabaseError:
+        # Losing samples must never fail the request that triggered the flush
+        logger.warning('Could not store %d request timings', len(samples), exc_info=True)
+        return 0
+    return len(samples)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0
+    rank = max(1, math.ceil(pct / 100 * len(values)))
+    return values[rank - 1]
+
+
+class PerfMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'LAB_PERF_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sample = _Sample()
+        _state.sample = sample
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(sample):
+                response = self.get_response(request)
+        finally:
+            _state.sample = None
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        record(RequestTiming(
+            view_name=(match.view_name if match else '') or '<unresolved>',
+            method=request.method,
+            status_code=response.status_code,
+            duration_ms=duration * 1000,
+            db_ms=sample.db_time * 1000,
+            template_ms=sample.template_time * 1000,
+            query_count=sample.queries,
+            max_repeated_queries=max(sample.statements.values(), default=0),
+        ))
+        return response
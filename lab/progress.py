@@ -0,0 +1,78 @@
+"""
+Maintenance of the denormalized `StudentProgress` rows behind the student dashboard.
+
+Signals in lab/models.py apply small deltas as requirements, submissions and
+scenarios change. `refresh_student_progress` recomputes one row from scratch
+and is used for cold rows and bulk writes; `manage.py rebuild_progress`
+recomputes every row.
+"""
+from django.db.models import Count, Exists, F, OuterRef, Q, Value
+from django.db.models.functions import Greatest
+
+from .models import Scenario, ScenarioSubmission, Requirement, StudentProgress
+
+COMPLETED_STATUSES = ('submitted', 'feedback_received')
+
+
+def progress_state(status, has_work):
+    """Return the (completed, active_with_work) contribution of one submission."""
+    return (
+        1 if status in COMPLETED_STATUSES else 0,
+        1 if status == 'draft' and has_work else 0,
+    )
+
+
+def apply_progress_delta(student_id, completed=0, active_with_work=0):
+    if not completed and not active_with_work:
+        return
+    StudentProgress.objects.filter(student_id=student_id).update(
+        completed_count=Greatest(F('completed_count') + completed, Value(0)),
+        active_with_work_count=Greatest(F('active_with_work_count') + active_with_work, Value(0)),
+    )
+
+
+def count_active_scenarios():
+    return Scenario.objects.filter(is_active=True).count()
+
+
+def refresh_total_active_scenarios():
+    """Store the current number of active scenarios on every progress row."""
+    total = count_active_scenarios()
+    StudentProgress.objects.exclude(total_active_scenarios=total).update(total_active_scenarios=total)
+
+
+def compute_progress(student_ids):
+    """Return {student_id: (completed, active_with_work)} computed from the submissions table."""
+    has_work = Exists(Requirement.objects.filter(submission=OuterRef('pk')))
+    rows = ScenarioSubmission.objects.filter(student_id__in=student_ids).values('student_id').annotate(
+        completed=Count('id', filter=Q(status__in=COMPLETED_STATUSES)),
+        active_with_work=Count('id', filter=Q(has_work, status='draft')),
+    ).order_by()
+    result = {student_id: (0, 0) for student_id in student_ids}
+    for row in rows:
+        result[row['student_id']] = (row['completed'], row['active_with_work'])
+    return result
+
+
+def refresh_student_progress(student_id, total_active_scenarios=None):
+    """Recompute and store one student's progress row. Returns the row."""
+    if total_active_scenarios is None:
+        total_active_scenarios = count_active_scenarios()
+    completed, active_with_work = compute_progress([student_id])[student_id]
+    progress, created = StudentProgress.objects.update_or_create(
+        student_id=student_id,
+        defaults={
+            'completed_count': completed,
+            'active_with_work_count': active_with_work,
+            'total_active_scenarios': total_active_scenarios,
+        }
+    )
+    return progress
+
+
+def get_student_progress(user):
+    """Return the user's progress row, building it on first use."""
+    progress = StudentProgress.objects.filter(student_id=user.pk).first()
+    if progress is None:
+        progress = refresh_student_progress(user.pk)
+    return progress
@@ -0,0 +1,128 @@
+"""
+Querysets on the hot paths of the views.
+
+The views build these querysets through the functions below, and
+`manage.py explain_hot_queries` runs EXPLAIN on the same functions
+(`hot_queries()`), so a missing or unusable index shows up as a failing check
+rather than as a slow page.
+"""
+from django.contrib.auth.models import User
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import UserProfile, Scenario, ScenarioSubmission, Requirement, Feedback, Notification
+
+
+def requirement_count(requirement_type=None):
+    """
+    Correlated subquery counting a submission's requirements (optionally of one type).
+    Unlike Count() over a join it doesn't GROUP BY the whole submissions table,
+    and QuerySet.count() drops it when paginating.
+    """
+    requirements = Requirement.objects.filter(submission=OuterRef('pk'))
+    if requirement_type:
+        requirements = requirements.filter(requirement_type=requirement_type)
+    counts = requirements.order_by().values('submission').annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def active_scenarios():
+    return Scenario.objects.filter(is_active=True)
+
+
+def student_submissions(user, status=None):
+    submissions = ScenarioSubmission.objects.filter(student=user)
+    if status:
+        submissions = submissions.filter(status=status)
+    return submissions
+
+
+def recently_submitted(student=None):
+    submissions = ScenarioSubmission.objects.filter(status='submitted')
+    if student is not None:
+        submissions = submissions.filter(student=student)
+    return submissions.order_by('-submitted_at')
+
+
+def submission_requirements(submission):
+    """All of a submission's requirements in the default order; group them with requirements_by_type()."""
+    return submission.requirements.all()
+
+
+def requirements_by_type(requirements):
+    """Group requirements in memory into {'functional': [...], 'non_functional': [...], 'business': [...]}."""
+    grouped = {requirement_type: [] for requirement_type, _ in Requirement.REQUIREMENT_TYPES}
+    for requirement in requirements:
+        grouped.setdefault(requirement.requirement_type, []).append(requirement)
+    return grouped
+
+
+def user_notifications(user):
+    return Notification.objects.filter(user=user).order_by('-created_at')
+
+
+def unread_notifications(user_id):
+    return Notification.objects.filter(user_id=user_id, is_read=False)
+
+
+def expired_notifications(cutoff):
+    """Read notifications created before `cutoff`, see prune_notifications."""
+    return Notification.objects.filter(is_read=True, created_at__lt=cutoff)
+
+
+def recent_scenarios_by(user):
+    return Scenario.objects.filter(created_by=user).order_by('-created_at')
+
+
+def recent_feedback_by(user):
+    return Feedback.objects.filter(admin=user).order_by('-created_at')
+
+
+def newest_students():
+    return UserProfile.objects.filter(role='student').order_by('-created_at')
+
+
+def admin_submission_list(status=None):
+    """Submissions for the admin list, loading only the columns the cards render."""
+    submissions = ScenarioSubmission.objects.select_related(
+        'scenario', 'student', 'student__userprofile'
+    ).only(
+        'id', 'status', 'submitted_at', 'updated_at',
+        'scenario__id', 'scenario__title',
+        'student__id', 'student__username', 'student__first_name', 'student__last_name',
+        'student__userprofile__id', 'student__userprofile__student_id',
+    ).annotate(
+        requirement_count=requirement_count(),
+        functional_count=requirement_count('functional'),
+        non_functional_count=requirement_count('non_functional'),
+        business_count=requirement_count('business'),
+    ).order_by('-updated_at')
+    if status:
+        submissions = submissions.filter(status=status)
+    return submissions
+
+
+def hot_queries():
+    """{label: queryset} of the queries checked by `manage.py explain_hot_queries`."""
+    # Unsaved stand-ins are enough: EXPLAIN only needs the SQL shape
+    user = User(pk=1)
+    submission = ScenarioSubmission(pk=1)
+    return {
+        'student_dashboard: draft submissions': student_submissions(user, 'draft').select_related('scenario')[:5],
+        'student_dashboard: recent submissions': recently_submitted(user)[:5],
+        'scenario_list: scenarios': active_scenarios(),
+        'scenario_list: student submissions': student_submissions(user),
+        'scenario_detail: requirements': submission_requirements(submission),
+        'scenario_detail: student draft': student_submissions(user).filter(scenario_id=1),
+        'notifications: page': user_notifications(user)[:10],
+        'counters: unread notifications': unread_notifications(user.pk),
+        'prune_notifications: expired batch': expired_notifications(timezone.now()).order_by('created_at')[:1000],
+        'admin_dashboard: recent submissions': recently_submitted()[:5],
+        'admin_dashboard: recent scenarios': recent_scenarios_by(user)[:3],
+        'admin_dashboard: recent feedback': recent_feedback_by(user)[:3],
+        'admin_dashboard: recent students': newest_students()[:3],
+        'admin_submissions: page': admin_submission_list()[:12],
+        'admin_submissions: status filter': admin_submission_list('submitted')[:12],
+    }
+
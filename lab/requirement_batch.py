@@ -0,0 +1,310 @@
+"""
+Validation and batched writes of a submission's requirements, used by the
+JSON requirements API and the CSV/JSON import and export.
+
+A batch is validated as a whole before anything is written, then applied in
+one transaction: deletes, then one bulk_update, then one bulk_create.
+bulk_create and bulk_update send no signals, so apply_requirement_batch keeps
+the student's progress and the cached versions of their pages itself, with
+one version bump for the whole batch. Whether
+the draft has work is checked once before and once after the whole batch and
+applied as one delta. The per-row requirement signals leave queryset deletes
+alone, so any other bulk delete goes through delete_requirements().
+"""
+import csv
+import io
+import json
+import re
+from itertools import chain
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from .fragments import bump_submissions_version
+from .models import Requirement, ScenarioSubmission
+from .progress import apply_progress_delta
+
+FIELDS = ('requirement_type', 'title', 'description', 'priority')
+_WHITESPACE = re.compile(r'\s*')
+
+
+def serialize_requirement(requirement):
+    return {
+        'id': requirement.pk,
+        **{field: getattr(requirement, field) for field in FIELDS},
+        'created_at': requirement.created_at.isoformat(),
+        'updated_at': requirement.updated_at.isoformat(),
+    }
+
+
+def clean_requirement(data, requirement):
+    """Copy the editable fields of `data` onto `requirement` and validate it; raises ValidationError."""
+    if not isinstance(data, dict):
+        raise ValidationError('Expected an object.')
+    unknown = set(data) - set(FIELDS) - {'id'}
+    if unknown:
+        raise ValidationError({field: ['Unknown field.'] for field in sorted(unknown)})
+    for field in FIELDS:
+        if field in data:
+            setattr(requirement, field, data[field])
+    requirement.full_clean(exclude=['submission'], validate_unique=False)
+    return requirement
+
+
+def _is_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _messages(error):
+    return error.message_dict if hasattr(error, 'error_dict') else {'__all__': error.messages}
+
+
+def prepare_requirement_batch(submission, create=(), update=(), delete=()):
+    """
+    Validate a batch against `submission` without writing anything.
+
+    `create` is a list of requirement objects, `update` a list of objects with
+    an `id` and the fields to change, `delete` a list of ids. Returns
+    (batch, errors) where `errors` maps 'create.0', 'update.2', ... to messages.
+    """
+    errors = {}
+
+    creates = []
+    for i, data in enumerate(create):
+        try:
+            creates.append(clean_requirement(data, Requirement(submission=submission)))
+        except ValidationError as e:
+            errors[f'create.{i}'] = _messages(e)
+
+    delete_ids = []
+    for i, pk in enumerate(delete):
+        if _is_id(pk):
+            delete_ids.append(pk)
+        else:
+            errors[f'delete.{i}'] = {'id': ['Expected an integer id.']}
+    update_ids = [data.get('id') if isinstance(data, dict) else None for data in update]
+    wanted = [pk for pk in update_ids + delete_ids if _is_id(pk)]
+    existing = submission.requirements.in_bulk(wanted) if wanted else {}
+
+    updates = {}
+    for i, (data, pk) in enumerate(zip(update, update_ids)):
+        if not _is_id(pk) or pk not in existing:
+            errors[f'update.{i}'] = {'id': ['No such requirement in this submission.']}
+        elif pk in delete_ids:
+            errors[f'update.{i}'] = {'id': ['The requirement is also deleted in this batch.']}
+        else:
+            try:
+                updates[pk] = clean_requirement(data, existing[pk])
+            except ValidationError as e:
+                errors[f'update.{i}'] = _messages(e)
+
+    for i, pk in enumerate(delete):
+        if f'delete.{i}' not in errors and pk not in existing:
+            errors[f'delete.{i}'] = {'id': ['No such requirement in this submission.']}
+
+    return (creates, list(updates.values()), sorted(set(delete_ids))), errors
+
+
+def apply_requirement_batch(submission, creates, updates, delete_ids):
+    """Write a batch from prepare_requirement_batch() in one transaction; returns it with pks set."""
+    with transaction.atomic():
+        had_work = submission.requirements.exists()
+        if delete_ids:
+            Requirement.objects.filter(submission=submission, pk__in=delete_ids).delete()
+        if updates:
+            # bulk_update doesn't apply auto_now
+            now = timezone.now()
+            for requirement in updates:
+                requirement.updated_at = now
+            Requirement.objects.bulk_update(updates, [*FIELDS, 'updated_at'])
+        if creates:
+            Requirement.objects.bulk_create(creates)
+        if delete_ids or creates:
+            has_work = bool(creates) or (had_work and submission.requirements.exists())
+            _count_work_change(submission, had_work, has_work)
+        if creates or updates or delete_ids:
+            bump_submissions_version(submission.student_id)
+    return creates, updates, delete_ids
+
+
+def _count_work_change(submission, had_work, has_work):
+    if submission.status == 'draft' and had_work != has_work:
+        apply_progress_delta(submission.student_id, active_with_work=1 if has_work else -1)
+
+
+def delete_requirements(queryset):
+    """
+    Delete a queryset of requirements, from any number of submissions, and
+    take each draft it empties off its student's progress count. Returns the
+    number of requirements deleted.
+    """
+    with transaction.atomic():
+        submissions = list(
+            ScenarioSubmission.objects.filter(pk__in=queryset.values('submission_id'))
+            .values_list('pk', 'status', 'student_id')
+        )
+        deleted, _ = queryset.delete()
+        drafts = [pk for pk, status, _ in submissions if status == 'draft']
+        kept = set(
+            Requirement.objects.filter(submission_id__in=drafts).values_list('submission_id', flat=True).distinct()
+        ) if drafts else set()
+        for pk, status, student_id in submissions:
+            if status == 'draft' and pk not in kept:
+                apply_progress_delta(student_id, active_with_work=-1)
+        for student_id in {student_id for _, _, student_id in submissions}:
+            bump_submissions_version(student_id)
+    return deleted
+
+
+def read_requirement_rows(stream, file_format):
+    """
+    Yield (line number, row) from a CSV, JSON or NDJSON text stream, one row
+    at a time. A JSON file holds an array of objects, or one object per line.
+    A row that can't be parsed is yielded as a ValidationError.
+    """
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    if file_format == 'json':
+        # Peek past leading whitespace to tell an array from NDJSON
+        prefix = ''
+        while (char := stream.read(1)).isspace():
+            prefix += char
+        if char == '[':
+            yield from _json_array_rows(stream, prefix.count('\n') + 1)
+            return
+        stream = io.StringIO(prefix + char + stream.readline()), stream
+    else:
+        stream = (stream,)
+    for line_number, line in enumerate(chain.from_iterable(stream), 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as e:
+            yield line_number, ValidationError(f'Invalid JSON ({e})')
+
+
+def _json_array_rows(stream, line_number, chunk_size=64 * 1024):
+    """
+    Yield (line number, item) for the items of a JSON array whose '[' has
+    been read, decoding one item at a time from a buffer of a few chunks.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    expect_item = True
+    while True:
+        start = pos
+        pos = _WHITESPACE.match(buffer, pos).end()
+        line_number += buffer.count('\n', start, pos)
+        if pos == len(buffer) or expect_item:
+            item = end = None
+            if pos < len(buffer):
+                if expect_item and buffer[pos] == ']':
+                    return
+                try:
+                    item, end = decoder.raw_decode(buffer, pos)
+                except ValueError as e:
+                    error = e
+            if end is None:
+                # Empty, or the item may continue in the next chunk
+                chunk = stream.read(chunk_size)
+                if chunk:
+                    buffer = buffer[pos:] + chunk
+                    pos = 0
+                    continue
+                message = f'Invalid JSON ({error.msg})' if pos < len(buffer) else 'Invalid JSON (the array is not closed)'
+                yield line_number, ValidationError(message)
+                return
+            yield line_number, item
+            line_number += buffer.count('\n', pos, end)
+            pos = end
+            expect_item = False
+        elif buffer[pos] == ',':
+            pos += 1
+            expect_item = True
+        elif buffer[pos] == ']':
+            return
+        else:
+            yield line_number, ValidationError("Invalid JSON (expected ',' or ']')")
+            return
+
+
+def import_requirements(submission, rows, batch_size=500, max_errors=20):
+    """
+    Validate (line number, row) pairs from read_requirement_rows() one at a
+    time and bulk_create them in batches, all in one transaction. Columns
+    other than the requirement fields (id, created_at, ...) are ignored, so
+    an export can be imported again. Returns the number imported; raises
+    ValidationError listing up to `max_errors` bad lines, and then nothing is
+    kept.
+    """
+    limit = getattr(settings, 'LAB_REQUIREMENT_IMPORT_LIMIT', 2000)
+    errors = []
+    imported = 0
+    batch = []
+    with transaction.atomic():
+        had_work = submission.requirements.exists()
+        for count, (line_number, row) in enumerate(rows, 1):
+            if count > limit:
+                errors.append(f'Line {line_number}: more than {limit} requirements in one file.')
+                break
+            try:
+                if isinstance(row, ValidationError):
+                    raise row
+                # Empty cells count as missing, so defaults apply and required fields report as blank
+                if isinstance(row, dict):
+                    row = {field: row[field] for field in FIELDS if row.get(field) not in (None, '')}
+                requirement = clean_requirement(row, Requirement(submission=submission))
+            except ValidationError as e:
+                errors.append(f'Line {line_number}: ' + '; '.join(
+                    message if field == '__all__' else f'{field}: {message}'
+                    for field, messages in _messages(e).items() for message in messages
+                ))
+                if len(errors) >= max_errors:
+                    break
+                continue
+            if errors:
+                # Nothing will be kept; carry on only to report more errors
+                continue
+            batch.append(requirement)
+            if len(batch) >= batch_size:
+                Requirement.objects.bulk_create(batch)
+                imported += len(batch)
+                batch = []
+        if errors:
+            raise ValidationError(errors)
+        if batch:
+            Requirement.objects.bulk_create(batch)
+            imported += len(batch)
+        _count_work_change(submission, had_work, had_work or bool(imported))
+        if imported:
+            bump_submissions_version(submission.student_id)
+    return imported
+
+
+class _Echo:
+    """File-like object whose write() returns the line, for csv.writer in a streaming response."""
+
+    def write(self, value):
+        return value
+
+
+def export_requirements(submission, file_format):
+    """Yield a submission's requirements as CSV or NDJSON lines, reading them in chunks."""
+    columns = ('id', *FIELDS, 'created_at', 'updated_at')
+    rows = submission.requirements.values_list(*columns).iterator(chunk_size=500)
+    if file_format == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow(row)
+        return
+    for row in rows:
+        yield json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder) + '\n'
@@ -0,0 +1,57 @@
+"""
+Role resolution for views: 'admin' or 'student'.
+
+The role is resolved once per request and memoised on it. Superusers are
+always admins. Otherwise the profile loaded with the session user (see
+lab.backends.ProfileModelBackend) is used, falling back to the cache and then
+to a single-column read. A missing profile counts as 'student'. Resolving a
+role never writes; `manage.py repair_profiles` fixes missing or inconsistent
+profiles.
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+
+from .models import UserProfile
+
+
+def _timeout():
+    return getattr(settings, 'LAB_ROLE_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def role_key(user_id):
+    return f'lab:role:{user_id}'
+
+
+def get_user_role(user):
+    if user.is_superuser:
+        return 'admin'
+    if User.userprofile.is_cached(user):
+        # Already loaded (or known missing) by the auth backend's select_related
+        try:
+            return user.userprofile.role
+        except ObjectDoesNotExist:
+            return 'student'
+    key = role_key(user.pk)
+    role = cache.get(key)
+    if role is None:
+        role = UserProfile.objects.filter(user_id=user.pk).values_list('role', flat=True).first() or 'student'
+        cache.set(key, role, _timeout())
+    return role
+
+
+def get_role(request):
+    """Return the role of `request.user`, resolved at most once per request."""
+    if not hasattr(request, '_lab_role'):
+        request._lab_role = get_user_role(request.user)
+    return request._lab_role
+
+
+def is_lab_admin(request):
+    return get_role(request) == 'admin'
+
+
+def invalidate_role(user_id):
+    transaction.on_commit(lambda: cache.delete(role_key(user_id)))
@@ -0,0 +1,133 @@
+"""
+Search over admin submissions.
+
+Each submission has a `SubmissionSearchDocument` holding the lowercased
+student names, username, student ID and scenario title. Backends search
+those documents through an index:
+
+- SQLite: an FTS5 table with the trigram tokenizer (`lab_submission_fts`),
+  kept in sync by triggers on the document table.
+- Postgres: a pg_trgm GIN index on the document column.
+
+Both give substring matches like the original `icontains` filter. When no
+index exists (or the query is too short to use trigrams), the search falls
+back to that `Q` filter. Set LAB_SEARCH_BACKEND to a dotted path to force a
+backend.
+"""
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .models import SubmissionSearchDocument
+
+FTS_TABLE = 'lab_submission_fts'
+TRIGRAM_INDEX = 'lab_submission_search_trgm'
+
+
+def build_document(username, first_name, last_name, student_id, scenario_title):
+    parts = [username, first_name, last_name, student_id, scenario_title]
+    return ' '.join(part for part in parts if part).lower()
+
+
+def refresh_search_documents(submissions, batch_size=1000):
+    """(Re)build the search documents for a queryset of submissions."""
+    rows = submissions.order_by().values_list(
+        'pk', 'student__username', 'student__first_name', 'student__last_name',
+        'student__userprofile__student_id', 'scenario__title',
+    )
+    batch = []
+    for pk, *fields in rows.iterator(chunk_size=batch_size):
+        batch.append(SubmissionSearchDocument(submission_id=pk, document=build_document(*fields)))
+        if len(batch) >= batch_size:
+            _upsert(batch)
+            batch = []
+    if batch:
+        _upsert(batch)
+
+
+def _upsert(documents):
+    SubmissionSearchDocument.objects.bulk_create(
+        documents, update_conflicts=True, unique_fields=['submission'], update_fields=['document']
+    )
+
+
+class FallbackSearch:
+    """An unindexed OR of icontains lookups over the same fields as the search document."""
+
+    @classmethod
+    def is_available(cls):
+        return True
+
+    def filter(self, queryset, query):
+        return queryset.filter(
+            Q(student__username__icontains=query) |
+            Q(student__first_name__icontains=query) |
+            Q(student__last_name__icontains=query) |
+            Q(student__userprofile__student_id__icontains=query) |
+            Q(scenario__title__icontains=query)
+        )
+
+
+class SQLiteFTSSearch(FallbackSearch):
+    """FTS5 trigram index; needs at least three characters to match."""
+
+    @classmethod
+    def is_available(cls):
+        if connection.vendor != 'sqlite':
+            return False
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            return cursor.fetchone() is not None
+
+    def filter(self, queryset, query):
+        if len(query) < 3:
+            return super().filter(queryset, query)
+        # Quote as a single FTS5 string so the whole query is matched as a substring
+        match = '"' + query.lower().replace('"', '""') + '"'
+        return queryset.filter(pk__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match]))
+
+
+class PostgresTrigramSearch(FallbackSearch):
+    """pg_trgm GIN index on the lowercased document; LIKE '%...%' can use it."""
+
+    @classmethod
+    def is_available(cls):
+        if connection.vendor != 'postgresql':
+            return False
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1 FROM pg_indexes WHERE indexname = %s', [TRIGRAM_INDEX])
+            return cursor.fetchone() is not None
+
+    def filter(self, queryset, query):
+        if len(query) < 3:
+            return super().filter(queryset, query)
+        return queryset.filter(search_document__document__contains=query.lower())
+
+
+SEARCH_BACKENDS = [SQLiteFTSSearch, PostgresTrigramSearch]
+
+_backend = None
+
+
+def get_search_backend():
+    """Return the configured backend, or the first indexed one available."""
+    global _backend
+    if _backend is None:
+        backend_path = getattr(settings, 'LAB_SEARCH_BACKEND', None)
+        if backend_path:
+            _backend = import_string(backend_path)()
+        else:
+            backend_class = next((b for b in SEARCH_BACKENDS if b.is_available()), FallbackSearch)
+            _backend = backend_class()
+    return _backend
+
+
+def reset_search_backend():
+    global _backend
+    _backend = None
+
+
+def search_submissions(queryset, query):
+    return get_search_backend().filter(queryset, query)
@@ -0,0 +1,99 @@
+"""
+Section autosave for a submission's SRS document.
+
+The editor sends only the sections that changed since its last durable save,
+together with the version that save returned. A write is a single
+UPDATE ... WHERE version = <version> of just those columns, so a stale tab
+can't overwrite newer text and the other sections are never rewritten.
+
+Saves are coalesced per document: while the document was written less than
+LAB_SRS_AUTOSAVE_INTERVAL seconds ago, a save is deferred instead of written
+and the response says when to retry. The editor keeps the deferred sections
+and sends them again, merged with whatever was typed meanwhile, so nothing is
+held on the server between requests. An hour of typing costs at most
+3600 / LAB_SRS_AUTOSAVE_INTERVAL writes plus the explicit flushes the editor
+sends when the page is hidden or the form is submitted.
+"""
+import math
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import SRSDocument
+
+SECTIONS = (
+    'introduction', 'overall_description', 'system_features',
+    'external_interface_requirements', 'non_functional_requirements', 'other_requirements',
+)
+
+
+class SRSConflict(Exception):
+    """The document was saved elsewhere since the version the editor started from."""
+
+    def __init__(self, version):
+        super().__init__(f'The document is at version {version}.')
+        self.version = version
+
+
+def clean_srs_sections(data):
+    """Check a {section: text} patch; raises ValidationError."""
+    if not isinstance(data, dict):
+        raise ValidationError('Expected an object of sections.')
+    max_length = getattr(settings, 'LAB_SRS_SECTION_MAX_LENGTH', 100_000)
+    errors = {}
+    for section, text in data.items():
+        if section not in SECTIONS:
+            errors[section] = ['Unknown section.']
+        elif not isinstance(text, str):
+            errors[section] = ['Expected text.']
+        elif len(text) > max_length:
+            errors[section] = [f'Longer than {max_length} characters.']
+    if errors:
+        raise ValidationError(errors)
+    return data
+
+
+def _current_version(submission):
+    return SRSDocument.objects.filter(submission=submission).values_list('version', flat=True).first() or 0
+
+
+def save_srs_sections(submission, version, sections, flush=False):
+    """
+    Write `sections` of the submission's SRS if it is still at `version`.
+
+    Returns {'saved': bool, 'version': int, 'retry_after': seconds}; when
+    'saved' is false the write was deferred and the caller should send the
+    sections again later. Raises SRSConflict when `version` is stale.
+    """
+    current = SRSDocument.objects.filter(submission=submission).values('pk', 'version', 'updated_at').first()
+    current_version = current['version'] if current else 0
+    if version != current_version:
+        raise SRSConflict(current_version)
+    if not sections:
+        return {'saved': True, 'version': current_version, 'retry_after': 0}
+
+    now = timezone.now()
+    if current is not None and not flush:
+        interval = getattr(settings, 'LAB_SRS_AUTOSAVE_INTERVAL', 30)
+        wait = interval - (now - current['updated_at']).total_seconds()
+        if wait > 0:
+            return {'saved': False, 'version': current_version, 'retry_after': math.ceil(wait)}
+
+    if current is None:
+        try:
+            with transaction.atomic():
+                SRSDocument.objects.create(submission=submission, version=1, **sections)
+        except IntegrityError:
+            # Another request created it first
+            raise SRSConflict(_current_version(submission))
+        return {'saved': True, 'version': 1, 'retry_after': 0}
+
+    # update() rather than save(update_fields=...) so the version check and the write are one statement
+    updated = SRSDocument.objects.filter(pk=current['pk'], version=version).update(
+        **sections, version=version + 1, updated_at=now
+    )
+    if not updated:
+        raise SRSConflict(_current_version(submission))
+    return {'saved': True, 'version': version + 1, 'retry_after': 0}
@@ -0,0 +1,163 @@
+"""
+Server-side assembly of a submission's SRS document as HTML or Markdown.
+
+The document is built from the SRSDocument sections and the submission's
+requirements, grouped by type, and yielded piece by piece so a view can
+stream it. Rendered documents are cached under a hash of everything they are
+built from: the updated_at of the SRSDocument and of every requirement (their
+ids too, so a deletion changes it), the scenario, the student's name and the
+submission status. Any edit therefore leads to a new key instead of an
+invalidation, and a document nobody changed is served from the cache after
+three small queries, however many requirements it lists.
+"""
+import hashlib
+from itertools import chain
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.html import escape, linebreaks
+
+from .fragments import fragment_timeout
+from .models import Requirement, SRSDocument
+
+FORMATS = ('html', 'md')
+
+# (number, heading, SRSDocument field, requirement type listed in the section)
+OUTLINE = (
+    ('1', 'Introduction', 'introduction', None),
+    ('2', 'Overall Description', 'overall_description', None),
+    ('3', 'External Interface Requirements', 'external_interface_requirements', None),
+    ('4', 'System Features', 'system_features', 'functional'),
+    ('5', 'Other Nonfunctional Requirements', 'non_functional_requirements', 'non_functional'),
+    ('6', 'Other Requirements', 'other_requirements', 'business'),
+)
+REQUIREMENT_HEADINGS = dict(Requirement.REQUIREMENT_TYPES)
+PRIORITIES = dict(Requirement._meta.get_field('priority').choices)
+
+
+def srs_cache_key(submission, file_format):
+    """
+    Content address of the submission's rendered SRS. `submission` needs its
+    scenario and student loaded; costs two queries of timestamps.
+    """
+    srs_updated = SRSDocument.objects.filter(submission=submission).values_list('updated_at', flat=True).first()
+    digest = hashlib.sha256('|'.join(map(str, (
+        getattr(settings, 'LAB_RELEASE', ''), file_format,
+        submission.pk, submission.status, submission.submitted_at,
+        submission.scenario_id, submission.scenario.updated_at,
+        submission.student.get_full_name(), submission.student.username,
+        srs_updated,
+    ))).encode())
+    for pk, updated_at in submission.requirements.order_by('pk').values_list('pk', 'updated_at').iterator(chunk_size=500):
+        digest.update(f'|{pk}:{updated_at}'.encode())
+    return f'lab:srs:{digest.hexdigest()}'
+
+
+def render_srs(submission, file_format, key=None):
+    """
+    Yield the SRS as HTML or Markdown chunks. With a `key` from
+    srs_cache_key() the document comes from the cache when present, and is
+    stored there once it has been fully generated.
+    """
+    if key is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+    chunks = []
+    for chunk in _assemble(submission, file_format):
+        chunks.append(chunk)
+        yield chunk
+    if key is not None:
+        cache.set(key, ''.join(chunks), fragment_timeout())
+
+
+def _assemble(submission, file_format):
+    srs_doc = SRSDocument.objects.filter(submission=submission).first() or SRSDocument(submission=submission)
+    writer = _HtmlWriter if file_format == 'html' else _MarkdownWriter
+    yield writer.header(submission)
+    for number, heading, field, requirement_type in OUTLINE:
+        yield writer.section(number, heading, getattr(srs_doc, field))
+        if requirement_type is None:
+            continue
+        # One query per type, in the order of the (submission, type, -created_at) index
+        requirements = submission.requirements.filter(requirement_type=requirement_type).only(
+            'title', 'description', 'priority'
+        ).iterator(chunk_size=200)
+        first = next(requirements, None)
+        if first is None:
+            continue
+        yield writer.requirements_heading(number, REQUIREMENT_HEADINGS[requirement_type])
+        for index, requirement in enumerate(chain([first], requirements), 1):
+            yield writer.requirement(f'{number}.R{index}', requirement)
+    yield writer.footer()
+
+
+def _author(submission):
+    return submission.student.get_full_name() or submission.student.username
+
+
+class _HtmlWriter:
+    @staticmethod
+    def header(submission):
+        title = escape(submission.scenario.title)
+        return (
+            '<!DOCTYPE html>\n<html lang="en">\n<head>\n<meta charset="utf-8">\n'
+            f'<title>SRS - {title}</title>\n'
+            '<style>body{font-family:Georgia,serif;max-width:50rem;margin:2rem auto;padding:0 1rem;line-height:1.5}'
+            'h1,h2,h3{font-family:Helvetica,Arial,sans-serif}.meta{color:#555}'
+            '.requirement{margin:0 0 1rem;padding-left:1rem;border-left:3px solid #ccc}</style>\n'
+            '</head>\n<body>\n'
+            f'<h1>Software Requirements Specification</h1>\n<p class="meta">for <strong>{title}</strong></p>\n'
+            f'<p class="meta">Prepared by {escape(_author(submission))} &middot; '
+            f'{escape(submission.get_status_display())}</p>\n'
+        )
+
+    @staticmethod
+    def section(number, heading, text):
+        body = linebreaks(text, autoescape=True) if text else '<p class="meta"><em>Not written yet.</em></p>'
+        return f'<h2>{number}. {heading}</h2>\n{body}\n'
+
+    @staticmethod
+    def requirements_heading(number, heading):
+        return f'<h3>{number}.1 {heading}s</h3>\n'
+
+    @staticmethod
+    def requirement(label, requirement):
+        return (
+            f'<div class="requirement"><h4>{label} {escape(requirement.title)} '
+            f'<small class="meta">({PRIORITIES[requirement.priority]} priority)</small></h4>\n'
+            f'{linebreaks(requirement.description, autoescape=True)}</div>\n'
+        )
+
+    @staticmethod
+    def footer():
+        return '</body>\n</html>\n'
+
+
+class _MarkdownWriter:
+    @staticmethod
+    def header(submission):
+        return (
+            f'# Software Requirements Specification\n\nfor **{submission.scenario.title}**\n\n'
+            f'Prepared by {_author(submission)} · {submission.get_status_display()}\n\n'
+        )
+
+    @staticmethod
+    def section(number, heading, text):
+        return f'## {number}. {heading}\n\n{text.strip() or "_Not written yet._"}\n\n'
+
+    @staticmethod
+    def requirements_heading(number, heading):
+        return f'### {number}.1 {heading}s\n\n'
+
+    @staticmethod
+    def requirement(label, requirement):
+        return (
+            f'#### {label} {requirement.title}\n\n'
+            f'_{PRIORITIES[requirement.priority]} priority_\n\n{requirement.description.strip()}\n\n'
+        )
+
+    @staticmethod
+    def footer():
+        return ''
@@ -0,0 +1,106 @@
+"""
+Admin statistics snapshot.
+
+`LabStats` holds the global counts shown on the admin pages and
+`ScenarioStats` the per-scenario submission counts. Signals in lab/models.py
+apply F() deltas as rows change; `recompute_lab_stats` (also exposed as
+`manage.py refresh_lab_stats` and a button on the admin pages) recounts
+everything from the source tables.
+"""
+from django.db import transaction
+from django.db.models import Count, F, Q, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import LabStats, ScenarioStats, Scenario, ScenarioSubmission, UserProfile
+
+STATS_ID = 1
+
+# Submission status -> LabStats column
+STATUS_FIELDS = {
+    'draft': 'draft_submissions',
+    'submitted': 'submitted_submissions',
+    'feedback_received': 'feedback_received_submissions',
+}
+
+
+def _deltas(**deltas):
+    return {
+        field: Greatest(F(field) + delta, Value(0))
+        for field, delta in deltas.items() if delta
+    }
+
+
+def apply_stats_delta(**deltas):
+    """Add the given deltas to the LabStats columns of the same name."""
+    updates = _deltas(**deltas)
+    if updates:
+        LabStats.objects.filter(pk=STATS_ID).update(updated_at=timezone.now(), **updates)
+
+
+def apply_submission_stats_delta(scenario_id, status, delta, total):
+    """Count one submission in (delta=1) or out of (delta=-1) `status`, optionally also the totals."""
+    lab_deltas = {STATUS_FIELDS[status]: delta}
+    scenario_deltas = {status: delta}
+    if total:
+        lab_deltas['total_submissions'] = delta
+        scenario_deltas['total'] = delta
+    apply_stats_delta(**lab_deltas)
+    ScenarioStats.objects.filter(scenario_id=scenario_id).update(**_deltas(**scenario_deltas))
+
+
+def recompute_lab_stats():
+    """Recount every statistic from the source tables. Returns the LabStats row."""
+    now = timezone.now()
+    submission_counts = ScenarioSubmission.objects.aggregate(
+        total=Count('id'),
+        **{status: Count('id', filter=Q(status=status)) for status in STATUS_FIELDS}
+    )
+    per_scenario = Scenario.objects.annotate(
+        total=Count('scenariosubmission'),
+        **{status: Count('scenariosubmission', filter=Q(scenariosubmission__status=status)) for status in STATUS_FIELDS}
+    ).values('id', 'total', *STATUS_FIELDS)
+
+    with transaction.atomic():
+        stats, created = LabStats.objects.update_or_create(
+            pk=STATS_ID,
+            defaults={
+                'total_scenarios': Scenario.objects.count(),
+                'total_students': UserProfile.objects.filter(role='student').count(),
+                'total_submissions': submission_counts['total'],
+                **{field: submission_counts[status] for status, field in STATUS_FIELDS.items()},
+                'recomputed_at': now,
+                'updated_at': now,
+            }
+        )
+        ScenarioStats.objects.bulk_create(
+            [ScenarioStats(scenario_id=row.pop('id'), **row) for row in per_scenario],
+            update_conflicts=True,
+            unique_fields=['scenario'],
+            update_fields=['total', *STATUS_FIELDS],
+        )
+    return stats
+
+
+def get_lab_stats():
+    """Return the statistics snapshot, computing it the first time."""
+    stats = LabStats.objects.filter(pk=STATS_ID).first()
+    if stats is None:
+        stats = recompute_lab_stats()
+    return stats
+
+
+def get_scenario_stats():
+    """Return {scenario_id: {'title', 'total', 'submitted', 'draft'}} for active scenarios."""
+    rows = ScenarioStats.objects.filter(scenario__is_active=True).values(
+        'scenario_id', 'scenario__title', 'total', 'submitted', 'draft'
+    ).order_by('scenario__title')
+    return {
+        row['scenario_id']: {
+            'title': row['scenario__title'],
+            'total': row['total'],
+            'submitted': row['submitted'],
+            'draft': row['draft'],
+        }
+        for row in rows
+    }
@@ -0,0 +1,106 @@
+"""
+Student ID allocation.
+
+IDs come from a database sequence in blocks (LAB_STUDENT_ID_BLOCK_SIZE), and
+each process hands out the IDs of its current block from memory, so a
+registration normally costs no query for its ID. Two processes can never
+receive the same block:
+
+- Postgres: `nextval()` on `lab_student_id_seq`, which is never rolled back.
+- Other databases (SQLite): an UPDATE of the `IdSequence` row followed by a
+  read of the new value in one transaction; the UPDATE takes the write lock
+  first, so concurrent workers serialize on it.
+
+On the counter-row path a block reserved inside the caller's transaction is
+only kept for later calls once that transaction commits, because a rollback
+returns the block to the counter.
+
+Sequence values start at 1,000,000, so new IDs (STU1000000 and up) can't
+collide with the random six-digit IDs issued previously.
+"""
+import os
+import random
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+from .models import IdSequence
+
+SEQUENCE_NAME = 'student_id'
+POSTGRES_SEQUENCE = 'lab_student_id_seq'
+FIRST_VALUE = 1000000
+
+
+def format_student_id(value):
+    return f'STU{value:06d}'
+
+
+class StudentIdAllocator:
+    def __init__(self, name=SEQUENCE_NAME):
+        self.name = name
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._available = []
+
+    def allocate(self):
+        return self.allocate_many(1)[0]
+
+    def allocate_many(self, count):
+        """Return `count` unused student IDs."""
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forked worker: the parent's block belongs to the parent
+                self._pid = os.getpid()
+                self._available = []
+
+            values = self._available[:count]
+            self._available = self._available[count:]
+            missing = count - len(values)
+            if missing:
+                block = self._reserve(max(missing, getattr(settings, 'LAB_STUDENT_ID_BLOCK_SIZE', 100)))
+                if getattr(settings, 'LAB_STUDENT_ID_SHUFFLE', False):
+                    random.shuffle(block)
+                values += block[:missing]
+                remainder = block[missing:]
+                if connection.vendor != 'postgresql' and connection.in_atomic_block:
+                    transaction.on_commit(lambda: self._keep(remainder))
+                else:
+                    self._available += remainder
+        return [format_student_id(value) for value in values]
+
+    def discard(self):
+        """Forget the IDs held in memory."""
+        with self._lock:
+            self._available = []
+
+    def _keep(self, values):
+        with self._lock:
+            if self._pid == os.getpid():
+                self._available += values
+
+    def _reserve(self, size):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT nextval(%s) FROM generate_series(1, %s)', [POSTGRES_SEQUENCE, size])
+                return [row[0] for row in cursor.fetchall()]
+
+        with transaction.atomic():
+            sequence = IdSequence.objects.filter(name=self.name)
+            if not sequence.update(next_value=F('next_value') + size):
+                IdSequence.objects.get_or_create(name=self.name, defaults={'next_value': FIRST_VALUE})
+                sequence.update(next_value=F('next_value') + size)
+            end = sequence.values_list('next_value', flat=True).get()
+        return list(range(end - size, end))
+
+
+allocator = StudentIdAllocator()
+
+
+def allocate_student_id():
+    return allocator.allocate()
+
+
+def allocate_student_ids(count):
+    return allocator.allocate_many(count)
@@ -0,0 +1,296 @@
+"""
+Synthetic lab data for benchmarks and load tests.
+
+`seed_lab` creates an admin, scenarios and students, with each student's
+submissions, requirements, feedback and notifications, one chunk of students
+at a time so memory stays bounded however large the lab is. Per-student
+counts are drawn around the requested means: scenario popularity is skewed
+towards the oldest scenarios, drafts have fewer requirements, and most old
+notifications are read.
+
+Bulk rows are written with raw multi-row INSERTs (COPY on Postgres) instead
+of model instances, so no signals fire. The denormalized rows (LabStats,
+ScenarioStats, StudentProgress, search documents) are rebuilt at the end and
+the unread counters are written with the profiles.
+
+The same seed produces the same rows; timestamps are relative to the time
+of the run.
+"""
+import csv
+import io
+import random
+import time
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import (
+    UserProfile, Scenario, ScenarioSubmission, Requirement, Feedback, Notification,
+)
+from .search import refresh_search_documents
+from .stats import recompute_lab_stats
+from .student_ids import allocate_student_ids
+
+HISTORY_DAYS = 365
+READ_RATE = 0.8
+
+STATUSES = ['draft', 'submitted', 'feedback_received']
+STATUS_WEIGHTS = [3, 5, 2]
+REQUIREMENT_TYPES = [choice for choice, _ in Requirement.REQUIREMENT_TYPES]
+REQUIREMENT_TYPE_WEIGHTS = [6, 3, 2]
+PRIORITIES = ['high', 'medium', 'low']
+PRIORITY_WEIGHTS = [3, 5, 2]
+FEEDBACK_TYPES = [choice for choice, _ in Feedback.FEEDBACK_TYPES]
+FEEDBACK_COUNTS = [1, 2, 3]
+FEEDBACK_COUNT_WEIGHTS = [6, 3, 1]
+DIFFICULTIES = [choice for choice, _ in Scenario.DIFFICULTY_CHOICES]
+
+FIRST_NAMES = [
+    'Alex', 'Sam', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Jamie', 'Avery', 'Quinn',
+    'Priya', 'Wei', 'Fatima', 'Mateo', 'Amara', 'Kenji', 'Ingrid', 'Omar', 'Lucia', 'Tomasz',
+]
+LAST_NAMES = [
+    'Smith', 'Garcia', 'Chen', 'Okafor', 'Novak', 'Patel', 'Kim', 'Silva', 'Müller', 'Haddad',
+    'Johansson', 'Nguyen', 'Rossi', 'Kowalski', 'Mensah', 'Tanaka', 'Dubois', 'Ahmed', 'Lopez', 'Brown',
+]
+SUBJECTS = ['user', 'administrator', 'customer', 'librarian', 'student', 'clerk', 'manager', 'guest']
+ACTIONS = ['register', 'log in', 'search records', 'export reports', 'reset a password', 'book a slot',
+           'view the history', 'update a profile', 'pay online', 'receive alerts']
+QUALITIES = ['within 2 seconds', 'on mobile devices', 'with audit logging', 'for 10,000 concurrent users',
+             'without data loss', 'in under three clicks']
+
+
+class _Table:
+    """
+    Raw bulk insert into one model's table. Columns not listed in `fields`
+    (except the primary key) are filled with the field default, or the
+    current time for auto_now/auto_now_add fields.
+    """
+
+    def __init__(self, model, fields):
+        opts = model._meta
+        by_attname = {field.attname: field for field in opts.concrete_fields}
+        columns = [by_attname[name].column for name in fields]
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        self.defaults = ()
+        for field in opts.concrete_fields:
+            if field.attname in fields or field.primary_key:
+                continue
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                value = now
+            else:
+                value = field.get_db_prep_save(field.get_default(), connection)
+            columns.append(field.column)
+            self.defaults += (value,)
+
+        quote = connection.ops.quote_name
+        self.table = quote(opts.db_table)
+        self.columns = ', '.join(quote(column) for column in columns)
+        self.placeholders = ', '.join(['%s'] * len(columns))
+
+    def insert(self, rows):
+        if not rows:
+            return 0
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql' and hasattr(cursor.cursor, 'copy_expert'):
+                # None is written unquoted and read back as NULL, strings are quoted
+                buffer = io.StringIO()
+                csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC).writerows(row + self.defaults for row in rows)
+                buffer.seek(0)
+                cursor.cursor.copy_expert(f'COPY {self.table} ({self.columns}) FROM STDIN WITH (FORMAT csv)', buffer)
+            else:
+                cursor.executemany(
+                    f'INSERT INTO {self.table} ({self.columns}) VALUES ({self.placeholders})',
+                    [row + self.defaults for row in rows],
+                )
+        return len(rows)
+
+
+def _around(rng, mean, spread, low=0, high=None):
+    """An integer drawn around `mean`, clipped to [low, high]."""
+    value = max(low, round(rng.gauss(mean, mean * spread)))
+    return value if high is None else min(value, high)
+
+
+class _Generator:
+    def __init__(self, rng, admin, scenarios, means):
+        self.rng = rng
+        self.admin_id = admin.pk
+        self.scenarios = scenarios
+        self.scenario_ids = [scenario.pk for scenario in scenarios]
+        # Older scenarios have been open longer and collect more submissions
+        weights = [1 / (rank + 1) ** 0.7 for rank in range(len(scenarios))]
+        self.cum_weights = list(accumulate(weights))
+        self.means = means
+        self.now = timezone.now()
+        self.adapt = connection.ops.adapt_datetimefield_value
+
+        self.users = _Table(User, ['id', 'username', 'email', 'first_name', 'last_name', 'password', 'date_joined'])
+        self.profiles = _Table(UserProfile, ['user_id', 'role', 'student_id', 'unread_notifications', 'created_at'])
+        self.submissions = _Table(
+            ScenarioSubmission, ['id', 'scenario_id', 'student_id', 'status', 'submitted_at', 'created_at', 'updated_at']
+        )
+        self.requirements = _Table(
+            Requirement, ['submission_id', 'requirement_type', 'title', 'description', 'priority', 'created_at', 'updated_at']
+        )
+        self.feedback = _Table(
+            Feedback, ['submission_id', 'feedback_type', 'title', 'content', 'admin_id', 'is_read', 'created_at']
+        )
+        self.notifications = _Table(Notification, ['user_id', 'title', 'message', 'is_read', 'link', 'created_at'])
+
+        self.next_user_id = (User.objects.aggregate(Max('id'))['id__max'] or 0) + 1
+        self.next_submission_id = (ScenarioSubmission.objects.aggregate(Max('id'))['id__max'] or 0) + 1
+
+    def pick_scenarios(self, count):
+        if count * 2 > len(self.scenario_ids):
+            return self.rng.sample(self.scenario_ids, count)
+        picked = set()
+        while len(picked) < count:
+            picked.update(self.rng.choices(self.scenario_ids, cum_weights=self.cum_weights, k=count - len(picked)))
+        return list(picked)
+
+    def between(self, start):
+        """A random moment between `start` and now."""
+        return start + (self.now - start) * self.rng.random()
+
+    def chunk(self, numbers):
+        """Write the students `numbers` and everything they own. Returns the number of rows written."""
+        rng, means, adapt = self.rng, self.means, self.adapt
+        users, submissions, requirements, feedback, notifications = [], [], [], [], []
+        joined_at = {}
+        unread = {}
+
+        for number in numbers:
+            user_id = self.next_user_id
+            self.next_user_id += 1
+            joined = self.now - timedelta(days=HISTORY_DAYS * rng.random())
+            joined_at[user_id] = joined
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            users.append((
+                user_id, f'student{number:06d}', f'student{number:06d}@example.com',
+                first, last, '!', adapt(joined),
+            ))
+
+            count = _around(rng, means['submissions'], 0.4, high=len(self.scenario_ids))
+            for scenario_id in self.pick_scenarios(count):
+                submission_id = self.next_submission_id
+                self.next_submission_id += 1
+                status = rng.choices(STATUSES, STATUS_WEIGHTS)[0]
+                created = self.between(joined)
+                updated = self.between(created)
+                submissions.append((
+                    submission_id, scenario_id, user_id, status,
+                    adapt(updated) if status != 'draft' else None, adapt(created), adapt(updated),
+                ))
+
+                if status == 'draft':
+                    # Drafts are often half written, submitted work has at least one requirement
+                    requirement_count = _around(rng, means['requirements'] * 0.6, 0.6)
+                else:
+                    requirement_count = _around(rng, means['requirements'], 0.3, low=1)
+                stamp = adapt(created)
+                for index in range(requirement_count):
+                    subject, action = rng.choice(SUBJECTS), rng.choice(ACTIONS)
+                    requirements.append((
+                        submission_id,
+                        rng.choices(REQUIREMENT_TYPES, REQUIREMENT_TYPE_WEIGHTS)[0],
+                        f'{subject.title()} can {action}',
+                        f'The system shall allow the {subject} to {action} {rng.choice(QUALITIES)}.',
+                        rng.choices(PRIORITIES, PRIORITY_WEIGHTS)[0],
+                        stamp, stamp,
+                    ))
+
+                if status == 'feedback_received':
+                    for index in range(rng.choices(FEEDBACK_COUNTS, FEEDBACK_COUNT_WEIGHTS)[0]):
+                        given = adapt(self.between(updated))
+                        is_read = rng.random() < READ_RATE
+                        feedback.append((
+                            submission_id, rng.choice(FEEDBACK_TYPES), 'Review of your requirements',
+                            f'Consider how the system behaves {rng.choice(QUALITIES)}.',
+                            self.admin_id, is_read, given,
+                        ))
+                        notifications.append((
+                            user_id, 'Feedback Received', 'You have received feedback on your submission.',
+                            is_read, f'/submissions/{submission_id}/', given,
+                        ))
+                        unread[user_id] = unread.get(user_id, 0) + (not is_read)
+
+            for index in range(_around(rng, means['notifications'], 0.3, high=len(self.scenarios))):
+                scenario = rng.choice(self.scenarios)
+                is_read = rng.random() < READ_RATE
+                notifications.append((
+                    user_id, 'New Scenario Available', f'A new scenario "{scenario.title}" is now available.',
+                    is_read, f'/scenarios/{scenario.pk}/', adapt(self.between(joined)),
+                ))
+                unread[user_id] = unread.get(user_id, 0) + (not is_read)
+
+        profiles = [
+            (user_id, 'student', student_id, unread.get(user_id, 0), adapt(joined_at[user_id]))
+            for (user_id, *rest), student_id in zip(users, allocate_student_ids(len(users)))
+        ]
+        # Parents first for databases that check foreign keys immediately
+        return sum(table.insert(rows) for table, rows in [
+            (self.users, users), (self.profiles, profiles), (self.submissions, submissions),
+            (self.requirements, requirements), (self.feedback, feedback), (self.notifications, notifications),
+        ])
+
+
+def seed_lab(students, scenarios, submissions_per_student, requirements_per_submission,
+             notifications_per_student=10, seed=0, chunk_size=1000, log=None):
+    """
+    Create a synthetic lab. The per-student and per-submission counts are
+    means. Returns the admin user.
+    """
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    started = time.perf_counter()
+
+    with transaction.atomic():
+        admin = User.objects.create(username='lab_admin', is_staff=True, is_superuser=True, password='!')
+        # Superuser profiles come from the post_save signal
+        scenario_objects = Scenario.objects.bulk_create([
+            Scenario(
+                title=f'Scenario {number}: {rng.choice(SUBJECTS).title()} portal',
+                difficulty=rng.choice(DIFFICULTIES),
+                introduction=f'Introduction to scenario {number}.',
+                aim=f'Aim of scenario {number}.',
+                objectives=f'Objectives of scenario {number}.',
+                description=f'Description of scenario {number}.',
+                created_by=admin,
+                is_active=rng.random() < 0.9,
+            )
+            for number in range(scenarios)
+        ])
+        if scenario_objects and scenario_objects[0].pk is None:
+            scenario_objects = list(Scenario.objects.filter(created_by=admin).order_by('pk'))
+    log(f'Created {scenarios} scenarios')
+
+    generator = _Generator(rng, admin, scenario_objects, {
+        'submissions': submissions_per_student,
+        'requirements': requirements_per_submission,
+        'notifications': notifications_per_student,
+    })
+    rows = 0
+    for start in range(0, students, chunk_size):
+        with transaction.atomic():
+            rows += generator.chunk(range(start, min(start + chunk_size, students)))
+        elapsed = time.perf_counter() - started
+        log(f'Created {min(start + chunk_size, students)} students, {rows} rows ({rows / elapsed:.0f} rows/s)')
+
+    if connection.vendor == 'postgresql':
+        # Ids were assigned explicitly; move the sequences past them
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [User, ScenarioSubmission]):
+                cursor.execute(sql)
+
+    recompute_lab_stats()
+    call_command('rebuild_progress', chunk_size=chunk_size, stdout=io.StringIO())
+    refresh_search_documents(ScenarioSubmission.objects.all(), batch_size=chunk_size)
+    log(f'Rebuilt statistics, progress and search documents ({time.perf_counter() - started:.1f}s total)')
+    return admin
@@ -1,10 +1,42 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth.models import User
 from django.urls import reverse
-from .models import UserProfile, Scenario, ScenarioSubmission, Requirement
+from datetime import timedelta
+from django.utils import timezone
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.contrib.messages import get_messages
+import json
+import os
+import tempfile
+import time
+from unittest import mock
+from io import StringIO
+from contextlib import ExitStack, contextmanager
+from django.test.signals import template_rendered
+from .models import UserProfile, Scenario, ScenarioSubmission, Requirement, Feedback, SRSDocument, Notification, Job, StudentProgress, LabStats, NotificationArchive, RequestTiming, CacheInvalidation
+from .jobs import enqueue, claim_job, run_job, run_pending_jobs, job
+from .counters import get_unread_count, mark_notifications_read, get_submission_counts
+from .progress import get_student_progress, refresh_student_progress
+from .stats import get_lab_stats, recompute_lab_stats, get_scenario_stats
+from .search import search_submissions, get_search_backend, FallbackSearch, SQLiteFTSSearch
+from .student_ids import StudentIdAllocator
+from .tiered_cache import TieredCache
+from .local_cache import BoundedLocMemCache
+from .roles import get_user_role
+from .synthetic import seed_lab
+from . import context_processors
+from .requirement_batch import delete_requirements
+from .management.commands.explain_hot_queries import full_scans
+from django.db import IntegrityError, transaction
 
 class RequirementsLabTestCase(TestCase):
     def setUp(self):
+        # Fragment versions are bumped on commit, which never happens inside a TestCase
+        cache.clear()
         self.client = Client()
         
         # Create test users
@@ -82,10 +114,19 @@ class RequirementsLabTestCase(TestCase):
         self.assertContains(response, self.scenario.title)
     
     def test_scenario_submission_creation(self):
-        """Test that accessing a scenario creates a submission"""
+        """Test that viewing a scenario writes nothing and the first requirement creates the submission"""
         self.client.login(username='teststudent', password='testpass123')
         response = self.client.get(reverse('scenario_detail', kwargs={'pk': self.scenario.pk}))
         self.assertEqual(response.status_code, 200)
+        self.assertFalse(ScenarioSubmission.objects.filter(scenario=self.scenario, student=self.student_user).exists())
+        
+        response = self.client.post(reverse('add_scenario_requirement', kwargs={'pk': self.scenario.pk}), {
+            'requirement_type': 'functional',
+            'title': 'Test Requirement',
+            'description': 'This is a test requirement',
+            'priority': 'high'
+        })
+        self.assertEqual(response.status_code, 302)
         
         # Check if submission was created
         submission = ScenarioSubmission.objects.get(
@@ -93,6 +134,7 @@ class RequirementsLabTestCase(TestCase):
             student=self.student_user
         )
         self.assertEqual(submission.status, 'draft')
+        self.assertEqual(submission.requirements.count(), 1)
     
     def test_requirement_creation(self):
         """Test adding a requirement to a submission"""
@@ -135,3 +177,1523 @@ class RequirementsLabTestCase(TestCase):
         self.client.login(username='teststudent', password='testpass123')
         response = self.client.get(reverse('admin_scenarios'))
         self.assertEqual(response.status_code, 302)  # Redirect due to access denied
+
+
+class ScenarioNotificationTestCase(TestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create(username='fanoutadmin', is_superuser=True)
+        self.students = [
+            User.objects.create(username=f'fanout{i}')
+            for i in range(7)
+        ]
+
+    def create_scenario(self, **kwargs):
+        return Scenario.objects.create(
+            title='Fan-out Scenario',
+            introduction='Intro',
+            aim='Aim',
+            objectives='Objectives',
+            description='Description',
+            created_by=self.admin_user,
+            **kwargs
+        )
+
+    @override_settings(LAB_NOTIFICATION_BATCH_SIZE=3)
+    def test_new_scenario_notifies_every_student(self):
+        """Test publishing a scenario creates one notification per student in batches"""
+        scenario = self.create_scenario()
+        run_pending_jobs()
+        notified = Notification.objects.filter(link=f'/scenarios/{scenario.pk}/')
+        self.assertEqual(
+            sorted(notified.values_list('user_id', flat=True)),
+            sorted(user.pk for user in self.students)
+        )
+
+    def test_new_scenario_defers_fan_out_to_worker(self):
+        """Test publishing a scenario only enqueues the notification job"""
+        with self.assertNumQueries(6):
+            # scenario insert, job insert, active scenario count, progress update, stats insert and update
+            scenario = self.create_scenario()
+        self.assertFalse(Notification.objects.exists())
+        self.assertTrue(Job.objects.filter(name='notify_students_of_scenario', payload={'scenario_id': scenario.pk}).exists())
+
+    @override_settings(LAB_NOTIFICATION_BATCH_SIZE=1000)
+    def test_fan_out_query_count_is_independent_of_cohort(self):
+        """Test the fan-out does not run one query per student"""
+        scenario = self.create_scenario()
+        job_obj = claim_job('test')
+        with self.assertNumQueries(10):
+            # savepoints, scenario lookup, student id select, already-notified check, bulk insert, counter update, job update
+            run_job(job_obj)
+        self.assertEqual(Notification.objects.filter(link=f'/scenarios/{scenario.pk}/').count(), len(self.students))
+
+    def test_repeated_fan_out_notifies_nobody_twice(self):
+        """Test a fan-out that runs again after its lock expired skips students already notified"""
+        scenario = self.create_scenario()
+        run_pending_jobs()
+        enqueue('notify_students_of_scenario', scenario_id=scenario.pk)
+        run_pending_jobs()
+        self.assertEqual(Notification.objects.filter(link=f'/scenarios/{scenario.pk}/').count(), len(self.students))
+
+    def test_inactive_scenario_sends_no_notifications(self):
+        """Test that inactive scenarios are not announced"""
+        self.create_scenario(is_active=False)
+        self.assertFalse(Notification.objects.exists())
+
+
+FLAKY_CALLS = []
+
+
+@job('test_flaky')
+def flaky_job(fail_times):
+    FLAKY_CALLS.append(fail_times)
+    if len(FLAKY_CALLS) <= fail_times:
+        raise RuntimeError('boom')
+
+
+class JobQueueTestCase(TestCase):
+    def setUp(self):
+        FLAKY_CALLS.clear()
+
+    def test_failed_job_is_retried_with_backoff(self):
+        """Test a failing job goes back to pending with a later run_after"""
+        job_obj = enqueue('test_flaky', fail_times=1)
+        self.assertFalse(run_job(claim_job('test')))
+        job_obj.refresh_from_db()
+        self.assertEqual(job_obj.status, 'pending')
+        self.assertEqual(job_obj.attempts, 1)
+        self.assertGreater(job_obj.run_after, timezone.now())
+        self.assertIn('boom', job_obj.last_error)
+
+        # Not due yet
+        self.assertIsNone(claim_job('test'))
+        Job.objects.filter(pk=job_obj.pk).update(run_after=timezone.now())
+        self.assertTrue(run_job(claim_job('test')))
+        job_obj.refresh_from_db()
+        self.assertEqual(job_obj.status, 'done')
+
+    def test_job_fails_after_max_attempts(self):
+        """Test a job that keeps failing is marked failed"""
+        job_obj = enqueue('test_flaky', fail_times=10, max_attempts=1)
+        run_job(claim_job('test'))
+        job_obj.refresh_from_db()
+        self.assertEqual(job_obj.status, 'failed')
+
+    def test_claimed_job_is_invisible_until_timeout(self):
+        """Test a running job is only reclaimed after its visibility timeout expires"""
+        job_obj = enqueue('test_flaky', fail_times=0)
+        self.assertEqual(claim_job('worker-a').pk, job_obj.pk)
+        self.assertIsNone(claim_job('worker-b'))
+
+        Job.objects.filter(pk=job_obj.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        reclaimed = claim_job('worker-b')
+        self.assertEqual(reclaimed.pk, job_obj.pk)
+        self.assertEqual(reclaimed.locked_by, 'worker-b')
+
+    def test_reclaimed_job_keeps_the_new_owners_state(self):
+        """Test a worker that lost its lock does not mark the job done under the new owner"""
+        job_obj = enqueue('test_flaky', fail_times=0)
+        stale = claim_job('worker-a')
+        Job.objects.filter(pk=job_obj.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        claim_job('worker-b')
+        self.assertTrue(run_job(stale))
+        job_obj.refresh_from_db()
+        self.assertEqual((job_obj.status, job_obj.locked_by), ('running', 'worker-b'))
+
+    def test_unknown_job_is_rejected(self):
+        """Test enqueueing an unregistered job fails fast"""
+        with self.assertRaises(ValueError):
+            enqueue('no_such_job')
+
+    @override_settings(LAB_JOBS_EAGER=True)
+    def test_eager_mode_runs_inline(self):
+        """Test LAB_JOBS_EAGER runs the job without queueing it"""
+        enqueue('test_flaky', fail_times=0)
+        self.assertEqual(FLAKY_CALLS, [0])
+        self.assertFalse(Job.objects.exists())
+
+
+class UnreadCounterTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='counteruser')
+        self.other = User.objects.create(username='counterother')
+
+    def notify(self, user=None, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Notification.objects.create(user=user or self.user, title='Hi', message='Hello', **kwargs)
+
+    def test_counter_tracks_create_read_and_delete(self):
+        """Test the unread counter follows creates, mark-as-read and deletes"""
+        first = self.notify()
+        self.notify()
+        self.notify(is_read=True)
+        self.assertEqual(get_unread_count(self.user), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(get_unread_count(self.user), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(mark_notifications_read(self.user), 1)
+        self.assertEqual(get_unread_count(self.user), 0)
+        self.assertEqual(get_unread_count(self.other), 0)
+
+    def test_counter_tracks_bulk_creates(self):
+        """Test bulk fan-out bumps the counter of every recipient"""
+        scenario = Scenario.objects.create(
+            title='Counter Scenario', introduction='I', aim='A', objectives='O', description='D',
+            created_by=self.other
+        )
+        self.assertEqual(get_unread_count(self.user), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            run_pending_jobs()
+        self.assertEqual(get_unread_count(self.user), 1)
+        self.assertEqual(get_unread_count(self.other), 1)
+
+    def test_warm_counter_costs_no_queries(self):
+        """Test a cached counter is served without touching the database"""
+        self.notify()
+        get_unread_count(self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_unread_count(self.user), 1)
+
+    def test_notifications_page_clears_badge(self):
+        """Test visiting the notifications page resets the unread counter"""
+        self.user.set_password('testpass123')
+        self.user.save()
+        self.notify()
+        self.client.login(username='counteruser', password='testpass123')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get(reverse('notifications'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(get_unread_count(self.user), 0)
+
+
+class SubmissionCountsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = User.objects.create(username='progressstudent')
+        self.admin_user = User.objects.create(username='progressadmin', is_superuser=True)
+        self.scenarios = [
+            Scenario.objects.create(
+                title=f'Progress {i}', introduction='I', aim='A', objectives='O', description='D',
+                created_by=self.admin_user
+            )
+            for i in range(3)
+        ]
+
+    def test_counts_use_one_query_and_are_cached(self):
+        """Test submission counts come from one aggregate query, then from cache"""
+        ScenarioSubmission.objects.create(scenario=self.scenarios[0], student=self.student)
+        ScenarioSubmission.objects.create(scenario=self.scenarios[1], student=self.student, status='submitted')
+        with self.assertNumQueries(1):
+            counts = get_submission_counts(self.student)
+        self.assertEqual(counts, {'draft': 1, 'submitted': 1, 'feedback_received': 0})
+        with self.assertNumQueries(0):
+            get_submission_counts(self.student)
+
+    def test_counts_invalidated_on_save_and_delete(self):
+        """Test saving or deleting a submission refreshes the cached counts"""
+        with self.captureOnCommitCallbacks(execute=True):
+            submission = ScenarioSubmission.objects.create(scenario=self.scenarios[0], student=self.student)
+        self.assertEqual(get_submission_counts(self.student)['draft'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            submission.submit()
+        self.assertEqual(get_submission_counts(self.student), {'draft': 0, 'submitted': 1, 'feedback_received': 0})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            submission.delete()
+        self.assertEqual(get_submission_counts(self.student)['submitted'], 0)
+
+
+# The query each lab context processor defers until a template reads its values
+PROCESSOR_QUERIES = {
+    'sidebar_progress': 'get_submission_counts',
+    'notifications_processor': 'get_unread_count',
+}
+
+
+class ContextProcessorAssertionsMixin:
+    """TestCase mixin for asserting which context processors a page queries."""
+
+    @contextmanager
+    def assertProcessorQueries(self, template_name, processors):
+        """
+        Assert that the block renders `template_name` and that exactly the
+        context processors named in `processors` ran their queries.
+        """
+        templates = []
+        patches = {}
+
+        def on_template(sender, template, **kwargs):
+            templates.append(template.name)
+
+        template_rendered.connect(on_template)
+        try:
+            with ExitStack() as stack:
+                for processor, name in PROCESSOR_QUERIES.items():
+                    query = getattr(context_processors, name)
+                    patches[processor] = stack.enter_context(mock.patch.object(context_processors, name, wraps=query))
+                yield
+        finally:
+            template_rendered.disconnect(on_template)
+        evaluated = {processor for processor, patched in patches.items() if patched.called}
+        self.assertIn(template_name, templates, f'{template_name} was not rendered (rendered: {templates})')
+        self.assertEqual(
+            evaluated, set(processors),
+            f'{template_name} evaluated processors {sorted(evaluated)}, expected {sorted(processors)}'
+        )
+
+
+class LazyContextProcessorTestCase(ContextProcessorAssertionsMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = User.objects.create_user(username='lazystudent', password='testpass123')
+        self.admin_user = User.objects.create_user(username='lazyadmin', password='testpass123', is_superuser=True)
+
+    def test_anonymous_page_runs_no_processor_queries(self):
+        """Test anonymous pages never resolve the lab context processors"""
+        with self.assertProcessorQueries('registration/login.html', []):
+            self.client.get(reverse('login'))
+
+    def test_admin_page_skips_student_sidebar(self):
+        """Test admin pages only resolve the notification badge"""
+        self.client.login(username='lazyadmin', password='testpass123')
+        with self.assertProcessorQueries('lab/admin_scenarios.html', ['notifications_processor']):
+            self.client.get(reverse('admin_scenarios'))
+
+    def test_student_page_resolves_both_processors(self):
+        """Test student pages resolve the sidebar counters and the badge"""
+        self.client.login(username='lazystudent', password='testpass123')
+        with self.assertProcessorQueries('lab/scenario_list.html', ['sidebar_progress', 'notifications_processor']):
+            self.client.get(reverse('scenario_list'))
+
+    def test_unread_values_render_like_plain_values(self):
+        """Test lazy values behave like the numbers they wrap in templates"""
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.create(user=self.student, title='Hi', message='Hello')
+        self.client.login(username='lazystudent', password='testpass123')
+        response = self.client.get(reverse('scenario_list'))
+        self.assertTrue(response.context['has_unread_notifications'])
+        self.assertEqual(response.context['unread_notifications_count'], 1)
+
+
+class StudentProgressTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = User.objects.create_user(username='progressrow', password='testpass123')
+        self.admin_user = User.objects.create(username='progressrowadmin', is_superuser=True)
+        self.scenarios = [
+            Scenario.objects.create(
+                title=f'Row {i}', introduction='I', aim='A', objectives='O', description='D',
+                created_by=self.admin_user
+            )
+            for i in range(4)
+        ]
+
+    def add_requirement(self, submission, title='Req'):
+        return Requirement.objects.create(
+            submission=submission, requirement_type='functional', title=title, description='D'
+        )
+
+    def assertProgress(self, completed, active_with_work, total):
+        progress = StudentProgress.objects.get(student=self.student)
+        self.assertEqual(
+            (progress.completed_count, progress.active_with_work_count, progress.total_active_scenarios),
+            (completed, active_with_work, total)
+        )
+
+    def test_progress_follows_requirements_submissions_and_scenarios(self):
+        """Test signals keep the progress row in step with every change"""
+        get_student_progress(self.student)
+        self.assertProgress(0, 0, 4)
+
+        submission = ScenarioSubmission.objects.create(scenario=self.scenarios[0], student=self.student)
+        first = self.add_requirement(submission)
+        second = self.add_requirement(submission)
+        self.assertProgress(0, 1, 4)
+
+        first.delete()
+        self.assertProgress(0, 1, 4)
+        second.delete()
+        self.assertProgress(0, 0, 4)
+
+        self.add_requirement(submission)
+        submission.submit()
+        self.assertProgress(1, 0, 4)
+
+        self.scenarios[3].is_active = False
+        self.scenarios[3].save()
+        self.assertProgress(1, 0, 3)
+
+        self.scenarios[0].delete()
+        self.assertProgress(0, 0, 2)
+
+    def test_cascade_deletes_count_each_draft_once(self):
+        """Test deleting drafts with several requirements, directly or with their scenario, stays in step"""
+        get_student_progress(self.student)
+        drafts = [ScenarioSubmission.objects.create(scenario=scenario, student=self.student) for scenario in self.scenarios[:3]]
+        for draft, count in zip(drafts, (3, 2, 2)):
+            for i in range(count):
+                self.add_requirement(draft, title=f'Req {i}')
+        self.assertProgress(0, 3, 4)
+
+        drafts[0].delete()
+        self.assertProgress(0, 2, 4)
+        self.scenarios[1].delete()
+        self.assertProgress(0, 1, 3)
+        delete_requirements(Requirement.objects.filter(submission=drafts[2]))
+        self.assertProgress(0, 0, 3)
+        self.assertEqual(refresh_student_progress(self.student.pk).active_with_work_count, 0)
+
+    def test_bulk_delete_counts_only_emptied_drafts(self):
+        """Test deleting requirements across drafts takes off only the drafts left empty"""
+        get_student_progress(self.student)
+        drafts = [ScenarioSubmission.objects.create(scenario=scenario, student=self.student) for scenario in self.scenarios[:2]]
+        for i in range(2):
+            self.add_requirement(drafts[0], title=f'Req {i}')
+        kept = self.add_requirement(drafts[1], title='Kept')
+        self.add_requirement(drafts[1], title='Gone')
+        self.assertProgress(0, 2, 4)
+        deleted = delete_requirements(Requirement.objects.filter(title__in=['Req 0', 'Req 1', 'Gone']))
+        self.assertEqual(deleted, 3)
+        self.assertProgress(0, 1, 4)
+        kept.delete()
+        self.assertProgress(0, 0, 4)
+
+    def test_dashboard_query_count_does_not_grow_with_drafts(self):
+        """Test the dashboard no longer runs a query per draft submission"""
+        self.client.login(username='progressrow', password='testpass123')
+        submission = ScenarioSubmission.objects.create(scenario=self.scenarios[0], student=self.student)
+        self.add_requirement(submission)
+        self.client.get(reverse('dashboard'))
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(reverse('dashboard'))
+            self.assertEqual(response.status_code, 200)
+            return len(ctx.captured_queries)
+
+        before = count_queries()
+        for scenario in self.scenarios[1:]:
+            self.add_requirement(ScenarioSubmission.objects.create(scenario=scenario, student=self.student))
+        cache.clear()
+        self.client.get(reverse('dashboard'))
+        self.assertEqual(count_queries(), before)
+        self.assertEqual(get_student_progress(self.student).progress_percentage, 50)
+
+    def test_rebuild_progress_command(self):
+        """Test rebuild_progress recomputes rows from the submissions table"""
+        submission = ScenarioSubmission.objects.create(scenario=self.scenarios[0], student=self.student)
+        self.add_requirement(submission)
+        ScenarioSubmission.objects.create(scenario=self.scenarios[1], student=self.student, status='feedback_received')
+        StudentProgress.objects.filter(student=self.student).delete()
+
+        call_command('rebuild_progress', chunk_size=1, stdout=StringIO())
+        self.assertProgress(1, 1, 4)
+
+
+class LabStatsTestCase(TestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_user(username='statsadmin', password='testpass123', is_superuser=True)
+        get_lab_stats()
+        self.students = [User.objects.create(username=f'statsstudent{i}') for i in range(3)]
+        self.scenario = Scenario.objects.create(
+            title='Stats Scenario', introduction='I', aim='A', objectives='O', description='D',
+            created_by=self.admin_user
+        )
+
+    def snapshot(self):
+        stats = get_lab_stats()
+        return (
+            stats.total_scenarios, stats.total_students, stats.total_submissions,
+            stats.draft_submissions, stats.submitted_submissions, stats.feedback_received_submissions,
+        )
+
+    def test_deltas_match_full_recompute(self):
+        """Test signal deltas keep the snapshot equal to a full recount"""
+        first = ScenarioSubmission.objects.create(scenario=self.scenario, student=self.students[0])
+        second = ScenarioSubmission.objects.create(scenario=self.scenario, student=self.students[1])
+        first.submit()
+        second.status = 'feedback_received'
+        second.save()
+        self.students[2].userprofile.role = 'admin'
+        self.students[2].userprofile.save()
+        ScenarioSubmission.objects.create(scenario=self.scenario, student=self.students[2]).delete()
+
+        self.assertEqual(self.snapshot(), (1, 2, 2, 0, 1, 1))
+        incremental_scenarios = get_scenario_stats()
+        recompute_lab_stats()
+        self.assertEqual(self.snapshot(), (1, 2, 2, 0, 1, 1))
+        self.assertEqual(get_scenario_stats(), incremental_scenarios)
+        self.assertEqual(incremental_scenarios[self.scenario.pk]['submitted'], 1)
+
+    def test_admin_pages_do_not_count_tables(self):
+        """Test the admin pages read the snapshot instead of running COUNT queries"""
+        self.client.login(username='statsadmin', password='testpass123')
+        for name in ('admin_dashboard', 'admin_submissions'):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(reverse(name))
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, 'Stats updated')
+            counts = [q['sql'] for q in ctx.captured_queries if 'COUNT(' in q['sql'] and 'lab_notification' not in q['sql']]
+            # Only the paginator counts the (filtered) submissions list
+            self.assertLessEqual(len(counts), 1, counts)
+
+    def test_refresh_endpoint_recomputes(self):
+        """Test admins can recompute the snapshot on demand"""
+        LabStats.objects.update(total_students=99)
+        self.client.login(username='statsadmin', password='testpass123')
+        response = self.client.post(reverse('refresh_lab_stats'), {'next': reverse('admin_submissions')})
+        self.assertRedirects(response, reverse('admin_submissions'))
+        self.assertEqual(get_lab_stats().total_students, 3)
+
+
+class AdminSubmissionsListTestCase(TestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_user(username='listadmin', password='testpass123', is_superuser=True)
+        self.scenario = Scenario.objects.create(
+            title='List Scenario', introduction='I', aim='A', objectives='O', description='D',
+            created_by=self.admin_user
+        )
+        self.client.login(username='listadmin', password='testpass123')
+
+    def add_submission(self, index, requirement_types):
+        student = User.objects.create(username=f'liststudent{index}', first_name='List', last_name=str(index))
+        submission = ScenarioSubmission.objects.create(scenario=self.scenario, student=student)
+        Requirement.objects.bulk_create([
+            Requirement(submission=submission, requirement_type=requirement_type, title='R', description='x' * 500)
+            for requirement_type in requirement_types
+        ])
+        return submission
+
+    def get_page(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('admin_submissions'))
+        self.assertEqual(response.status_code, 200)
+        return response, ctx.captured_queries
+
+    def test_requirement_counts_are_annotated(self):
+        """Test cards show annotated totals and per-type counts"""
+        submission = self.add_submission(0, ['functional', 'functional', 'business'])
+        response, queries = self.get_page()
+        card = next(s for s in response.context['page_obj'] if s.pk == submission.pk)
+        self.assertEqual(
+            (card.requirement_count, card.functional_count, card.non_functional_count, card.business_count),
+            (3, 2, 0, 1)
+        )
+        self.assertContains(response, '3 requirements')
+        self.assertFalse(any('"lab_requirement"."description"' in q['sql'] for q in queries))
+
+    def test_query_count_is_fixed(self):
+        """Test the page runs the same number of queries whatever the data volume"""
+        self.add_submission(0, ['functional'])
+        self.get_page()
+        baseline = len(self.get_page()[1])
+        for index in range(1, 6):
+            self.add_submission(index, ['functional', 'non_functional', 'business'] * index)
+        self.get_page()
+        self.assertEqual(len(self.get_page()[1]), baseline)
+
+
+class SubmissionSearchTestCase(TestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create(username='searchadmin', is_superuser=True)
+        self.alice = User.objects.create(username='alice', first_name='Alice', last_name='Smith')
+        self.bob = User.objects.create(username='bobby', first_name='Bob', last_name='Jones')
+        UserProfile.objects.filter(user=self.alice).update(student_id='STU424242')
+        self.shop = Scenario.objects.create(
+            title='E-commerce Platform', introduction='I', aim='A', objectives='O', description='D',
+            created_by=self.admin_user
+        )
+        self.clinic = Scenario.objects.create(
+            title='Clinic Booking', introduction='I', aim='A', objectives='O', description='D',
+            created_by=self.admin_user
+        )
+        self.alice_shop = ScenarioSubmission.objects.create(scenario=self.shop, student=self.alice)
+        self.bob_clinic = ScenarioSubmission.objects.create(scenario=self.clinic, student=self.bob)
+
+    def search(self, query):
+        return set(search_submissions(ScenarioSubmission.objects.all(), query))
+
+    def test_sqlite_uses_fts_index(self):
+        """Test the FTS5 backend is picked when its table exists"""
+        self.assertIsInstance(get_search_backend(), SQLiteFTSSearch)
+
+    def test_search_matches_substrings_of_every_field(self):
+        """Test names, username, student ID and scenario title are all searchable"""
+        self.assertEqual(self.search('smi'), {self.alice_shop})
+        self.assertEqual(self.search('BOBB'), {self.bob_clinic})
+        self.assertEqual(self.search('424242'), {self.alice_shop})
+        self.assertEqual(self.search('commerce plat'), {self.alice_shop})
+        self.assertEqual(self.search('booking'), {self.bob_clinic})
+        self.assertEqual(self.search('nothing like this'), set())
+
+    def test_short_queries_fall_back(self):
+        """Test queries too short for trigrams still match through the Q filter"""
+        self.assertEqual(self.search('Jo'), {self.bob_clinic})
+        self.assertEqual(self.search('42'), {self.alice_shop})
+
+    def test_documents_follow_renames(self):
+        """Test renaming a student or scenario updates the search documents"""
+        self.alice.last_name = 'Walker'
+        self.alice.save()
+        self.assertEqual(self.search('walker'), {self.alice_shop})
+        self.assertEqual(self.search('smith'), set())
+
+        self.clinic.title = 'Hospital Rota'
+        self.clinic.save()
+        run_pending_jobs()
+        self.assertEqual(self.search('rota'), {self.bob_clinic})
+
+    def test_fallback_matches_index(self):
+        """Test the fallback filter agrees with the index on name, student ID and title queries"""
+        for query in ('alice', 'clinic', 'jones', 'platform', 'stu424'):
+            fallback = set(FallbackSearch().filter(ScenarioSubmission.objects.all(), query))
+            self.assertEqual(self.search(query), fallback)
+
+
+class NotificationRetentionTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='retention', password='testpass123')
+
+    def add_notifications(self, count, is_read, days_old):
+        Notification.objects.bulk_create([
+            Notification(user=self.user, title=f'N{i}', message='M', is_read=is_read)
+            for i in range(count)
+        ])
+        Notification.objects.filter(created_at__gte=timezone.now() - timedelta(minutes=1)).update(
+            created_at=timezone.now() - timedelta(days=days_old)
+        )
+
+    def test_prune_only_removes_old_read_notifications(self):
+        """Test pruning keeps unread and recent notifications"""
+        self.add_notifications(5, is_read=True, days_old=100)
+        self.add_notifications(2, is_read=False, days_old=100)
+        Notification.objects.create(user=self.user, title='Recent', message='M', is_read=True)
+
+        call_command('prune_notifications', days=90, batch_size=2, stdout=StringIO())
+        self.assertEqual(Notification.objects.filter(is_read=True).count(), 1)
+        self.assertEqual(Notification.objects.filter(is_read=False).count(), 2)
+
+    def test_prune_can_archive(self):
+        """Test --archive copies rows to the archive table before deleting them"""
+        self.add_notifications(3, is_read=True, days_old=100)
+        call_command('prune_notifications', days=90, archive=True, stdout=StringIO())
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(NotificationArchive.objects.filter(user=self.user).count(), 3)
+
+    def test_notifications_page_marks_only_visible_rows(self):
+        """Test viewing a page only marks that page's notifications as read"""
+        self.add_notifications(15, is_read=False, days_old=1)
+        UserProfile.objects.filter(user=self.user).update(unread_notifications=15)
+        self.client.login(username='retention', password='testpass123')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('notifications'))
+        self.assertEqual(Notification.objects.filter(user=self.user, is_read=False).count(), 5)
+        self.assertEqual(get_unread_count(self.user), 5)
+
+
+class StudentIdAllocatorTestCase(TestCase):
+    @override_settings(LAB_STUDENT_ID_BLOCK_SIZE=10)
+    def test_ids_are_unique_and_cost_one_query_per_block(self):
+        """Test IDs come from contiguous blocks reserved with one statement batch each"""
+        allocator = StudentIdAllocator()
+        with self.assertNumQueries(4), self.captureOnCommitCallbacks(execute=True):
+            # savepoint, counter update, counter read, release
+            first = allocator.allocate()
+        with self.assertNumQueries(0):
+            rest = [allocator.allocate() for _ in range(9)]
+        ids = [first] + rest
+        self.assertEqual(len(set(ids)), 10)
+        self.assertTrue(all(student_id.startswith('STU') for student_id in ids))
+        self.assertNotIn(allocator.allocate(), ids)
+
+    @override_settings(LAB_STUDENT_ID_BLOCK_SIZE=10)
+    def test_separate_allocators_never_share_ids(self):
+        """Test two workers' allocators receive disjoint blocks"""
+        first, second = StudentIdAllocator(), StudentIdAllocator()
+        ids = first.allocate_many(15) + second.allocate_many(15) + first.allocate_many(5)
+        self.assertEqual(len(set(ids)), len(ids))
+
+    @override_settings(LAB_STUDENT_ID_BLOCK_SIZE=10)
+    def test_rolled_back_block_is_not_reused(self):
+        """Test a block reserved in a rolled-back transaction isn't kept in memory"""
+        allocator = StudentIdAllocator()
+        try:
+            with transaction.atomic():
+                lost = allocator.allocate()
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(allocator._available, [])
+        self.assertEqual(StudentIdAllocator().allocate(), lost)
+
+    def test_new_students_get_unique_ids(self):
+        """Test the profile signal assigns distinct IDs and duplicates are rejected"""
+        users = [User.objects.create(username=f'idstudent{i}') for i in range(5)]
+        ids = [UserProfile.objects.get(user=user).student_id for user in users]
+        self.assertEqual(len(set(ids)), 5)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            UserProfile.objects.filter(user=users[1]).update(student_id=ids[0])
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ImportStudentsTestCase(TestCase):
+    def import_file(self, content, suffix, **options):
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False) as handle:
+            handle.write(content)
+        self.addCleanup(os.unlink, handle.name)
+        out, err = StringIO(), StringIO()
+        call_command('import_students', handle.name, workers=0, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_import_creates_students(self):
+        """Test imported users get hashed passwords, unique student IDs and a progress row"""
+        User.objects.create(username='taken')
+        stats = recompute_lab_stats()
+        out, err = self.import_file(
+            'username,email,first_name,last_name,password\n'
+            'amy,amy@example.com,Amy,Pond,secret1\n'
+            'rory,rory@example.com,Rory,Williams,\n'
+            'taken,taken@example.com,Tak,En,secret3\n'
+            'amy,dup@example.com,Dup,Licate,secret4\n',
+            '.csv', batch_size=1,
+        )
+        self.assertIn('Imported 2 students', out)
+        self.assertIn('skipped 2', out)
+        amy = User.objects.get(username='amy')
+        self.assertTrue(amy.check_password('secret1'))
+        self.assertEqual(amy.first_name, 'Amy')
+        self.assertFalse(User.objects.get(username='rory').has_usable_password())
+        profiles = UserProfile.objects.filter(user__username__in=['amy', 'rory'])
+        self.assertEqual({p.role for p in profiles}, {'student'})
+        self.assertEqual(len({p.student_id for p in profiles}), 2)
+        self.assertEqual(StudentProgress.objects.filter(student__username__in=['amy', 'rory']).count(), 2)
+        self.assertEqual(get_lab_stats().total_students, stats.total_students + 2)
+
+    def test_ndjson_import(self):
+        """Test NDJSON input is read line by line and bad lines are skipped"""
+        out, err = self.import_file(
+            '{"username": "clara", "password": "pw"}\n'
+            'not json\n'
+            '{"username": "bill", "password": "pw"}\n',
+            '.ndjson',
+        )
+        self.assertIn('Imported 2 students', out)
+        self.assertIn('invalid JSON', err)
+        self.assertEqual(UserProfile.objects.filter(user__username__in=['clara', 'bill']).count(), 2)
+
+
+class PerfInstrumentationTestCase(TestCase):
+    @override_settings(LAB_PERF_ENABLED=True, LAB_PERF_FLUSH_INTERVAL=0)
+    def test_middleware_records_request_timings(self):
+        """Test each request is sampled under its URL name and flushed to the table"""
+        student = User.objects.create_user(username='perfstudent', password='pass')
+        client = Client()
+        client.force_login(student)
+        client.get(reverse('scenario_list'))
+        timing = RequestTiming.objects.get()
+        self.assertEqual(timing.view_name, 'scenario_list')
+        self.assertEqual(timing.status_code, 200)
+        self.assertGreater(timing.query_count, 0)
+        self.assertGreater(timing.template_ms, 0)
+        self.assertGreaterEqual(timing.duration_ms, timing.template_ms)
+
+    def test_middleware_is_off_by_default(self):
+        """Test nothing is recorded unless LAB_PERF_ENABLED is set"""
+        self.client.get(reverse('home'))
+        self.assertFalse(RequestTiming.objects.exists())
+
+    def test_report_flags_growing_and_repeated_queries(self):
+        """Test the report prints percentiles and flags views whose queries scale with data"""
+        RequestTiming.objects.bulk_create([
+            RequestTiming(
+                view_name='scenario_list', method='GET', status_code=200, duration_ms=10 + i,
+                db_ms=1, template_ms=1, query_count=3 + i, max_repeated_queries=1 + i,
+                created_at=timezone.now() - timedelta(minutes=10 - i),
+            )
+            for i in range(9)
+        ] + [
+            RequestTiming(
+                view_name='home', method='GET', status_code=200, duration_ms=5,
+                db_ms=1, template_ms=1, query_count=2, max_repeated_queries=1,
+            )
+            for _ in range(3)
+        ])
+        out = StringIO()
+        call_command('lab_perf_report', stdout=out)
+        lines = {line.split()[0]: line for line in out.getvalue().splitlines()[1:]}
+        self.assertIn('N+1?', lines['scenario_list'])
+        self.assertIn('queries growing', lines['scenario_list'])
+        self.assertNotIn('N+1?', lines['home'])
+        self.assertNotIn('growing', lines['home'])
+
+
+class BenchLabTestCase(TestCase):
+    def test_seed_lab_builds_consistent_data(self):
+        """Test the synthetic lab has the requested shape and matching denormalized rows"""
+        seed_lab(
+            students=6, scenarios=4, submissions_per_student=3, requirements_per_submission=2,
+            notifications_per_student=2, seed=1, chunk_size=4,
+        )
+        self.assertEqual(UserProfile.objects.filter(role='student').count(), 6)
+        self.assertEqual(len(set(UserProfile.objects.filter(role='student').values_list('student_id', flat=True))), 6)
+        submissions = ScenarioSubmission.objects.count()
+        self.assertGreater(submissions, 0)
+        self.assertFalse(ScenarioSubmission.objects.exclude(status='draft').filter(requirements__isnull=True).exists())
+        stats = get_lab_stats()
+        self.assertEqual(stats.total_students, 6)
+        self.assertEqual(stats.total_submissions, submissions)
+        self.assertEqual(StudentProgress.objects.count(), 6)
+        self.assertEqual(
+            Notification.objects.filter(title='Feedback Received').count(),
+            Feedback.objects.count(),
+        )
+        self.assertEqual(
+            sum(UserProfile.objects.values_list('unread_notifications', flat=True)),
+            Notification.objects.filter(is_read=False).count(),
+        )
+
+    def test_bench_lab_writes_results_for_every_route(self):
+        """Test every URL name is benchmarked and the JSON is written"""
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as handle:
+            path = handle.name
+        self.addCleanup(os.unlink, path)
+        call_command(
+            'bench_lab', no_fresh_db=True, students=4, scenarios=3, submissions_per_student=3,
+            requirements_per_submission=2, iterations=1, warmup=0, output=path, stdout=StringIO(), stderr=StringIO(),
+        )
+        with open(path) as handle:
+            results = json.load(handle)
+        benchmarked = {key.split(':', 1)[1].split('?')[0].split()[0] for key in results['routes']}
+        from .urls import urlpatterns
+        self.assertEqual(benchmarked, {pattern.name for pattern in urlpatterns})
+        self.assertTrue(all(result['status'] < 400 for result in results['routes'].values()))
+
+
+class ExplainHotQueriesTestCase(TestCase):
+    def test_hot_queries_use_indexes(self):
+        """Test none of the views' hot querysets needs a full table scan"""
+        out = StringIO()
+        call_command('explain_hot_queries', stdout=out)
+        self.assertIn('Every hot query uses an index', out.getvalue())
+
+    def test_full_scan_detection(self):
+        """Test plain table scans are reported and index searches/ordered index scans are not"""
+        plan = '\n'.join([
+            '3 0 0 SCAN lab_scenario',
+            '5 0 0 SEARCH lab_notification USING INDEX lab_notif_user_created (user_id=?)',
+            '9 0 0 SCAN lab_scenariosubmission USING INDEX lab_sub_updated',
+            '2 0 0 SCAN CONSTANT ROW',
+        ])
+        self.assertEqual(full_scans(plan), ['lab_scenario'])
+
+
+class ScenarioListFragmentCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username='fragadmin', password='pass', is_superuser=True)
+        self.student = User.objects.create_user(username='fragstudent', password='pass')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.scenario = Scenario.objects.create(
+                title='Library System', introduction='-', aim='-', objectives='-', description='-',
+                created_by=self.admin,
+            )
+        self.client.force_login(self.student)
+
+    def catalog_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('scenario_list'))
+        tables = ('"lab_scenario"', '"lab_scenariosubmission"')
+        return response, [q['sql'] for q in ctx.captured_queries if any(t in q['sql'] for t in tables)]
+
+    def test_repeat_visit_is_served_from_cache(self):
+        """Test a repeat visit doesn't load scenarios or submissions"""
+        response, queries = self.catalog_queries()
+        self.assertContains(response, 'Library System')
+        self.assertTrue(queries)
+        response, queries = self.catalog_queries()
+        self.assertContains(response, 'Library System')
+        self.assertEqual(queries, [])
+
+    def test_scenario_and_submission_writes_invalidate(self):
+        """Test editing a scenario or the student's submission re-renders the grid"""
+        self.catalog_queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.scenario.title = 'Hospital System'
+            self.scenario.save()
+        response, queries = self.catalog_queries()
+        self.assertContains(response, 'Hospital System')
+        self.assertTrue(queries)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ScenarioSubmission.objects.create(scenario=self.scenario, student=self.student, status='submitted')
+        response, queries = self.catalog_queries()
+        self.assertTrue(queries)
+        self.assertContains(response, 'View Results')
+
+    def test_other_students_submissions_do_not_invalidate(self):
+        """Test one student's writes don't evict another student's fragment"""
+        self.catalog_queries()
+        other = User.objects.create_user(username='otherfrag', password='pass')
+        with self.captureOnCommitCallbacks(execute=True):
+            ScenarioSubmission.objects.create(scenario=self.scenario, student=other)
+        response, queries = self.catalog_queries()
+        self.assertEqual(queries, [])
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'tiered_l2': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tiered-l2'},
+})
+class TieredCacheTestCase(TestCase):
+    def worker(self, name, **options):
+        """A TieredCache with its own L1, standing in for one gunicorn worker."""
+        options = {'L1_NAME': f'{self.id()}:{name}', 'POLL_INTERVAL': 0, **options}
+        return TieredCache('tiered_l2', {'OPTIONS': options})
+
+    def setUp(self):
+        self.a = self.worker('a')
+        self.b = self.worker('b')
+        self.a.l2.clear()
+
+    def test_repeat_reads_are_served_from_l1(self):
+        """Test a warm key is read from the process-local tier"""
+        self.a.set('badge', 3)
+        self.assertEqual(self.b.get('badge'), 3)
+        # Written behind the tiered cache's back, so nobody is told to evict
+        self.a.l2.set('badge', 4)
+        self.assertEqual(self.b.get('badge'), 3)
+
+    def test_writes_evict_other_workers(self):
+        """Test set, delete and clear in one worker are seen by another"""
+        self.a.set('badge', 3)
+        self.assertEqual(self.b.get('badge'), 3)
+        self.a.set('badge', 5)
+        self.assertEqual(self.b.get('badge'), 5)
+
+        self.a.set_many({'x': 1, 'y': 2})
+        self.assertEqual(self.b.get_many(['x', 'y', 'z']), {'x': 1, 'y': 2})
+        self.a.delete('x')
+        self.assertIsNone(self.b.get('x'))
+        self.a.incr('y', 10)
+        self.assertEqual(self.b.get('y'), 12)
+
+        self.a.clear()
+        self.assertIsNone(self.b.get('badge'))
+        self.assertIsNone(self.b.get('y'))
+
+    def test_own_writes_stay_in_l1(self):
+        """Test a worker's poll doesn't evict the entries it wrote itself"""
+        self.a.get('warmup')
+        self.a.set('badge', 3)
+        # Written behind the tiered cache's back, so only an eviction would reveal it
+        self.a.l2.set('badge', 4)
+        self.assertEqual(self.a.get('badge'), 3)
+        self.b.set('badge', 5)
+        self.assertEqual(self.a.get('badge'), 5)
+
+    def test_fills_write_no_invalidations(self):
+        """Test storing a value after a miss publishes nothing, and overwriting it does"""
+        self.assertIsNone(self.a.get('badge'))
+        self.a.set('badge', 3)
+        self.a.set_many({'x': 1})
+        self.assertTrue(self.a.add('y', 2))
+        self.assertFalse(CacheInvalidation.objects.exists())
+        self.a.set('badge', 4)
+        self.assertEqual(list(CacheInvalidation.objects.values_list('key', flat=True)), [self.a.make_key('badge')])
+
+    def test_poll_interval_bounds_staleness(self):
+        """Test a worker only polls the invalidation table once per interval"""
+        slow = self.worker('slow', POLL_INTERVAL=3600)
+        self.a.set('badge', 3)
+        self.assertEqual(slow.get('badge'), 3)
+        self.a.set('badge', 5)
+        with self.assertNumQueries(0):
+            self.assertEqual(slow.get('badge'), 3)
+
+    def test_add_and_fragment_versions_are_shared(self):
+        """Test add() agrees across workers and a version bump reaches every worker"""
+        self.assertTrue(self.a.add('version', 'v1'))
+        self.assertFalse(self.b.add('version', 'v2'))
+        self.assertEqual(self.b.get('version'), 'v1')
+        self.b.set_many({'version': 'v3'})
+        self.assertEqual(self.a.get('version'), 'v3')
+
+    def test_old_invalidations_are_pruned(self):
+        """Test invalidation rows older than any live L1 entry are deleted"""
+        worker = self.worker('pruning', PRUNE_EVERY=2, L1_TIMEOUT=10)
+        worker.set('old', 1)
+        worker.set('old', 2)
+        CacheInvalidation.objects.update(created_at=timezone.now() - timedelta(hours=1))
+        worker.set('new', 1)
+        worker.set('new', 2)
+        self.assertEqual(list(CacheInvalidation.objects.values_list('key', flat=True)), [worker.make_key('new')])
+
+
+class BoundedLocMemCacheTestCase(TestCase):
+    def test_entries_expire_within_max_timeout(self):
+        """Test entries set without a timeout still expire after MAX_TIMEOUT"""
+        local = BoundedLocMemCache(f'{self.id()}', {'OPTIONS': {'MAX_TIMEOUT': 60}})
+        local.set('version', 'v1', None)
+        local.set('short', 1, 5)
+        with mock.patch('time.time', return_value=time.time() + 30):
+            self.assertEqual(local.get('version'), 'v1')
+            self.assertIsNone(local.get('short'))
+        with mock.patch('time.time', return_value=time.time() + 61):
+            self.assertIsNone(local.get('version'))
+
+
+class RoleResolutionTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = User.objects.create_user(username='rolestudent', password='pass')
+        self.superuser = User.objects.create_user(username='roleroot', password='pass', is_superuser=True)
+        # A superuser whose profile predates their promotion
+        UserProfile.objects.filter(user=self.superuser).update(role='student')
+
+    def writes(self, ctx):
+        return [
+            q['sql'] for q in ctx.captured_queries
+            if q['sql'].startswith(('INSERT', 'UPDATE', 'DELETE')) and '"lab_userprofile"' in q['sql']
+        ]
+
+    def test_admin_pages_never_write_profiles(self):
+        """Test superusers reach admin pages without their profile being repaired on the way"""
+        self.client.force_login(self.superuser)
+        for name in ('dashboard', 'admin_scenarios', 'admin_submissions'):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(reverse(name))
+            self.assertEqual(response.status_code, 200, name)
+            self.assertEqual(self.writes(ctx), [], name)
+        self.assertEqual(UserProfile.objects.get(user=self.superuser).role, 'student')
+
+    def test_profile_is_loaded_with_the_session_user(self):
+        """Test resolving the role and rendering the nav add no profile queries"""
+        self.client.force_login(self.student)
+        # Warm the cached counters, which read their own profile columns
+        self.client.get(reverse('scenario_list'))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('scenario_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([q for q in ctx.captured_queries if 'FROM "lab_userprofile"' in q['sql']], [])
+
+    def test_missing_profile_counts_as_student_without_writes(self):
+        """Test a user without a profile is treated as a student and no profile is created"""
+        UserProfile.objects.filter(user=self.student).delete()
+        self.client.force_login(self.student)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('scenario_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.writes(ctx), [])
+        self.assertFalse(UserProfile.objects.filter(user=self.student).exists())
+
+    def test_cached_role_follows_profile_changes(self):
+        """Test the cached role is dropped when the profile changes"""
+        user = User.objects.get(pk=self.student.pk)
+        self.assertEqual(get_user_role(user), 'student')
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_role(User(pk=self.student.pk)), 'student')
+        with self.captureOnCommitCallbacks(execute=True):
+            profile = UserProfile.objects.get(user=self.student)
+            profile.role = 'admin'
+            profile.save()
+        self.assertEqual(get_user_role(User(pk=self.student.pk)), 'admin')
+
+    def test_repair_profiles(self):
+        """Test repair_profiles creates missing profiles and promotes superusers"""
+        orphan = User.objects.create_user(username='roleorphan', password='pass')
+        UserProfile.objects.filter(user=orphan).delete()
+        out = StringIO()
+        call_command('repair_profiles', '--dry-run', stdout=out)
+        self.assertIn('1 profiles to create, 1 to promote', out.getvalue())
+        self.assertFalse(UserProfile.objects.filter(user=orphan).exists())
+
+        call_command('repair_profiles', stdout=StringIO())
+        profile = UserProfile.objects.get(user=orphan)
+        self.assertEqual(profile.role, 'student')
+        self.assertTrue(profile.student_id)
+        self.assertEqual(UserProfile.objects.get(user=self.superuser).role, 'admin')
+
+
+class ScenarioDetailReadPathTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username='detailadmin', password='pass', is_superuser=True)
+        self.student = User.objects.create_user(username='detailstudent', password='pass')
+        self.scenario = Scenario.objects.create(
+            title='Parking System', introduction='-', aim='-', objectives='-', description='-',
+            created_by=self.admin,
+        )
+        self.client.force_login(self.student)
+        self.url = reverse('scenario_detail', kwargs={'pk': self.scenario.pk})
+
+    def get(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response, [q['sql'] for q in ctx.captured_queries]
+
+    def test_first_visit_writes_nothing(self):
+        """Test viewing a scenario without a draft inserts no submission"""
+        response, queries = self.get()
+        self.assertEqual([sql for sql in queries if sql.startswith(('INSERT', 'UPDATE'))], [])
+        self.assertFalse(ScenarioSubmission.objects.exists())
+        self.assertContains(response, reverse('add_scenario_requirement', kwargs={'pk': self.scenario.pk}))
+
+    def test_requirements_load_in_one_query(self):
+        """Test the page's query count doesn't depend on the number of requirements"""
+        submission = ScenarioSubmission.objects.create(scenario=self.scenario, student=self.student)
+        Requirement.objects.create(submission=submission, requirement_type='functional', title='F1', description='-')
+        self.get()  # warm the cached counters
+        response, queries = self.get()
+        for i, requirement_type in enumerate(['functional', 'non_functional', 'business'] * 3):
+            Requirement.objects.create(submission=submission, requirement_type=requirement_type, title=f'R{i}', description='-')
+        response, more_queries = self.get()
+        self.assertEqual(len(more_queries), len(queries))
+        self.assertEqual(len([sql for sql in more_queries if 'FROM "lab_requirement"' in sql]), 1)
+        self.assertContains(response, 'R8')
+        self.assertEqual(len(response.context['functional_reqs']), 4)
+
+    def test_add_requirement_to_submitted_draft_is_refused(self):
+        """Test the scenario-level add doesn't touch a submitted submission"""
+        ScenarioSubmission.objects.create(scenario=self.scenario, student=self.student, status='submitted')
+        self.client.post(reverse('add_scenario_requirement', kwargs={'pk': self.scenario.pk}), {
+            'requirement_type': 'functional', 'title': 'Late', 'description': '-', 'priority': 'low',
+        })
+        self.assertFalse(Requirement.objects.exists())
+
+
+class ConditionalGetTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username='etagadmin', password='pass', is_superuser=True)
+        self.student = User.objects.create_user(username='etagstudent', password='pass')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.scenario = Scenario.objects.create(
+                title='Ticketing System', introduction='-', aim='-', objectives='-', description='-',
+                created_by=self.admin,
+            )
+            self.submission = ScenarioSubmission.objects.create(scenario=self.scenario, student=self.student)
+        self.client.force_login(self.student)
+
+    def revalidate(self, url):
+        """GET `url`, then GET it again with the ETag; return the second status code."""
+        self.client.get(url)  # the first visit sets the CSRF cookie, which is part of the ETag
+        etag = self.client.get(url)['ETag']
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, etag
+
+    def test_unchanged_pages_get_304_without_running_the_view(self):
+        """Test a reload of an unchanged page is answered with 304 before any page queries"""
+        for url in (
+            reverse('scenario_list'),
+            reverse('scenario_detail', kwargs={'pk': self.scenario.pk}),
+            reverse('submission_detail', kwargs={'pk': self.submission.pk}),
+            reverse('notifications'),
+        ):
+            # The first visits set the CSRF cookie and mark notifications read
+            self.client.get(url)
+            self.client.get(url)
+            etag = self.client.get(url)['ETag']
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304, url)
+            self.assertEqual(response.content, b'')
+            self.assertLessEqual(len([q for q in ctx.captured_queries if 'FROM "lab_' in q['sql']]), 1, url)
+
+    def test_student_work_changes_the_etag(self):
+        """Test requirement, feedback and scenario writes invalidate the pages that show them"""
+        detail = reverse('scenario_detail', kwargs={'pk': self.scenario.pk})
+        status, etag = self.revalidate(detail)
+        self.assertEqual(status, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            Requirement.objects.create(submission=self.submission, requirement_type='functional', title='New', description='-')
+        self.assertEqual(self.client.get(detail, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        submission_url = reverse('submission_detail', kwargs={'pk': self.submission.pk})
+        status, etag = self.revalidate(submission_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Feedback.objects.create(submission=self.submission, feedback_type='general', title='Good', content='-', admin=self.admin)
+        self.assertEqual(self.client.get(submission_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        status, etag = self.revalidate(reverse('scenario_list'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.scenario.title = 'Ticketing System v2'
+            self.scenario.save()
+        self.assertEqual(self.client.get(reverse('scenario_list'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_new_notification_changes_the_etag(self):
+        url = reverse('notifications')
+        self.client.get(url)
+        status, etag = self.revalidate(url)
+        self.assertEqual(status, 304)
+        Notification.objects.create(user=self.student, title='Hello', message='-')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_pending_messages_get_the_full_page(self):
+        """Test a page with a flash message waiting is never answered with 304"""
+        url = reverse('scenario_detail', kwargs={'pk': self.scenario.pk})
+        etag = self.client.get(url)['ETag']
+        # An invalid form redirects back with error messages and changes nothing
+        self.client.post(reverse('add_scenario_requirement', kwargs={'pk': self.scenario.pk}), {})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Please correct the errors below.')
+
+
+class RequirementsApiTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username='apiadmin', password='pass', is_superuser=True)
+        self.student = User.objects.create_user(username='apistudent', password='pass')
+        self.scenario = Scenario.objects.create(
+            title='Booking System', introduction='-', aim='-', objectives='-', description='-',
+            created_by=self.admin,
+        )
+        self.submission = ScenarioSubmission.objects.create(scenario=self.scenario, student=self.student)
+        self.client.force_login(self.student)
+        self.url = reverse('requirements_api', kwargs={'submission_id': self.submission.pk})
+        self.batch_url = reverse('requirements_batch_api', kwargs={'submission_id': self.submission.pk})
+
+    def requirement(self, i=0, **fields):
+        return {'requirement_type': 'functional', 'title': f'Requirement {i}', 'description': '-', **fields}
+
+    def test_batch_of_forty_creates_in_one_request(self):
+        """Test a batch is written with one INSERT and only the changed rows come back"""
+        existing = Requirement.objects.create(submission=self.submission, requirement_type='business', title='Old', description='-')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(self.batch_url, {
+                'create': [self.requirement(i) for i in range(40)],
+                'update': [{'id': existing.pk, 'priority': 'high'}],
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(len(body['created']), 40)
+        self.assertTrue(all(row['id'] for row in body['created']))
+        self.assertEqual([row['priority'] for row in body['updated']], ['high'])
+        self.assertEqual(len([q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "lab_requirement"')]), 1)
+        self.assertEqual(self.submission.requirements.count(), 41)
+
+    def test_invalid_batch_writes_nothing(self):
+        """Test one invalid operation rejects the whole batch"""
+        response = self.client.post(self.batch_url, {
+            'create': [self.requirement(1), self.requirement(2, requirement_type='made_up')],
+            'delete': [999999],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()['errors']), {'create.1', 'delete.0'})
+        self.assertFalse(Requirement.objects.exists())
+
+    def test_single_operations(self):
+        """Test list, create, update and delete of one requirement"""
+        response = self.client.post(self.url, self.requirement(), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        pk = response.json()['created'][0]['id']
+        detail = reverse('requirement_api', kwargs={'submission_id': self.submission.pk, 'pk': pk})
+
+        response = self.client.patch(detail, {'title': 'Renamed'}, content_type='application/json')
+        self.assertEqual(response.json()['updated'][0]['title'], 'Renamed')
+        self.assertEqual(self.client.get(self.url).json()['requirements'][0]['title'], 'Renamed')
+
+        response = self.client.delete(detail)
+        self.assertEqual(response.json()['deleted'], [pk])
+        self.assertEqual(self.client.get(self.url).json()['requirements'], [])
+
+    def test_progress_and_page_versions_follow_bulk_writes(self):
+        """Test the first bulk-created requirement counts as work and invalidates the student's pages"""
+        progress = get_student_progress(self.student)
+        self.assertEqual(progress.active_with_work_count, 0)
+        etag = self.client.get(reverse('scenario_detail', kwargs={'pk': self.scenario.pk}))['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.batch_url, {'create': [self.requirement(1), self.requirement(2)]}, content_type='application/json')
+        progress.refresh_from_db()
+        self.assertEqual(progress.active_with_work_count, 1)
+        response = self.client.get(reverse('scenario_detail', kwargs={'pk': self.scenario.pk}), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_deleting_every_requirement_counts_the_draft_once(self):
+        """Test a batch that empties a draft takes one off the progress count, not one per row"""
+        other = ScenarioSubmission.objects.create(scenario=Scenario.objects.create(
+            title='Library', introduction='-', aim='-', objectives='-', description='-', created_by=self.admin,
+        ), student=self.student)
+        Requirement.objects.create(submission=other, requirement_type='business', title='Other', description='-')
+        ids = [
+            Requirement.objects.create(submission=self.submission, requirement_type='functional', title=f'R{i}', description='-').pk
+            for i in range(3)
+        ]
+        progress = get_student_progress(self.student)
+        self.assertEqual(progress.active_with_work_count, 2)
+        self.client.post(self.batch_url, {'delete': ids}, content_type='application/json')
+        progress.refresh_from_db()
+        self.assertEqual(progress.active_with_work_count, 1)
+        self.client.post(self.batch_url, {'create': [self.requirement(1)]}, content_type='application/json')
+        progress.refresh_from_db()
+        self.assertEqual(progress.active_with_work_count, 2)
+
+    def test_batch_delete_bumps_the_version_once(self):
+        """Test deleting forty requirements doesn't look up their submission once per row"""
+        ids = [
+            Requirement.objects.create(submission=self.submission, requirement_type='functional', title=f'R{i}', description='-').pk
+            for i in range(40)
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(self.batch_url, {'delete': ids}, content_type='application/json')
+        lookups = [q for q in ctx.captured_queries if q['sql'].startswith('SELECT "lab_scenariosubmission"."student_id"')]
+        self.assertEqual(lookups, [])
+        self.assertFalse(self.submission.requirements.exists())
+
+    def test_other_students_and_submitted_work_are_refused(self):
+        """Test the API only writes the caller's own drafts"""
+        other = User.objects.create_user(username='apiother', password='pass')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.client.force_login(self.student)
+        ScenarioSubmission.objects.filter(pk=self.submission.pk).update(status='submitted')
+        response = self.client.post(self.url, self.requirement(), content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+
+
+class RequirementImportExportTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username='ioadmin', password='pass', is_superuser=True)
+        self.student = User.objects.create_user(username='iostudent', password='pass')
+        self.scenario = Scenario.objects.create(
+            title='Booking System', introduction='-', aim='-', objectives='-', description='-',
+            created_by=self.admin,
+        )
+        self.client.force_login(self.student)
+        self.url = reverse('import_scenario_requirements', kwargs={'pk': self.scenario.pk})
+
+    def upload(self, name, content):
+        return self.client.post(self.url, {'file': SimpleUploadedFile(name, content.encode())})
+
+    def test_csv_import_in_batches(self):
+        """Test a CSV file is imported into a new draft in bulk"""
+        rows = ''.join(f'functional,Requirement {i},"Line, with comma",high\n' for i in range(600))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.upload('reqs.csv', 'requirement_type,title,description,priority\n' + rows)
+        # Rows are inserted in bulk (SQLite splits each bulk_create by its variable limit), never one by one
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "lab_requirement"')]
+        self.assertLessEqual(len(inserts), 10)
+        self.assertRedirects(response, reverse('scenario_detail', kwargs={'pk': self.scenario.pk}))
+        submission = ScenarioSubmission.objects.get(scenario=self.scenario, student=self.student)
+        self.assertEqual(submission.requirements.count(), 600)
+        self.assertEqual(submission.requirements.filter(description='Line, with comma', priority='high').count(), 600)
+
+    def test_ndjson_import_defaults_priority(self):
+        """Test NDJSON lines are imported and a missing priority gets its default"""
+        response = self.upload('reqs.ndjson', '{"requirement_type": "business", "title": "A", "description": "-"}\n\n'
+                                              '{"requirement_type": "non_functional", "title": "B", "description": "-", "priority": "low"}\n')
+        self.assertEqual(response.status_code, 302)
+        submission = ScenarioSubmission.objects.get(scenario=self.scenario, student=self.student)
+        self.assertEqual(list(submission.requirements.order_by('title').values_list('title', 'priority')), [('A', 'medium'), ('B', 'low')])
+
+    def test_json_array_import(self):
+        """Test a .json file holding an array of objects is imported, and a broken one reports its line"""
+        response = self.upload('reqs.json', '[\n  {"requirement_type": "business", "title": "A", "description": "-"},\n'
+                                            '  {"requirement_type": "functional", "title": "B", "description": "-"}\n]\n')
+        self.assertEqual(response.status_code, 302)
+        submission = ScenarioSubmission.objects.get(scenario=self.scenario, student=self.student)
+        self.assertEqual(sorted(submission.requirements.values_list('title', flat=True)), ['A', 'B'])
+
+        response = self.upload('more.json', '[\n  {"requirement_type": "business", "title": "C", "description": "-"},\n  {"title": }\n]')
+        self.assertEqual(submission.requirements.count(), 2)
+        errors = [str(m) for m in get_messages(response.wsgi_request)]
+        self.assertTrue(any(m.startswith('Line 3: Invalid JSON') for m in errors))
+
+    def test_invalid_line_imports_nothing(self):
+        """Test one bad line rolls back the whole file, including the draft it created"""
+        response = self.upload('reqs.csv', 'requirement_type,title,description\nfunctional,Good,-\nmade_up,,-\n')
+        self.assertFalse(ScenarioSubmission.objects.exists())
+        self.assertFalse(Requirement.objects.exists())
+        errors = [str(m) for m in get_messages(response.wsgi_request)]
+        self.assertTrue(any(m.startswith('Line 3: ') and 'requirement_type' in m and 'title' in m for m in errors))
+
+    def test_export_streams_and_imports_again(self):
+        """Test an export streams every requirement and can be imported as it is"""
+        submission = ScenarioSubmission.objects.create(scenario=self.scenario, student=self.student)
+        for i in range(3):
+            Requirement.objects.create(submission=submission, requirement_type='functional', title=f'R{i}', description='a\nb')
+        exports = {}
+        for file_format in ('csv', 'ndjson'):
+            url = reverse('export_submission_requirements', kwargs={'pk': submission.pk})
+            response = self.client.get(url, {'format': file_format})
+            self.assertTrue(response.streaming)
+            self.assertIn(f'requirements-{submission.pk}.{file_format}', response['Content-Disposition'])
+            exports[file_format] = b''.join(response.streaming_content).decode()
+        for file_format, content in exports.items():
+            self.upload(f'export.{file_format}', content)
+        self.assertEqual(submission.requirements.count(), 9)
+        self.assertEqual(submission.requirements.filter(description='a\nb').count(), 9)
+
+    def test_export_is_limited_to_owner_and_admins(self):
+        """Test another student can't export someone's requirements"""
+        submission = ScenarioSubmission.objects.create(scenario=self.scenario, student=self.student)
+        url = reverse('export_submission_requirements', kwargs={'pk': submission.pk})
+        self.client.force_login(User.objects.create_user(username='iosnoop', password='pass'))
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class SRSAutosaveTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username='srsadmin', password='pass', is_superuser=True)
+        self.student = User.objects.create_user(username='srsstudent', password='pass')
+        self.scenario = Scenario.objects.create(
+            title='Booking System', introduction='-', aim='-', objectives='-', description='-',
+            created_by=self.admin,
+        )
+        self.submission = ScenarioSubmission.objects.create(scenario=self.scenario, student=self.student)
+        self.client.force_login(self.student)
+        self.url = reverse('srs_autosave', kwargs={'submission_id': self.submission.pk})
+
+    def autosave(self, version, flush=False, **sections):
+        return self.client.post(self.url, {'version': version, 'sections': sections, 'flush': flush}, content_type='application/json')
+
+    def test_rapid_saves_are_coalesced(self):
+        """Test saves within the interval are deferred and a flush writes only the sent sections"""
+        response = self.autosave(0, introduction='Intro')
+        self.assertEqual(response.json(), {'saved': True, 'version': 1, 'retry_after': 0})
+        with CaptureQueriesContext(connection) as ctx:
+            for i in range(50):
+                response = self.autosave(1, system_features=f'Typing {i}')
+                self.assertEqual(response.status_code, 202)
+        self.assertFalse([q for q in ctx.captured_queries if q['sql'].startswith('UPDATE')])
+        self.assertGreater(response.json()['retry_after'], 0)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.autosave(1, flush=True, system_features='Typing done')
+        self.assertEqual(response.json()['version'], 2)
+        update, = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertIn('"system_features"', update)
+        self.assertNotIn('"introduction"', update)
+        document = SRSDocument.objects.get(submission=self.submission)
+        self.assertEqual((document.introduction, document.system_features, document.version), ('Intro', 'Typing done', 2))
+
+    @override_settings(LAB_SRS_AUTOSAVE_INTERVAL=0)
+    def test_stale_version_is_rejected(self):
+        """Test a save based on an older version is refused and writes nothing"""
+        self.autosave(0, introduction='First tab')
+        self.autosave(1, introduction='First tab again')
+        response = self.autosave(1, introduction='Second tab')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['version'], 2)
+        self.assertEqual(SRSDocument.objects.get(submission=self.submission).introduction, 'First tab again')
+
+    def test_invalid_sections_and_submitted_work_are_refused(self):
+        """Test unknown sections are rejected and a submitted SRS can't change"""
+        response = self.autosave(0, title='Not a section')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('title', response.json()['errors'])
+        ScenarioSubmission.objects.filter(pk=self.submission.pk).update(status='submitted')
+        self.assertEqual(self.autosave(0, introduction='Late').status_code, 409)
+        self.assertFalse(SRSDocument.objects.exists())
+
+    def test_editor_form_saves_changed_sections(self):
+        """Test the editor page is write-free and its form writes only the changed sections"""
+        url = reverse('srs_editor', kwargs={'submission_id': self.submission.pk})
+        self.autosave(0, introduction='Intro', overall_description='Overview')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertContains(response, 'Overview')
+        self.assertFalse([q for q in ctx.captured_queries if q['sql'].startswith(('INSERT', 'UPDATE'))])
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(url, {'version': 1, 'introduction': 'Intro', 'overall_description': 'Changed'})
+        update, = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "lab_srsdocument"')]
+        self.assertRedirects(response, url)
+        self.assertIn('"overall_description"', update)
+        self.assertNotIn('"introduction"', update)
+        self.assertEqual(self.client.post(url, {'version': 1, 'introduction': 'Stale'}).status_code, 200)
+        self.assertEqual(SRSDocument.objects.get(submission=self.submission).introduction, 'Intro')
+
+
+class SRSRenderTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username='renderadmin', password='pass', is_superuser=True)
+        self.student = User.objects.create_user(username='renderstudent', password='pass', first_name='Ada', last_name='Lovelace')
+        self.scenario = Scenario.objects.create(
+            title='Booking System', introduction='-', aim='-', objectives='-', description='-',
+            created_by=self.admin,
+        )
+        self.submission = ScenarioSubmission.objects.create(scenario=self.scenario, student=self.student)
+        SRSDocument.objects.create(submission=self.submission, introduction='Purpose <b>here</b>', system_features='Features')
+        self.requirement = Requirement.objects.create(
+            submission=self.submission, requirement_type='functional', title='Book a room', description='Rooms', priority='high'
+        )
+        Requirement.objects.create(submission=self.submission, requirement_type='business', title='Cut costs', description='Money')
+        self.url = reverse('srs_render', kwargs={'submission_id': self.submission.pk})
+        self.client.force_login(self.student)
+
+    def render(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_document_groups_requirements_under_sections(self):
+        """Test the HTML and Markdown documents contain the sections and the grouped requirements"""
+        html = self.render()
+        self.assertIn('Purpose &lt;b&gt;here&lt;/b&gt;', html)
+        self.assertIn('Ada Lovelace', html)
+        self.assertLess(html.index('4.1 Functional Requirements'), html.index('Book a room'))
+        self.assertLess(html.index('6.1 Business Requirements'), html.index('Cut costs'))
+        self.assertNotIn('5.1 ', html)
+        markdown = self.render(format='md')
+        self.assertIn('## 1. Introduction\n\nPurpose <b>here</b>', markdown)
+        self.assertIn('#### 4.R1 Book a room\n\n_High priority_', markdown)
+
+    def test_unchanged_document_is_served_from_cache(self):
+        """Test a second render reads only timestamps, and an edit produces a new document"""
+        first = self.render()
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.render(), first)
+        self.assertFalse([q for q in ctx.captured_queries if '"lab_requirement"."title"' in q['sql']])
+        self.assertFalse([q for q in ctx.captured_queries if '"lab_srsdocument"."introduction"' in q['sql']])
+
+        self.requirement.title = 'Book a desk'
+        self.requirement.save()
+        self.assertIn('Book a desk', self.render())
+        self.requirement.delete()
+        self.assertNotIn('Book a desk', self.render())
+
+    def test_only_owner_and_admins_can_read(self):
+        """Test another student is turned away and an admin can read the document"""
+        self.client.force_login(User.objects.create_user(username='rendersnoop', password='pass'))
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+        self.client.force_login(self.admin)
+        self.assertIn('Book a room', self.render())
+
+
+class ScenarioDeleteTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username='deleteadmin', password='pass', is_superuser=True)
+        self.client.force_login(self.admin)
+        self.scenario = Scenario.objects.create(
+            title='Doomed scenario', introduction='i', aim='a', objectives='o', description='d', created_by=self.admin
+        )
+
+    def test_pending_delete_is_hidden_from_admins(self):
+        """Test a deleted scenario leaves the admin list and can't be edited back before the job runs"""
+        self.client.post(reverse('delete_scenario', args=[self.scenario.pk]))
+        self.scenario.refresh_from_db()
+        self.assertIsNotNone(self.scenario.deleted_at)
+        self.assertNotIn(self.scenario, self.client.get(reverse('admin_scenarios')).context['scenarios'])
+        self.assertEqual(self.client.get(reverse('edit_scenario', args=[self.scenario.pk])).status_code, 404)
+
+        run_pending_jobs()
+        self.assertFalse(Scenario.objects.filter(pk=self.scenario.pk).exists())
+
+    def test_job_only_deletes_tombstoned_scenarios(self):
+        """Test the delete job leaves a scenario without a tombstone alone"""
+        enqueue('delete_scenario', scenario_id=self.scenario.pk)
+        run_pending_jobs()
+        self.assertTrue(Scenario.objects.filter(pk=self.scenario.pk).exists())
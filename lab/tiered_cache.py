@@ -0,0 +1,267 @@
+"""
+Two-tier cache backend: a small in-process LRU (L1) in front of a shared
+Django cache (L2), such as the database cache table or a file cache.
+
+Reads are served from L1 when possible and fall back to L2. Every write goes
+to L2, and every write that replaces or removes a value (set or set_many of
+an existing key, delete, incr, clear) also appends the key to the
+CacheInvalidation table. Storing a key that L2 doesn't hold, such as the fill
+after a cache miss or add(), publishes nothing: another L1 can only hold such
+a key past its L2 expiry, which L1_TIMEOUT bounds. Each process polls that table at most every
+POLL_INTERVAL seconds, one indexed query for the rows past the last id it has
+seen, and drops those keys from its L1. A write in one gunicorn worker is
+therefore visible in the others within POLL_INTERVAL, and L1_TIMEOUT bounds
+how long an L1 entry can live at all.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'lab.tiered_cache.TieredCache',
+            'LOCATION': 'shared',  # alias of the L2 cache
+            'OPTIONS': {'L1_MAX_ENTRIES': 1000, 'L1_TIMEOUT': 60, 'POLL_INTERVAL': 1},
+        },
+        'shared': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'lab_cache',
+        },
+    }
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils import timezone
+
+_MISSING = object()
+# Invalidation key that empties every L1
+_CLEAR_ALL = '*'
+
+# L1 stores are shared by the per-thread backend instances of a process, like LocMemCache
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class _L1:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (pickled value, monotonic expiry)
+        self.lock = threading.Lock()
+        self.seen = None  # last CacheInvalidation id applied
+        self.own = set()  # ids of invalidations this process wrote, whose L1 entries are current
+        self.next_poll = 0.0
+        self.writes = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return _MISSING
+            pickled, expires = entry
+            if expires <= time.monotonic():
+                del self.entries[key]
+                return _MISSING
+            self.entries.move_to_end(key)
+        return pickle.loads(pickled)
+
+    def set(self, key, value, expires):
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.entries[key] = (pickled, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def evict(self, keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.own.clear()
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._l2_alias = location
+        self.l1_timeout = options.get('L1_TIMEOUT', 60)
+        self.poll_interval = options.get('POLL_INTERVAL', 1)
+        # Invalidation rows older than this can no longer refer to a live L1 entry
+        self.retention = max(60, 2 * self.l1_timeout + self.poll_interval)
+        self.prune_every = options.get('PRUNE_EVERY', 1000)
+        with _stores_lock:
+            self._l1 = _stores.setdefault(
+                options.get('L1_NAME', location), _L1(options.get('L1_MAX_ENTRIES', 1000))
+            )
+
+    @property
+    def l2(self):
+        return caches[self._l2_alias]
+
+    def _sync(self):
+        """Evict the keys other processes have written since the last poll."""
+        from .models import CacheInvalidation
+
+        store = self._l1
+        now = time.monotonic()
+        if now < store.next_poll:
+            return
+        store.next_poll = now + self.poll_interval
+        if store.seen is None:
+            # Entries written before the first poll may already be stale
+            store.clear()
+            store.seen = CacheInvalidation.objects.order_by('-id').values_list('id', flat=True).first() or 0
+            return
+        rows = list(
+            CacheInvalidation.objects.filter(id__gt=store.seen).order_by('id')
+            .values_list('id', 'key')[:store.max_entries + 1]
+        )
+        if not rows:
+            return
+        keys = [key for _, key in rows]
+        if len(rows) > store.max_entries or _CLEAR_ALL in keys:
+            store.clear()
+            store.seen = CacheInvalidation.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        else:
+            with store.lock:
+                # This process's own writes already updated its L1
+                others = [key for id_, key in rows if id_ not in store.own]
+                # Ids up to the last row are settled, including any pruned before this poll
+                store.own = {id_ for id_ in store.own if id_ > rows[-1][0]}
+            store.evict(others)
+            store.seen = rows[-1][0]
+
+    def _publish(self, keys):
+        """Record written keys so every other process evicts its L1 copy."""
+        from .models import CacheInvalidation
+
+        rows = CacheInvalidation.objects.bulk_create([CacheInvalidation(key=key) for key in keys])
+        store = self._l1
+        with store.lock:
+            # pks are only set where the database returns them; other rows evict as usual
+            store.own.update(row.pk for row in rows if row.pk is not None)
+        store.writes += len(keys)
+        if store.writes >= self.prune_every:
+            store.writes = 0
+            CacheInvalidation.objects.filter(
+                created_at__lt=timezone.now() - timedelta(seconds=self.retention)
+            ).delete()
+
+    def _l1_expiry(self, timeout):
+        expires = time.monotonic() + self.l1_timeout
+        if timeout is not DEFAULT_TIMEOUT and timeout is not None:
+            expires = min(expires, time.monotonic() + timeout)
+        return expires
+
+    def _fill(self, key, value, seen):
+        # A poll since the L2 read may have evicted this key; the value read may be stale
+        if self._l1.seen == seen:
+            self._l1.set(key, value, self._l1_expiry(None))
+
+    def get(self, key, default=None, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        self._sync()
+        value = self._l1.get(full_key)
+        if value is not _MISSING:
+            return value
+        seen = self._l1.seen
+        value = self.l2.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            return default
+        self._fill(full_key, value, seen)
+        return value
+
+    def get_many(self, keys, version=None):
+        self._sync()
+        found = {}
+        missing = {}
+        for key in keys:
+            full_key = self.make_and_validate_key(key, version=version)
+            value = self._l1.get(full_key)
+            if value is _MISSING:
+                missing[key] = full_key
+            else:
+                found[key] = value
+        if missing:
+            seen = self._l1.seen
+            for key, value in self.l2.get_many(list(missing), version=version).items():
+                self._fill(missing[key], value, seen)
+                found[key] = value
+        return found
+
+    def has_key(self, key, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        self._sync()
+        return self._l1.get(full_key) is not _MISSING or self.l2.has_key(key, version=version)
+
+    def _fills(self, key, value, timeout, version):
+        """Store `key` in L2 if it is missing there; True if it was, so nobody needs telling."""
+        return timeout != 0 and self.l2.add(key, value, timeout, version=version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        if not self._fills(key, value, timeout, version):
+            self.l2.set(key, value, timeout, version=version)
+            self._publish([full_key])
+        if timeout == 0:
+            self._l1.evict([full_key])
+        else:
+            self._l1.set(full_key, value, self._l1_expiry(timeout))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        if not self.l2.add(key, value, timeout, version=version):
+            return False
+        if timeout != 0:
+            self._l1.set(full_key, value, self._l1_expiry(timeout))
+        return True
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        full_keys = {key: self.make_and_validate_key(key, version=version) for key in data}
+        replaced = {key: value for key, value in data.items() if not self._fills(key, value, timeout, version)}
+        failed = self.l2.set_many(replaced, timeout, version=version) if replaced else []
+        if replaced:
+            self._publish([full_keys[key] for key in replaced])
+        for key, value in data.items():
+            if timeout == 0 or key in failed:
+                self._l1.evict([full_keys[key]])
+            else:
+                self._l1.set(full_keys[key], value, self._l1_expiry(timeout))
+        return failed
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self.make_and_validate_key(key, version=version)
+        return self.l2.touch(key, timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        value = self.l2.incr(key, delta, version=version)
+        self._publish([full_key])
+        self._l1.evict([full_key])
+        return value
+
+    def delete(self, key, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        deleted = self.l2.delete(key, version=version)
+        self._publish([full_key])
+        self._l1.evict([full_key])
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        full_keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        if not full_keys:
+            return
+        self.l2.delete_many(keys, version=version)
+        self._publish(full_keys)
+        self._l1.evict(full_keys)
+
+    def clear(self):
+        self.l2.clear()
+        self._publish([_CLEAR_ALL])
+        self._l1.clear()
@@ -18,7 +18,10 @@ urlpatterns = [
     path('scenarios/<int:pk>/', views.scenario_detail, name='scenario_detail'),
     
     # Requirements
+    path('scenarios/<int:pk>/add-requirement/', views.add_scenario_requirement, name='add_scenario_requirement'),
     path('submissions/<int:submission_id>/add-requirement/', views.add_requirement, name='add_requirement'),
+    path('scenarios/<int:pk>/requirements/import/', views.import_scenario_requirements, name='import_scenario_requirements'),
+    path('submissions/<int:pk>/requirements/export/', views.export_submission_requirements, name='export_submission_requirements'),
     path('requirements/<int:pk>/edit/', views.edit_requirement, name='edit_requirement'),
     path('requirements/<int:pk>/delete/', views.delete_requirement, name='delete_requirement'),
     
@@ -27,7 +30,8 @@ urlpatterns = [
     path('submissions/<int:pk>/', views.submission_detail, name='submission_detail'),
     
     # SRS Documents
-    # path('submissions/<int:submission_id>/srs/', views.srs_document, name='srs_document'),
+    path('submissions/<int:submission_id>/srs/', views.srs_editor, name='srs_editor'),
+    path('submissions/<int:submission_id>/srs/document/', views.srs_render, name='srs_render'),
     path('srs_document/', views.srs_document, name='srs_document'),
     
     # Notifications
@@ -41,9 +45,14 @@ urlpatterns = [
     path('admin-panel/scenarios/<int:pk>/delete/', views.delete_scenario, name='delete_scenario'),
     path('admin-panel/submissions/', views.admin_submissions, name='admin_submissions'),
     path('admin-panel/submissions/<int:submission_id>/feedback/', views.add_feedback, name='add_feedback'),
+    path('admin-panel/stats/refresh/', views.refresh_lab_stats, name='refresh_lab_stats'),
     
     # API endpoints for AJAX
     path('api/toggle-theme/', views.toggle_theme, name='toggle_theme'),
+    path('api/submissions/<int:submission_id>/requirements/', views.requirements_api, name='requirements_api'),
+    path('api/submissions/<int:submission_id>/requirements/batch/', views.requirements_batch_api, name='requirements_batch_api'),
+    path('api/submissions/<int:submission_id>/requirements/<int:pk>/', views.requirement_api, name='requirement_api'),
+    path('api/submissions/<int:submission_id>/srs/', views.srs_autosave, name='srs_autosave'),
 
     path('student/dashboard/', views.student_dashboard, name='student_dashboard')
 ]
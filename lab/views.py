@@ -3,54 +3,53 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, logout
 from django.contrib.auth.views import LoginView
 from django.contrib import messages
-from django.http import JsonResponse
-from django.db.models import Count, Q
+from django.http import JsonResponse, StreamingHttpResponse
 from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.core.exceptions import ValidationError
 from django.core.paginator import Paginator
+from django.db import transaction
 from django.contrib.auth.models import User
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_POST, require_http_methods, condition
+from django.views.decorators.cache import cache_control
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
 from datetime import date
+import csv
+import io
 import os
 # from django.views.decorators.cache import cache_page
 
 import json
 from .models import (
-    UserProfile, Scenario, ScenarioSubmission, Requirement, 
-    Feedback, SRSDocument, Notification
+    Scenario, ScenarioSubmission, Requirement, 
+    SRSDocument, Notification
 )
 from .forms import (
     StudentRegistrationForm, ScenarioForm, RequirementForm, 
     FeedbackForm, SRSDocumentForm
 )
+from .jobs import enqueue
+from .counters import mark_notifications_read, get_submission_counts
+from .progress import get_student_progress, refresh_total_active_scenarios
+from .stats import get_lab_stats, get_scenario_stats, recompute_lab_stats
+from .search import search_submissions
+from .roles import get_role, is_lab_admin
+from .conditional import student_work_etag, submission_etag, notifications_etag
+from .requirement_batch import (
+    serialize_requirement, prepare_requirement_batch, apply_requirement_batch,
+    read_requirement_rows, import_requirements, export_requirements,
+)
+from .srs import SRSConflict, clean_srs_sections, save_srs_sections
+from .srs_render import FORMATS as SRS_FORMATS, srs_cache_key, render_srs
+from .fragments import CATALOG_KEY, submissions_key, get_versions, bump_catalog_version, fragment_timeout
+from .queries import (
+    active_scenarios, student_submissions, recently_submitted, submission_requirements, requirements_by_type,
+    user_notifications, recent_scenarios_by, recent_feedback_by, newest_students, admin_submission_list,
+)
 
 
-def check_admin_permission(request):
-    """
-    Helper function to check if user has admin permissions.
-    Returns (is_admin, user_profile) tuple.
-    Handles superusers properly by creating/updating their profiles.
-    """
-    if request.user.is_superuser:
-        # Ensure superuser has admin profile
-        user_profile, created = UserProfile.objects.get_or_create(
-            user=request.user,
-            defaults={'role': 'admin'}
-        )
-        if user_profile.role != 'admin':
-            user_profile.role = 'admin'
-            user_profile.save()
-        return True, user_profile
-    
-    try:
-        user_profile = UserProfile.objects.get(user=request.user)
-        return user_profile.role == 'admin', user_profile
-    except UserProfile.DoesNotExist:
-        # Create student profile for non-superusers
-        user_profile = UserProfile.objects.create(user=request.user, role='student')
-        return False, user_profile
-
 def home(request):
     # Redirect authenticated users to dashboard
     if request.user.is_authenticated:
@@ -69,7 +68,7 @@ def register(request):
         if form.is_valid():
             try:
                 user = form.save()
-                login(request, user)
+                login(request, user, backend='lab.backends.ProfileModelBackend')
                 messages.success(request, 'Registration successful! Welcome to the Requirements Lab.')
                 return redirect('dashboard')
             except Exception as e:
@@ -110,18 +109,8 @@ def custom_logout(request):
 
 @login_required
 def dashboard(request):
-    # Get or create user profile
-    user_profile, created = UserProfile.objects.get_or_create(
-        user=request.user,
-        defaults={'role': 'admin' if request.user.is_superuser else 'student'}
-    )
-    
-    # If this is a superuser but profile says student, update to admin
-    if request.user.is_superuser and user_profile.role != 'admin':
-        user_profile.role = 'admin'
-        user_profile.save()
-    
-    if user_profile.role == 'admin' or request.user.is_superuser:
+    # The role is resolved once and reused by admin_dashboard (see lab/roles.py)
+    if is_lab_admin(request):
         return admin_dashboard(request)
     else:
         return student_dashboard(request)
@@ -129,47 +118,29 @@ def dashboard(request):
 # @cache_page(60 * 20)
 def student_dashboard(request):
     # Get active scenarios (scenarios the student has started but not completed)
-    active_submissions = ScenarioSubmission.objects.filter(
-        student=request.user,
-        status='draft'
-    ).select_related('scenario')[:5]
-    
-    # Get user's submissions for progress tracking
-    submissions = ScenarioSubmission.objects.filter(student=request.user)
+    active_submissions = student_submissions(request.user, 'draft').select_related('scenario')[:5]
     
-    # Calculate progress including partial progress for active submissions
-    total_scenarios = Scenario.objects.filter(is_active=True).count()
-    completed_scenarios = submissions.filter(status__in=['submitted', 'feedback_received']).values_list('scenario_id', flat=True).distinct()
-    completed_count = len(completed_scenarios)
+    # Submission counts by status (shared with the sidebar context processor)
+    counts = get_submission_counts(request.user)
     
-    # Calculate partial progress for active (draft) submissions
-    active_submissions_data = submissions.filter(status='draft').select_related('scenario')
-    active_progress = 0
-    
-    for active_sub in active_submissions_data:
-        # Count total requirements for the scenario and user's progress
-        total_reqs = Requirement.objects.filter(submission=active_sub).count()
-        if total_reqs > 0:
-            # Add partial progress (0.5 for scenarios with active work)
-            active_progress += 0.5
-    
-    # Calculate total progress: completed scenarios + partial progress from active work
-    total_progress = completed_count + active_progress
-    progress_percentage = round((total_progress / total_scenarios * 100)) if total_scenarios > 0 else 0
+    # Progress is maintained incrementally in StudentProgress (see lab/progress.py)
+    progress = get_student_progress(request.user)
+    total_scenarios = progress.total_active_scenarios
+    completed_count = progress.completed_count
+    progress_percentage = progress.progress_percentage
     
     # Get recent activities (completed submissions)
-    recent_activities = submissions.filter(status='submitted').order_by('-submitted_at')[:5]
+    recent_activities = recently_submitted(request.user)[:5]
     
     # Get feedback count
-    feedback_count = submissions.filter(status='feedback_received').count()
+    feedback_count = counts['feedback_received']
     
     # Get draft submissions count for sidebar
-    draft_submissions = submissions.filter(status='draft').count()
-    completed_submissions = submissions.filter(status__in=['submitted', 'feedback_received']).count()
+    draft_submissions = counts['draft']
+    completed_submissions = completed_count
     
     context = {
         'active_submissions': active_submissions,
-        'completed_scenarios': completed_scenarios,
         'progress_percentage': progress_percentage,
         'recent_activities': recent_activities,
         'feedback_count': feedback_count,
@@ -185,27 +156,25 @@ def student_dashboard(request):
 @login_required
 def admin_dashboard(request):
     # Check admin permissions using helper function
-    is_admin, user_profile = check_admin_permission(request)
-    if not is_admin:
+    if not is_lab_admin(request):
         messages.error(request, 'Access denied.')
         return redirect('dashboard')
     
-    # Get admin statistics
-    total_scenarios = Scenario.objects.count()
-    total_students = UserProfile.objects.filter(role='student').count()
-    total_submissions = ScenarioSubmission.objects.count()
-    pending_reviews = ScenarioSubmission.objects.filter(status='submitted').count()
+    # Get admin statistics from the snapshot (see lab/stats.py)
+    stats = get_lab_stats()
+    total_scenarios = stats.total_scenarios
+    total_students = stats.total_students
+    total_submissions = stats.total_submissions
+    pending_reviews = stats.submitted_submissions
     
     # Get recent submissions for review
-    recent_submissions = ScenarioSubmission.objects.filter(
-        status='submitted'
-    ).order_by('-submitted_at')[:5]
+    recent_submissions = recently_submitted()[:5]
     
     # Get recent activity (scenarios created, submissions reviewed, new students)
     recent_activities = []
     
     # Recent scenarios created
-    recent_scenarios = Scenario.objects.filter(created_by=request.user).order_by('-created_at')[:3]
+    recent_scenarios = recent_scenarios_by(request.user)[:3]
     for scenario in recent_scenarios:
         recent_activities.append({
             'type': 'scenario_created',
@@ -217,7 +186,7 @@ def admin_dashboard(request):
         })
     
     # Recent feedback given
-    recent_feedback = Feedback.objects.filter(admin=request.user).order_by('-created_at')[:3]
+    recent_feedback = recent_feedback_by(request.user)[:3]
     for feedback in recent_feedback:
         recent_activities.append({
             'type': 'feedback_given',
@@ -229,7 +198,7 @@ def admin_dashboard(request):
         })
     
     # Recent student registrations
-    recent_students = UserProfile.objects.filter(role='student').order_by('-created_at')[:3]
+    recent_students = newest_students()[:3]
     for student_profile in recent_students:
         recent_activities.append({
             'type': 'student_registered',
@@ -245,6 +214,7 @@ def admin_dashboard(request):
     recent_activities = recent_activities[:5]
     
     context = {
+        'stats': stats,
         'total_scenarios': total_scenarios,
         'total_students': total_students,
         'total_submissions': total_submissions,
@@ -276,41 +246,49 @@ def admin_dashboard(request):
 #     return render(request, 'lab/scenario_list.html', context)
 
 @login_required
+# Browsers revalidate on every visit and get 304 while the page is unchanged (see lab/conditional.py)
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=student_work_etag)
 def scenario_list(request):
-    user_profile = get_object_or_404(UserProfile, user=request.user)
-    if user_profile.role != 'student':
+    if get_role(request) != 'student':
         return redirect('admin_scenarios')
 
-    scenarios = Scenario.objects.filter(is_active=True)
-    submissions = ScenarioSubmission.objects.filter(student=request.user)
-    submissions_by_scenario = {sub.scenario_id: sub for sub in submissions}
-
-    # Attach submission to each scenario (or None)
-    for scenario in scenarios:
-        scenario.user_submission = submissions_by_scenario.get(scenario.id)
-        # Add status for template logic
-        if scenario.user_submission:
-            scenario.submission_status = scenario.user_submission.status
-        else:
-            scenario.submission_status = 'not_started'
-
+    def scenarios_with_status():
+        # Only runs when the cached fragment is missing
+        scenarios = list(active_scenarios().only('id', 'title', 'difficulty', 'description'))
+        submissions = student_submissions(request.user).only('id', 'scenario_id', 'status')
+        submissions_by_scenario = {sub.scenario_id: sub for sub in submissions}
+
+        # Attach submission to each scenario (or None)
+        for scenario in scenarios:
+            scenario.user_submission = submissions_by_scenario.get(scenario.id)
+            # Add status for template logic
+            if scenario.user_submission:
+                scenario.submission_status = scenario.user_submission.status
+            else:
+                scenario.submission_status = 'not_started'
+        return scenarios
+
+    # The grid is cached under these versions (see lab/fragments.py)
+    catalog_version, submissions_version = get_versions(CATALOG_KEY, submissions_key(request.user.pk))
     context = {
-        'scenarios': scenarios,
+        'scenarios': SimpleLazyObject(scenarios_with_status),
+        'catalog_version': catalog_version,
+        'submissions_version': submissions_version,
+        'fragment_timeout': fragment_timeout(),
     }
     return render(request, 'lab/scenario_list.html', context)
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=student_work_etag)
 def scenario_detail(request, pk):
     scenario = get_object_or_404(Scenario, pk=pk, is_active=True)
     
-    # Get or create user profile
-    user_profile, created = UserProfile.objects.get_or_create(
-        user=request.user,
-        defaults={'role': 'student'}
-    )
+    role = get_role(request)
     
     # Check if user is admin
-    if user_profile.role == 'admin':
+    if role == 'admin':
         # Admin can view scenario details but not work on them
         context = {
             'scenario': scenario,
@@ -325,29 +303,28 @@ def scenario_detail(request, pk):
         return render(request, 'lab/scenario_detail.html', context)
     
     # Only students can work on scenarios
-    if user_profile.role != 'student':
+    if role != 'student':
         messages.error(request, 'Access denied. Only students can work on scenarios.')
         return redirect('admin_scenarios')
     
-    # Get or create submission for student
-    submission, created = ScenarioSubmission.objects.get_or_create(
-        scenario=scenario,
-        student=request.user,
-        defaults={'status': 'draft'}
-    )
+    # Viewing never writes: the draft is created by the first requirement added
+    # (add_scenario_requirement), until then an unsaved one stands in
+    submission = student_submissions(request.user).filter(scenario=scenario).first()
+    if submission is None:
+        submission = ScenarioSubmission(scenario=scenario, student=request.user, status='draft')
+    else:
+        submission.scenario = scenario
     
-    # Get requirements grouped by type
-    functional_reqs = submission.requirements.filter(requirement_type='functional')
-    non_functional_reqs = submission.requirements.filter(requirement_type='non_functional')
-    business_reqs = submission.requirements.filter(requirement_type='business')
+    # Get requirements grouped by type (one query for all types)
+    requirements = requirements_by_type(submission_requirements(submission) if submission.pk else [])
     
     context = {
         'scenario': scenario,
         'submission': submission,
         'user_submission': submission,  # Add this for template compatibility
-        'functional_reqs': functional_reqs,
-        'non_functional_reqs': non_functional_reqs,
-        'business_reqs': business_reqs,
+        'functional_reqs': requirements['functional'],
+        'non_functional_reqs': requirements['non_functional'],
+        'business_reqs': requirements['business'],
         'requirement_form': RequirementForm(),
         'is_admin_view': False,
     }
@@ -369,19 +346,110 @@ def add_requirement(request, submission_id):
     if request.method == 'POST':
         form = RequirementForm(request.POST)
         if form.is_valid():
-            requirement = form.save(commit=False)
-            requirement.submission = submission
-            requirement.save()
-            messages.success(request, f'Requirement "{requirement.title}" added successfully!')
-            return redirect('scenario_detail', pk=submission.scenario.pk)
+            _save_requirement(request, submission, form)
         else:
-            messages.error(request, 'Please correct the errors below.')
-            for field, errors in form.errors.items():
-                for error in errors:
-                    messages.error(request, f'{field}: {error}')
+            _report_requirement_errors(request, form)
     
     return redirect('scenario_detail', pk=submission.scenario.pk)
 
+@login_required
+@require_POST
+def add_scenario_requirement(request, pk):
+    """Add a requirement to the student's draft for a scenario, creating the draft on first use."""
+    scenario = get_object_or_404(Scenario, pk=pk, is_active=True)
+    if get_role(request) != 'student':
+        messages.error(request, 'Access denied. Only students can work on scenarios.')
+        return redirect('admin_scenarios')
+    
+    form = RequirementForm(request.POST)
+    if not form.is_valid():
+        _report_requirement_errors(request, form)
+        return redirect('scenario_detail', pk=scenario.pk)
+    
+    submission, created = ScenarioSubmission.objects.get_or_create(
+        scenario=scenario,
+        student=request.user,
+        defaults={'status': 'draft'}
+    )
+    if submission.status != 'draft':
+        messages.error(request, 'Cannot modify submitted requirements.')
+    else:
+        _save_requirement(request, submission, form)
+    return redirect('scenario_detail', pk=scenario.pk)
+
+REQUIREMENT_FILE_FORMATS = {'.csv': 'csv', '.json': 'json', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}
+
+@login_required
+@require_POST
+def import_scenario_requirements(request, pk):
+    """Import a CSV, JSON or NDJSON file of requirements into the student's draft, all or nothing."""
+    scenario = get_object_or_404(Scenario, pk=pk, is_active=True)
+    if get_role(request) != 'student':
+        messages.error(request, 'Access denied. Only students can work on scenarios.')
+        return redirect('admin_scenarios')
+    
+    upload = request.FILES.get('file')
+    file_format = upload and REQUIREMENT_FILE_FORMATS.get(os.path.splitext(upload.name)[1].lower())
+    if not file_format:
+        messages.error(request, 'Choose a .csv, .json or .ndjson file to import.')
+        return redirect('scenario_detail', pk=scenario.pk)
+    
+    # Read as a stream: the upload is never decoded into memory as a whole
+    stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+    try:
+        with transaction.atomic():
+            submission, created = ScenarioSubmission.objects.get_or_create(
+                scenario=scenario,
+                student=request.user,
+                defaults={'status': 'draft'}
+            )
+            if submission.status != 'draft':
+                messages.error(request, 'Cannot modify submitted requirements.')
+                return redirect('scenario_detail', pk=scenario.pk)
+            imported = import_requirements(submission, read_requirement_rows(stream, file_format))
+    except ValidationError as e:
+        messages.error(request, 'Nothing was imported. Please fix these lines and try again.')
+        for message in e.messages:
+            messages.error(request, message)
+    except (UnicodeDecodeError, csv.Error) as e:
+        messages.error(request, f'Nothing was imported, the file could not be read: {e}')
+    else:
+        if imported:
+            messages.success(request, f'Imported {imported} requirements.')
+        else:
+            messages.info(request, 'The file contained no requirements.')
+    finally:
+        stream.detach()
+    return redirect('scenario_detail', pk=scenario.pk)
+
+@login_required
+def export_submission_requirements(request, pk):
+    """Stream a submission's requirements as CSV or NDJSON to its student or an admin."""
+    submission = get_object_or_404(ScenarioSubmission, pk=pk)
+    if submission.student_id != request.user.pk and not is_lab_admin(request):
+        messages.error(request, 'Access denied.')
+        return redirect('dashboard')
+    
+    file_format = request.GET.get('format', 'csv')
+    if file_format not in ('csv', 'ndjson'):
+        file_format = 'csv'
+    content_type = 'text/csv' if file_format == 'csv' else 'application/x-ndjson'
+    response = StreamingHttpResponse(export_requirements(submission, file_format), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="requirements-{submission.pk}.{file_format}"'
+    return response
+
+def _save_requirement(request, submission, form):
+    requirement = form.save(commit=False)
+    requirement.submission = submission
+    requirement.save()
+    messages.success(request, f'Requirement "{requirement.title}" added successfully!')
+
+def _report_requirement_errors(request, form):
+    messages.error(request, 'Please correct the errors below.')
+    for field, errors in form.errors.items():
+        for error in errors:
+            messages.error(request, f'{field}: {error}')
+
 @login_required
 def edit_requirement(request, pk):
     requirement = get_object_or_404(Requirement, pk=pk, submission__student=request.user)
@@ -439,48 +507,43 @@ def submit_scenario(request, submission_id):
         submission.submit()
         messages.success(request, 'Scenario submitted successfully! You will receive feedback soon.')
         
-        # Create notification for admins
-        admin_users = UserProfile.objects.filter(role='admin').values_list('user', flat=True)
-        for admin_user_id in admin_users:
-            Notification.objects.create(
-                user_id=admin_user_id,
-                title='New Submission for Review',
-                message=f'{request.user.get_full_name() or request.user.username} submitted requirements for {submission.scenario.title}',
-                link=f'/submissions/{submission.pk}/'
-            )
+        # Notify admins in the background
+        enqueue('notify_admins_of_submission', submission_id=submission.pk)
         
         return redirect('dashboard')
     
     return render(request, 'lab/submit_scenario.html', {'submission': submission})
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=notifications_etag)
 def notifications(request):
-    notifications = Notification.objects.filter(user=request.user).order_by('-created_at')
-    
-    # Mark notifications as read when viewed
-    notifications.filter(is_read=False).update(is_read=True)
+    notifications = user_notifications(request.user)
     
     paginator = Paginator(notifications, 10)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
+    # Mark only the notifications shown on this page as read
+    unread_ids = [notification.pk for notification in page_obj if not notification.is_read]
+    if unread_ids:
+        mark_notifications_read(request.user, Notification.objects.filter(pk__in=unread_ids))
+    
     return render(request, 'lab/notifications.html', {'page_obj': page_obj})
 
 # Admin Views
 @login_required
 def admin_scenarios(request):
-    is_admin, user_profile = check_admin_permission(request)
-    if not is_admin:
+    if not is_lab_admin(request):
         messages.error(request, 'Access denied.')
         return redirect('dashboard')
     
-    scenarios = Scenario.objects.all().order_by('-created_at')
+    scenarios = Scenario.objects.filter(deleted_at__isnull=True).order_by('-created_at')
     return render(request, 'lab/admin_scenarios.html', {'scenarios': scenarios})
 
 @login_required
 def create_scenario(request):
-    is_admin, user_profile = check_admin_permission(request)
-    if not is_admin:
+    if not is_lab_admin(request):
         messages.error(request, 'Access denied.')
         return redirect('dashboard')
     
@@ -499,12 +562,11 @@ def create_scenario(request):
 
 @login_required
 def edit_scenario(request, pk):
-    is_admin, user_profile = check_admin_permission(request)
-    if not is_admin:
+    if not is_lab_admin(request):
         messages.error(request, 'Access denied.')
         return redirect('dashboard')
     
-    scenario = get_object_or_404(Scenario, pk=pk)
+    scenario = get_object_or_404(Scenario, pk=pk, deleted_at__isnull=True)
     
     if request.method == 'POST':
         form = ScenarioForm(request.POST, instance=scenario)
@@ -519,16 +581,19 @@ def edit_scenario(request, pk):
 
 @login_required
 def delete_scenario(request, pk):
-    is_admin, user_profile = check_admin_permission(request)
-    if not is_admin:
+    if not is_lab_admin(request):
         messages.error(request, 'Access denied.')
         return redirect('admin_dashboard')
     
-    scenario = get_object_or_404(Scenario, pk=pk)
+    scenario = get_object_or_404(Scenario, pk=pk, deleted_at__isnull=True)
     
     if request.method == 'POST':
         scenario_title = scenario.title
-        scenario.delete()
+        # Hide and tombstone the scenario now; the cascade delete of its submissions runs in the background
+        Scenario.objects.filter(pk=scenario.pk).update(is_active=False, deleted_at=timezone.now())
+        bump_catalog_version()
+        refresh_total_active_scenarios()
+        enqueue('delete_scenario', scenario_id=scenario.pk)
         messages.success(request, f'Scenario "{scenario_title}" has been deleted successfully.')
         return redirect('admin_scenarios')
     
@@ -536,35 +601,24 @@ def delete_scenario(request, pk):
 
 @login_required
 def admin_submissions(request):
-    user_profile = get_object_or_404(UserProfile, user=request.user)
-    if user_profile.role != 'admin' and not request.user.is_superuser:
+    if not is_lab_admin(request):
         messages.error(request, 'Access denied.')
         return redirect('dashboard')
     
     # Get all submissions
-    submissions = ScenarioSubmission.objects.select_related('scenario', 'student', 'student__userprofile').prefetch_related('requirements').all().order_by('-updated_at')
+    # Load only the columns the cards render, with requirement counts annotated
+    submissions = admin_submission_list()
     
-    # Calculate statistics
-    total_submissions = submissions.count()
-    pending_reviews = submissions.filter(status='submitted').count()
-    completed_reviews = submissions.filter(status='feedback_received').count()
-    draft_submissions = submissions.filter(status='draft').count()
+    # Statistics come from the snapshot (see lab/stats.py)
+    stats = get_lab_stats()
+    total_submissions = stats.total_submissions
+    pending_reviews = stats.submitted_submissions
+    completed_reviews = stats.feedback_received_submissions
+    draft_submissions = stats.draft_submissions
     
     # Get scenario statistics
-    scenario_stats = {}
-    scenarios = Scenario.objects.filter(is_active=True).annotate(
-        submission_count=Count('scenariosubmission'),
-        submitted_count=Count('scenariosubmission', filter=Q(scenariosubmission__status='submitted')),
-        draft_count=Count('scenariosubmission', filter=Q(scenariosubmission__status='draft'))
-    ).order_by('title')
-    
-    for scenario in scenarios:
-        scenario_stats[scenario.id] = {
-            'title': scenario.title,
-            'total': scenario.submission_count,
-            'submitted': scenario.submitted_count,
-            'draft': scenario.draft_count,
-        }
+    scenario_stats = get_scenario_stats()
+    scenarios = Scenario.objects.filter(is_active=True).only('id', 'title').order_by('title')
     
     # Filter by status if provided
     status_filter = request.GET.get('status')
@@ -579,12 +633,7 @@ def admin_submissions(request):
     # Search functionality
     search_query = request.GET.get('search')
     if search_query:
-        submissions = submissions.filter(
-            Q(student__username__icontains=search_query) |
-            Q(student__first_name__icontains=search_query) |
-            Q(student__last_name__icontains=search_query) |
-            Q(scenario__title__icontains=search_query)
-        )
+        submissions = search_submissions(submissions, search_query)
     
     # Get recent activity for submissions
     recent_submissions = submissions.filter(status='submitted').order_by('-submitted_at')[:5]
@@ -596,6 +645,7 @@ def admin_submissions(request):
     
     context = {
         'page_obj': page_obj,
+        'stats': stats,
         'scenarios': scenarios,
         'scenario_stats': scenario_stats,
         'total_submissions': total_submissions,
@@ -611,44 +661,58 @@ def admin_submissions(request):
     return render(request, 'lab/admin_submissions.html', context)
 
 @login_required
+@require_POST
+def refresh_lab_stats(request):
+    if not is_lab_admin(request):
+        messages.error(request, 'Access denied.')
+        return redirect('dashboard')
+    
+    recompute_lab_stats()
+    messages.success(request, 'Statistics recalculated.')
+    
+    next_url = request.POST.get('next')
+    if next_url and url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        return redirect(next_url)
+    return redirect('admin_dashboard')
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=submission_etag)
 def submission_detail(request, pk):
     submission = get_object_or_404(ScenarioSubmission, pk=pk)
     
     # Check permissions
-    user_profile = get_object_or_404(UserProfile, user=request.user)
-    if user_profile.role == 'admin':
+    is_admin = is_lab_admin(request)
+    if is_admin:
         # Admin can view any submission
         pass
-    elif submission.student == request.user:
+    elif submission.student_id == request.user.pk:
         # Student can view their own submission
         pass
     else:
         messages.error(request, 'Access denied.')
         return redirect('dashboard')
     
-    # Get requirements grouped by type
-    functional_reqs = submission.requirements.filter(requirement_type='functional')
-    non_functional_reqs = submission.requirements.filter(requirement_type='non_functional')
-    business_reqs = submission.requirements.filter(requirement_type='business')
+    # Get requirements grouped by type (one query for all types)
+    requirements = requirements_by_type(submission_requirements(submission))
     
     # Get feedback
     feedbacks = submission.feedbacks.all().order_by('-created_at')
     
     context = {
         'submission': submission,
-        'functional_reqs': functional_reqs,
-        'non_functional_reqs': non_functional_reqs,
-        'business_reqs': business_reqs,
+        'functional_reqs': requirements['functional'],
+        'non_functional_reqs': requirements['non_functional'],
+        'business_reqs': requirements['business'],
         'feedbacks': feedbacks,
-        'feedback_form': FeedbackForm() if user_profile.role == 'admin' else None,
+        'feedback_form': FeedbackForm() if is_admin else None,
     }
     
     return render(request, 'lab/submission_detail.html', context)
 
 @login_required
 def add_feedback(request, submission_id):
-    is_admin, user_profile = check_admin_permission(request)
-    if not is_admin:
+    if not is_lab_admin(request):
         messages.error(request, 'Access denied.')
         return redirect('dashboard')
     
@@ -666,13 +730,8 @@ def add_feedback(request, submission_id):
             submission.status = 'feedback_received'
             submission.save()
             
-            # Create notification for student
-            Notification.objects.create(
-                user=submission.student,
-                title='New Feedback Received',
-                message=f'You have received feedback for {submission.scenario.title}',
-                link=f'/submissions/{submission.pk}/'
-            )
+            # Notify the student in the background
+            enqueue('notify_student_of_feedback', submission_id=submission.pk)
             
             messages.success(request, 'Feedback added successfully!')
             return redirect('submission_detail', pk=submission.pk)
@@ -680,33 +739,75 @@ def add_feedback(request, submission_id):
     return redirect('submission_detail', pk=submission.pk)
 
 @login_required
-# def srs_document(request, submission_id):
-#     submission = get_object_or_404(ScenarioSubmission, pk=submission_id, student=request.user)
-    
-#     srs_doc, created = SRSDocument.objects.get_or_create(submission=submission)
-    
-#     if request.method == 'POST':
-#         form = SRSDocumentForm(request.POST, instance=srs_doc)
-#         if form.is_valid():
-#             form.save()
-#             messages.success(request, 'SRS Document saved successfully!')
-#             return redirect('srs_document', submission_id=submission.pk)
-#     else:
-#         form = SRSDocumentForm(instance=srs_doc)
-    
-#     context = {
-#         'form': form,
-#         'submission': submission,
-#         'srs_doc': srs_doc,
-#     }
-    
-#     return render(request, 'lab/srs_document.html', context)
-
 def srs_document(request):
     return render(request, 'lab/srs_document.html', {
         'today': date.today().strftime('%Y-%m-%d')
     })
 
+@login_required
+def srs_render(request, submission_id):
+    """Stream the assembled SRS of a submission as HTML or Markdown (?format=md) to its student or an admin."""
+    submission = get_object_or_404(
+        ScenarioSubmission.objects.select_related('scenario', 'student').only(
+            'status', 'submitted_at', 'student_id', 'scenario__title', 'scenario__updated_at',
+            'student__username', 'student__first_name', 'student__last_name',
+        ),
+        pk=submission_id,
+    )
+    if submission.student_id != request.user.pk and not is_lab_admin(request):
+        messages.error(request, 'Access denied.')
+        return redirect('dashboard')
+    
+    file_format = request.GET.get('format', 'html')
+    if file_format not in SRS_FORMATS:
+        file_format = 'html'
+    content_type = 'text/html; charset=utf-8' if file_format == 'html' else 'text/markdown; charset=utf-8'
+    response = StreamingHttpResponse(
+        render_srs(submission, file_format, srs_cache_key(submission, file_format)), content_type=content_type
+    )
+    response['Content-Disposition'] = f'inline; filename="srs-{submission.pk}.{file_format}"'
+    return response
+
+@login_required
+def srs_editor(request, submission_id):
+    """Edit the SRS of one of the student's submissions; the page autosaves through srs_autosave."""
+    submission = get_object_or_404(
+        ScenarioSubmission.objects.select_related('scenario'), pk=submission_id, student=request.user
+    )
+    srs_doc = SRSDocument.objects.filter(submission=submission).first() or SRSDocument(submission=submission)
+    editable = submission.status == 'draft'
+    version = srs_doc.version
+    
+    if request.method == 'POST' and editable:
+        form = SRSDocumentForm(request.POST, instance=srs_doc)
+        if form.is_valid():
+            try:
+                version = int(request.POST.get('version', ''))
+            except ValueError:
+                version = -1
+            # Only the sections that differ from the stored ones are written
+            sections = {field: form.cleaned_data[field] for field in form.changed_data}
+            try:
+                save_srs_sections(submission, version, sections, flush=True)
+            except SRSConflict:
+                messages.error(request, 'The SRS was saved from another window. Copy your changes and reload the page.')
+            else:
+                messages.success(request, 'SRS Document saved successfully!')
+                return redirect('srs_editor', submission_id=submission.pk)
+    else:
+        form = SRSDocumentForm(instance=srs_doc)
+        if not editable:
+            for field in form.fields.values():
+                field.disabled = True
+    
+    return render(request, 'lab/srs_editor.html', {
+        'form': form,
+        'submission': submission,
+        'srs_doc': srs_doc,
+        'version': version,
+        'editable': editable,
+    })
+
 
 # API Views
 @login_required
@@ -723,3 +824,110 @@ def toggle_theme(request):
         return JsonResponse({'success': True, 'theme': theme})
     except:
         return JsonResponse({'success': False})
+
+def _json_body(request):
+    """The request's JSON object, or None when the body isn't one."""
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+def _apply_requirements(submission, operations, status=200):
+    """Validate and apply a requirement batch, responding with only the changed rows."""
+    if submission.status != 'draft':
+        return JsonResponse({'error': 'Cannot modify submitted requirements.'}, status=409)
+    batch, errors = prepare_requirement_batch(submission, **operations)
+    if errors:
+        return JsonResponse({'errors': errors}, status=400)
+    created, updated, deleted = apply_requirement_batch(submission, *batch)
+    return JsonResponse({
+        'created': [serialize_requirement(requirement) for requirement in created],
+        'updated': [serialize_requirement(requirement) for requirement in updated],
+        'deleted': deleted,
+    }, status=status)
+
+@login_required
+@require_http_methods(['GET', 'POST'])
+def requirements_api(request, submission_id):
+    """List a submission's requirements (GET) or add one (POST)."""
+    submission = ScenarioSubmission.objects.filter(pk=submission_id, student=request.user).first()
+    if submission is None:
+        return JsonResponse({'error': 'Submission not found.'}, status=404)
+    
+    if request.method == 'GET':
+        requirements = submission_requirements(submission)
+        return JsonResponse({'requirements': [serialize_requirement(requirement) for requirement in requirements]})
+    
+    data = _json_body(request)
+    if data is None:
+        return JsonResponse({'error': 'Expected a JSON object.'}, status=400)
+    return _apply_requirements(submission, {'create': [data]}, status=201)
+
+@login_required
+@require_http_methods(['PATCH', 'DELETE'])
+def requirement_api(request, submission_id, pk):
+    """Change some fields of one requirement (PATCH) or delete it (DELETE)."""
+    submission = ScenarioSubmission.objects.filter(pk=submission_id, student=request.user).first()
+    if submission is None:
+        return JsonResponse({'error': 'Submission not found.'}, status=404)
+    
+    if request.method == 'DELETE':
+        return _apply_requirements(submission, {'delete': [pk]})
+    
+    data = _json_body(request)
+    if data is None:
+        return JsonResponse({'error': 'Expected a JSON object.'}, status=400)
+    return _apply_requirements(submission, {'update': [{**data, 'id': pk}]})
+
+@login_required
+@require_POST
+def srs_autosave(request, submission_id):
+    """
+    Save some SRS sections: {"version": n, "sections": {...}, "flush": false}.
+    Answers 202 without writing when the save is coalesced with later ones.
+    """
+    submission = ScenarioSubmission.objects.filter(pk=submission_id, student=request.user).first()
+    if submission is None:
+        return JsonResponse({'error': 'Submission not found.'}, status=404)
+    if submission.status != 'draft':
+        return JsonResponse({'error': 'Cannot modify a submitted SRS.'}, status=409)
+    
+    data = _json_body(request)
+    if data is None:
+        return JsonResponse({'error': 'Expected a JSON object.'}, status=400)
+    version = data.get('version')
+    if not isinstance(version, int) or isinstance(version, bool):
+        return JsonResponse({'errors': {'version': ['Expected an integer.']}}, status=400)
+    try:
+        sections = clean_srs_sections(data.get('sections', {}))
+    except ValidationError as e:
+        return JsonResponse({'errors': e.message_dict if hasattr(e, 'error_dict') else {'sections': e.messages}}, status=400)
+    
+    try:
+        result = save_srs_sections(submission, version, sections, flush=bool(data.get('flush')))
+    except SRSConflict as e:
+        return JsonResponse({'error': 'The SRS was saved from another window.', 'version': e.version}, status=409)
+    return JsonResponse(result, status=200 if result['saved'] else 202)
+
+@login_required
+@require_POST
+def requirements_batch_api(request, submission_id):
+    """
+    Apply {"create": [...], "update": [...], "delete": [...]} in one transaction.
+    Nothing is written unless every operation is valid.
+    """
+    submission = ScenarioSubmission.objects.filter(pk=submission_id, student=request.user).first()
+    if submission is None:
+        return JsonResponse({'error': 'Submission not found.'}, status=404)
+    
+    data = _json_body(request)
+    if data is None:
+        return JsonResponse({'error': 'Expected a JSON object.'}, status=400)
+    operations = {key: data.get(key, []) for key in ('create', 'update', 'delete')}
+    if set(data) - set(operations) or not all(isinstance(ops, list) for ops in operations.values()):
+        return JsonResponse({'error': 'Expected "create", "update" and "delete" lists.'}, status=400)
+    limit = getattr(settings, 'LAB_REQUIREMENT_BATCH_LIMIT', 500)
+    if sum(len(ops) for ops in operations.values()) > limit:
+        return JsonResponse({'error': f'At most {limit} operations per batch.'}, status=400)
+    return _apply_requirements(submission, operations)
@@ -85,6 +85,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Only active with LAB_PERF_ENABLED
+    'lab.perf.PerfMiddleware',
 ]
 
 # Add WhiteNoise only for non-Vercel deployments
@@ -95,7 +97,8 @@ ROOT_URLCONF = 'requirements_lab.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that reports render time to lab.perf.PerfMiddleware
+        'BACKEND': 'lab.perf.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -167,12 +170,39 @@ else:
             }
         }
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
+# LAB_CACHE=tiered puts a per-process LRU in front of a cache shared by every
+# worker (the lab_cache table, or a directory with LAB_CACHE_DIR), so counters
+# and fragments stay consistent across processes (see lab/tiered_cache.py).
+# The lab_cache table is created by `manage.py createcachetable`; every deploy
+# start command (Procfile, render.yaml, railway.json, start.sh) turns this on.
+if os.environ.get('LAB_CACHE', 'locmem') == 'tiered':
+    _cache_dir = os.environ.get('LAB_CACHE_DIR')
+    CACHES = {
+        'default': {
+            'BACKEND': 'lab.tiered_cache.TieredCache',
+            'LOCATION': 'shared',
+            'OPTIONS': {
+                'L1_MAX_ENTRIES': int(os.environ.get('LAB_CACHE_L1_MAX_ENTRIES', '1000')),
+                'L1_TIMEOUT': int(os.environ.get('LAB_CACHE_L1_TIMEOUT', '60')),
+                'POLL_INTERVAL': float(os.environ.get('LAB_CACHE_POLL_INTERVAL', '1')),
+            },
+        },
+        'shared': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache' if _cache_dir
+            else 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': _cache_dir or 'lab_cache',
+            'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('LAB_CACHE_MAX_ENTRIES', '100000'))},
+        },
+    }
+else:
+    # Each process has its own cache, so entries are kept short (see lab/local_cache.py)
+    CACHES = {
+        'default': {
+            'BACKEND': 'lab.local_cache.BoundedLocMemCache',
+            'LOCATION': 'unique-snowflake',
+            'OPTIONS': {'MAX_TIMEOUT': int(os.environ.get('LAB_LOCAL_CACHE_MAX_TIMEOUT', '60'))},
+        }
     }
-}
 
 # CSRF trusted origins (for Render / Vercel frontends) - supply comma-separated list in env
 _raw_csrf = os.environ.get('CSRF_TRUSTED_ORIGINS', '')
@@ -211,6 +241,13 @@ elif os.environ.get('VERCEL_URL'):
     SESSION_COOKIE_SECURE = False
     CSRF_COOKIE_SECURE = False
 
+# The first backend loads the profile with the session user (see lab/roles.py);
+# ModelBackend keeps sessions created before it was added valid
+AUTHENTICATION_BACKENDS = [
+    'lab.backends.ProfileModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -285,3 +322,43 @@ CRISPY_TEMPLATE_PACK = "tailwind"
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/dashboard/'
 LOGOUT_REDIRECT_URL = '/login/'
+
+# Requirements Lab tuning
+# Number of notifications inserted per bulk INSERT when a scenario is published
+LAB_NOTIFICATION_BATCH_SIZE = int(os.environ.get('LAB_NOTIFICATION_BATCH_SIZE', '1000'))
+# Read notifications older than this are removed by `manage.py prune_notifications`
+LAB_NOTIFICATION_RETENTION_DAYS = int(os.environ.get('LAB_NOTIFICATION_RETENTION_DAYS', '90'))
+
+# Background jobs (see lab/jobs.py and `manage.py run_lab_worker`)
+# Run jobs inline at enqueue time instead of through the worker
+if os.environ.get('VERCEL_URL'):
+    # Vercel runs no worker process, so nothing would ever claim a queued job
+    LAB_JOBS_EAGER = os.environ.get('LAB_JOBS_EAGER', 'True') == 'True'
+else:
+    LAB_JOBS_EAGER = os.environ.get('LAB_JOBS_EAGER', 'False') == 'True'
+# Seconds a claimed job stays locked before another worker may retry it
+LAB_JOB_VISIBILITY_TIMEOUT = int(os.environ.get('LAB_JOB_VISIBILITY_TIMEOUT', '300'))
+LAB_JOB_MAX_ATTEMPTS = int(os.environ.get('LAB_JOB_MAX_ATTEMPTS', '5'))
+
+# Student IDs are handed out from per-process blocks (see lab/student_ids.py)
+LAB_STUDENT_ID_BLOCK_SIZE = int(os.environ.get('LAB_STUDENT_ID_BLOCK_SIZE', '100'))
+LAB_STUDENT_ID_SHUFFLE = os.environ.get('LAB_STUDENT_ID_SHUFFLE', 'False') == 'True'
+
+# Per-request query/timing sampling (see lab/perf.py and `manage.py lab_perf_report`)
+LAB_PERF_ENABLED = os.environ.get('LAB_PERF_ENABLED', 'False') == 'True'
+# Samples kept in memory per process between flushes to the RequestTiming table
+LAB_PERF_BUFFER_SIZE = int(os.environ.get('LAB_PERF_BUFFER_SIZE', '1000'))
+LAB_PERF_FLUSH_INTERVAL = int(os.environ.get('LAB_PERF_FLUSH_INTERVAL', '60'))
+
+# Cached template fragments are keyed by version tokens (see lab/fragments.py),
+# so this only bounds how long superseded entries linger
+LAB_FRAGMENT_CACHE_TIMEOUT = int(os.environ.get('LAB_FRAGMENT_CACHE_TIMEOUT', str(60 * 60 * 24)))
+
+# Part of every page ETag (see lab/conditional.py), so a deploy that changes
+# templates doesn't leave browsers on 304s for the old markup
+LAB_RELEASE = os.environ.get('LAB_RELEASE') or os.environ.get('RENDER_GIT_COMMIT') or os.environ.get('RAILWAY_GIT_COMMIT_SHA', '')
+
+# SRS autosave (see lab/srs.py): a document is written at most once per
+# interval while its student types, plus explicit saves
+LAB_SRS_AUTOSAVE_INTERVAL = int(os.environ.get('LAB_SRS_AUTOSAVE_INTERVAL', '30'))
+LAB_SRS_SECTION_MAX_LENGTH = int(os.environ.get('LAB_SRS_SECTION_MAX_LENGTH', '100000'))
@@ -8,13 +8,20 @@ echo "📦 Installing Python dependencies..."
 pip install --upgrade pip
 pip install -r requirements.txt
 
+# Share the cache between the gunicorn workers and the job worker (see README, Caching)
+export LAB_CACHE="${LAB_CACHE:-tiered}"
+
 # Run Django setup
 echo "🔧 Running Django migrations..."
 python manage.py migrate
+python manage.py createcachetable
 
 echo "📦 Collecting static files..."
 python manage.py collectstatic --noinput
 
+echo "⚙️ Starting background job worker..."
+python manage.py run_lab_worker --workers 2 &
+
 echo "🌟 Starting Gunicorn server..."
 gunicorn requirements_lab.wsgi:application --bind 0.0.0.0:$PORT
 